@@ -0,0 +1,368 @@
+"""
+Benchmark das rotas de ontologia, pelo cliente de testes do Django.
+
+Cada ontologia (as de ``media/`` ou uma sintética, gerada com semente fixa) é
+carregada por ``load-ontology/`` e passa por todas as rotas de ``core/urls.py``:
+consultas, exportação, diff, mutações, importação em massa e histórico. Para
+cada rota são guardados os percentis de latência, o tamanho das respostas e a
+memória residente do processo; o resultado é um dict serializável em JSON, para
+comparar execuções (``compare``) e achar regressões.
+
+O comando ``benchmark`` roda cada ontologia num processo separado, para o pico de
+memória (``ru_maxrss``) ser o dela.
+"""
+import json
+import math
+import os
+import random
+import resource
+import sys
+import time
+from urllib.parse import urlencode
+from xml.sax.saxutils import escape
+
+SIZE_SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+PERCENTILES = (50, 90, 95, 99)
+
+# Triplas por indivíduo sintético: 2 rdf:type, rótulo, um valor de dado e, em
+# média, um relacionamento
+TRIPLES_PER_INDIVIDUAL = 5
+TRIPLES_PER_CLASS = 3
+TRIPLES_PER_PROPERTY = 4
+SYNTHETIC_PROPERTIES = 8
+
+
+def parse_size(text):
+    """``'10k'`` -> 10000, ``'1M'`` -> 1000000; ``None`` se não for um tamanho."""
+    text = text.strip().lower()
+    multiplier = SIZE_SUFFIXES.get(text[-1:], 1)
+    digits = text[:-1] if text[-1:] in SIZE_SUFFIXES else text
+    try:
+        return int(float(digits) * multiplier)
+    except ValueError:
+        return None
+
+
+# --- ontologias sintéticas -----------------------------------------------------------
+
+
+def generate_ontology(path, triples, depth=5, fanout=4, individual_density=0.8, seed=0):
+    """
+    Grava em ``path`` (RDF/XML) uma ontologia com cerca de ``triples`` triplas.
+
+    ``individual_density`` é a fração das triplas gasta em indivíduos; o resto vira
+    propriedades e classes, numa floresta de árvores com ``depth`` níveis e
+    ``fanout`` filhos por classe. A mesma semente gera o mesmo arquivo. Retorna as
+    contagens geradas.
+    """
+    rng = random.Random(seed)
+    base = f'http://example.org/synthetic/{triples}'
+    schema_budget = max(triples * (1 - individual_density), TRIPLES_PER_CLASS)
+    n_properties = SYNTHETIC_PROPERTIES
+    n_classes = max(1, int((schema_budget - 3 * n_properties * TRIPLES_PER_PROPERTY) // TRIPLES_PER_CLASS))
+    n_individuals = max(0, int(triples * individual_density) // TRIPLES_PER_INDIVIDUAL)
+    # Nós de uma árvore completa; classes além disso começam outra árvore
+    tree_size = sum(fanout ** level for level in range(depth + 1)) if fanout > 1 else depth + 1
+
+    def parent_of(i):
+        tree, node = divmod(i, tree_size)
+        if node == 0:
+            return None
+        return tree * tree_size + ((node - 1) // fanout if fanout > 1 else node - 1)
+
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0"?>\n'
+                '<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"\n'
+                '         xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#"\n'
+                '         xmlns:owl="http://www.w3.org/2002/07/owl#"\n'
+                '         xmlns:xsd="http://www.w3.org/2001/XMLSchema#"\n'
+                f'         xml:base="{base}"\n'
+                f'         xmlns="{base}#">\n'
+                f'<owl:Ontology rdf:about="{base}"/>\n')
+        written += 1
+        for k in range(n_properties):
+            domain, range_ = rng.randrange(n_classes), rng.randrange(n_classes)
+            f.write(f'<owl:ObjectProperty rdf:about="#relatedTo{k}"><rdfs:domain rdf:resource="#Class{domain}"/>'
+                    f'<rdfs:range rdf:resource="#Class{range_}"/><rdfs:label>related to {k}</rdfs:label>'
+                    f'</owl:ObjectProperty>\n')
+            f.write(f'<owl:DatatypeProperty rdf:about="#value{k}"><rdfs:domain rdf:resource="#Class{domain}"/>'
+                    f'<rdfs:range rdf:resource="http://www.w3.org/2001/XMLSchema#integer"/>'
+                    f'<rdfs:label>value {k}</rdfs:label></owl:DatatypeProperty>\n')
+            f.write(f'<owl:AnnotationProperty rdf:about="#note{k}"><rdfs:label>note {k}</rdfs:label>'
+                    f'<rdfs:comment>annotation {k}</rdfs:comment></owl:AnnotationProperty>\n')
+            written += 3 * TRIPLES_PER_PROPERTY
+        for i in range(n_classes):
+            parent = parent_of(i)
+            f.write(f'<owl:Class rdf:about="#Class{i}">'
+                    + (f'<rdfs:subClassOf rdf:resource="#Class{parent}"/>' if parent is not None else '')
+                    + f'<rdfs:label xml:lang="en">{escape(_words(rng, 3))}</rdfs:label></owl:Class>\n')
+            written += TRIPLES_PER_CLASS if parent is not None else TRIPLES_PER_CLASS - 1
+        for i in range(n_individuals):
+            cls = rng.randrange(n_classes)
+            links = ''.join(f'<relatedTo{rng.randrange(n_properties)} rdf:resource="#individual{rng.randrange(i)}"/>'
+                            for _ in range(rng.randint(0, 2) if i else 0))
+            value = rng.randrange(n_properties)
+            f.write(f'<owl:NamedIndividual rdf:about="#individual{i}"><rdf:type rdf:resource="#Class{cls}"/>'
+                    f'<rdfs:label>{escape(_words(rng, 2))}</rdfs:label>'
+                    f'<value{value} rdf:datatype="http://www.w3.org/2001/XMLSchema#integer">'
+                    f'{rng.randrange(1_000_000)}</value{value}>{links}</owl:NamedIndividual>\n')
+            written += 4 + links.count('<relatedTo')
+        f.write('</rdf:RDF>\n')
+    return {'triples': written, 'classes': n_classes, 'individuals': n_individuals,
+            'properties': 3 * n_properties, 'depth': depth, 'fanout': fanout,
+            'individual_density': individual_density, 'seed': seed}
+
+
+_SYLLABLES = ('ka', 'lo', 'mi', 'ne', 'ru', 'ta', 've', 'zo', 'pi', 'sa', 'do', 'gu')
+
+
+def _words(rng, count):
+    return ' '.join(''.join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(count))
+
+
+# --- medição -------------------------------------------------------------------------
+
+
+def current_rss():
+    """Memória residente do processo agora, em bytes (``None`` fora do Linux)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss():
+    """Pico de memória residente do processo, em bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KiB; macOS, em bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def summarize(values):
+    """Mínimo, máximo, média e percentis (nearest-rank) de ``values``."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    summary = {'min': ordered[0], 'max': ordered[-1], 'mean': sum(ordered) / len(ordered)}
+    for p in PERCENTILES:
+        summary[f'p{p}'] = ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+    return {key: round(value, 3) for key, value in summary.items()}
+
+
+class Benchmark:
+    """
+    Mede as requisições feitas por ``client`` (um ``django.test.Client``), por nome.
+
+    Cada medição inclui o consumo do corpo (nas respostas em streaming, até o
+    último bloco). Respostas com status fora de ``expect`` contam como erro.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._endpoints = {}
+
+    def request(self, name, method, url, expect=(200,), **kwargs):
+        started = time.perf_counter()
+        response = getattr(self.client, method)(url, **kwargs)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        elapsed = (time.perf_counter() - started) * 1000
+
+        from django.urls import resolve
+        endpoint = self._endpoints.setdefault(name, {
+            'route': resolve(url.split('?')[0]).route,
+            'method': method.upper(),
+            'latency_ms': [],
+            'response_bytes': [],
+            'errors': 0,
+        })
+        endpoint['latency_ms'].append(elapsed)
+        endpoint['response_bytes'].append(len(body))
+        if response.status_code not in expect:
+            endpoint['errors'] += 1
+            endpoint.setdefault('first_error', f'{response.status_code}: {body[:300].decode("utf-8", "replace")}')
+        endpoint['rss_bytes'] = current_rss()
+        return response, body
+
+    def json(self, name, method, url, expect=(200,), **kwargs):
+        _, body = self.request(name, method, url, expect, **kwargs)
+        try:
+            return json.loads(body)
+        except ValueError:
+            return {}
+
+    def routes(self):
+        return {endpoint['route'] for endpoint in self._endpoints.values()}
+
+    def report(self):
+        return {
+            name: {
+                'route': endpoint['route'],
+                'method': endpoint['method'],
+                'samples': len(endpoint['latency_ms']),
+                'errors': endpoint['errors'],
+                **({'first_error': endpoint['first_error']} if 'first_error' in endpoint else {}),
+                'latency_ms': summarize(endpoint['latency_ms']),
+                'response_bytes': summarize(endpoint['response_bytes']),
+                'rss_bytes': endpoint['rss_bytes'],
+            }
+            for name, endpoint in self._endpoints.items()
+        }
+
+
+# --- cenário -------------------------------------------------------------------------
+
+
+def _load(bench, path, poll=0.01):
+    """Carrega ``path`` por ``load-ontology/`` e espera o job; retorna o ``ontology_id``."""
+    started = time.perf_counter()
+    with open(path, 'rb') as f:
+        data = bench.json('load-ontology', 'post', '/load-ontology/', expect=(202,), data={'ontology_file': f})
+    job_id = data.get('job_id')
+    if job_id is None:
+        raise RuntimeError(f'load-ontology/ falhou: {data}')
+    while bench.json('load-jobs status', 'get', f'/load-jobs/{job_id}/')['job']['status'] == 'running':
+        time.sleep(poll)
+    result = bench.json('load-jobs result', 'get', f'/load-jobs/{job_id}/result/')
+    elapsed = (time.perf_counter() - started) * 1000
+    if result.get('status') != 'success':
+        raise RuntimeError(f'Carregamento de {path} falhou: {result.get("message")}')
+    bench.json('load-jobs cancel', 'post', f'/load-jobs/{job_id}/cancel/', expect=(409,))
+    return result['ontology_id'], job_id, elapsed
+
+
+def _samples(client, ontology_id):
+    """Nomes usados nas consultas: uma classe raiz com filhos, uma classe funda e indivíduos."""
+    def get(url, **params):
+        return json.loads(client.get(url, {'ontology_id': ontology_id, **params}).content)
+
+    nodes = get('/class-hierarchy/', limit=1000).get('nodes', [])
+    root = next((node for node in nodes if node.get('child_count')), nodes[0] if nodes else {})
+    deep = root
+    for _ in range(20):
+        children = get('/class-hierarchy/', parent=deep.get('iri') or deep.get('name'), limit=50).get('nodes', [])
+        child = next((node for node in children if node.get('child_count')), children[0] if children else None)
+        if child is None:
+            break
+        deep = child
+    individuals = get('/individuals/', limit=2).get('individuals', [])
+    return {
+        'root': root.get('iri') or root.get('name'),
+        'deep': deep.get('iri') or deep.get('name'),
+        'query': (root.get('name') or 'a')[:5],
+        'individuals': [individual['name'] for individual in individuals],
+    }
+
+
+def run_ontology(client, path, repeat=20, loads=3):
+    """
+    Carrega ``path`` (``loads`` vezes: a primeira parseia, as outras saem do cache
+    de uploads) e mede todas as rotas na ontologia carregada, ``repeat`` vezes cada.
+    """
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    bench = Benchmark(client)
+    load_ms = []
+    for _ in range(max(loads, 1)):
+        ontology_id, job_id, elapsed = _load(bench, path)
+        load_ms.append(elapsed)
+    samples = _samples(client, ontology_id)
+
+    def url(route, **params):
+        params['ontology_id'] = ontology_id
+        return route + '?' + urlencode(params)
+
+    def post(name, route, body, expect=(200,)):
+        return bench.json(name, 'post', url(route), expect=expect, data=json.dumps(body), content_type='application/json')
+
+    # Consultas
+    for _ in range(repeat):
+        bench.request('class-hierarchy', 'get', url('/class-hierarchy/'))
+        bench.request('class-hierarchy parent', 'get', url('/class-hierarchy/', parent=samples['root'], depth=2))
+        bench.request('individuals', 'get', url('/individuals/', limit=100))
+        bench.request('individuals class', 'get', url('/individuals/', **{'class': samples['root']}, inherited=1))
+        bench.request('search', 'get', url('/search/', q=samples['query']))
+        bench.request('ancestors', 'get', url('/ancestors/', entity=samples['deep']))
+        bench.request('descendants', 'get', url('/descendants/', entity=samples['root']))
+        bench.request('instances', 'get', url('/instances/', **{'class': samples['root']}))
+        bench.request('object-properties', 'get', url('/api/object-properties/'))
+        bench.request('server-stats', 'get', '/server-stats/')
+        bench.request('imports', 'get', '/imports/')
+
+    # Mutações (nomes novos a cada repetição)
+    for i in range(repeat):
+        post('create-class', '/create-class/', {'name': f'BenchClass{i}', 'parents': []})
+        post('create_object_property', '/create_object_property/',
+             {'property_name': f'benchRelation{i}', 'domain': [f'BenchClass{i}'], 'range': [f'BenchClass{i}']})
+        post('create_data_property', '/create_data_property/',
+             {'property_name': f'benchValue{i}', 'domain': [f'BenchClass{i}'], 'range': 'int', 'characteristics': []})
+        post('create-annotation-property', '/create-annotation-property/', {'name': f'benchNote{i}'})
+        post('create-individual', '/create-individual/',
+             {'name': f'benchA{i}', 'classes': [f'BenchClass{i}'], 'properties': {f'benchValue{i}': [{'value': str(i), 'datatype': 'xsd:integer'}]}})
+        post('create-individual', '/create-individual/', {'name': f'benchB{i}', 'classes': [f'BenchClass{i}']})
+        post('relationship-manager', '/relationship-manager/',
+             {'subject': f'benchA{i}', 'object_property': f'benchRelation{i}', 'target': f'benchB{i}', 'action': 'add'})
+        post('batch', '/batch/', {'operations': [
+            {'op': 'create_class', 'data': {'name': f'BenchBatch{i}', 'parents': [f'BenchClass{i}']}},
+            {'op': 'create_individual', 'data': {'name': f'benchBatch{i}', 'classes': [f'BenchBatch{i}']}},
+        ]})
+    rows = ''.join(json.dumps({'name': f'benchImport{i}', 'classes': ['BenchClass0']}) + '\n' for i in range(1000))
+    for i in range(max(repeat // 5, 1)):
+        bench.request('import-individuals', 'post', url('/import-individuals/'), data={
+            'file': SimpleUploadedFile('individuals.jsonl', rows.replace('benchImport', f'benchImport{i}_').encode())})
+
+    # Histórico
+    for i in range(repeat):
+        post('snapshots create', '/snapshots/', {'name': f'bench{i}'}, expect=(201,))
+        post('undo', '/undo/', {})
+        post('redo', '/redo/', {})
+    bench.request('history', 'get', url('/history/'))
+    bench.request('snapshots', 'get', url('/snapshots/'))
+    for i in reversed(range(min(repeat, 3))):
+        post('snapshots restore', '/snapshots/restore/', {'name': f'bench{i}'})
+    for i in range(repeat):
+        bench.request('snapshots delete', 'delete', url('/snapshots/', name=f'bench{i}'))
+
+    # Exportação e diff (depois das mutações, com a ontologia já alterada)
+    for _ in range(repeat):
+        bench.request('export rdfxml', 'get', url('/export-ontology/', format='rdfxml'))
+        bench.request('export ntriples gzip', 'get', url('/export-ontology/', format='ntriples', compression='gzip'))
+        bench.request('diff', 'get', url('/diff/'))
+    for _ in range(min(repeat, 3)):
+        with open(path, 'rb') as old, open(path, 'rb') as new:
+            bench.request('diff-files', 'post', '/diff-files/', data={'from_file': old, 'to_file': new})
+
+    endpoints = bench.report()
+    endpoints['load-ontology (completo)'] = {
+        'route': 'load-ontology/', 'method': 'POST', 'samples': len(load_ms), 'errors': 0,
+        'latency_ms': summarize(load_ms), 'cold_ms': round(load_ms[0], 3),
+    }
+    return {'ontology_id': ontology_id, 'samples': samples, 'endpoints': endpoints,
+            'uncovered_routes': uncovered_routes(bench.routes())}
+
+
+def uncovered_routes(measured):
+    """Rotas de ``core/urls.py`` que o cenário não exercitou."""
+    from core.urls import urlpatterns
+    return sorted(str(pattern.pattern) for pattern in urlpatterns if str(pattern.pattern) not in measured)
+
+
+# --- comparação ----------------------------------------------------------------------
+
+
+def compare(old, new, threshold=1.25, metric='p50'):
+    """
+    Rotas cujo ``metric`` de latência piorou mais que ``threshold`` vezes de
+    ``old`` para ``new`` (dois resultados do benchmark).
+    """
+    regressions = []
+    for dataset, result in new.get('datasets', {}).items():
+        previous = old.get('datasets', {}).get(dataset, {}).get('endpoints', {})
+        for name, endpoint in result.get('endpoints', {}).items():
+            before = previous.get(name, {}).get('latency_ms', {}).get(metric)
+            after = endpoint.get('latency_ms', {}).get(metric)
+            if before and after and after / before > threshold:
+                regressions.append({'dataset': dataset, 'endpoint': name, 'before_ms': before,
+                                    'after_ms': after, 'ratio': round(after / before, 2)})
+    return regressions
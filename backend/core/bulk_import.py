@@ -0,0 +1,252 @@
+"""
+Importação em massa de indivíduos a partir de CSV ou JSONL.
+
+As linhas são lidas em streaming e aplicadas em blocos de tamanho fixo, então a
+memória usada não depende do tamanho do arquivo. Cada linha vira o mesmo corpo
+aceito por ``create-individual/``:
+
+* JSONL: um objeto por linha, ex. ``{"name": "p1", "classes": ["Pessoa"],
+  "properties": {"idade": [{"value": "3", "datatype": "xsd:integer"}]},
+  "object_properties": {"conhece": ["p2"]}}``
+* CSV: colunas ``name`` e ``classes``; ``data:<propriedade>`` (ou
+  ``data:<propriedade>^^xsd:integer`` para indicar o tipo) e
+  ``obj:<propriedade>``. Vários valores numa célula são separados por ``|``.
+
+Linhas só com nome, classes e propriedades de dados e de objeto (o caso comum)
+são gravadas em lote direto nas tabelas do quadstore (ver ``IndividualBatch``);
+as demais passam por ``create_individual`` uma a uma.
+"""
+import csv
+import json
+import time
+from itertools import islice
+
+from owlready2 import FunctionalProperty
+from owlready2.base import to_literal, rdf_type, owl_named_individual
+
+from .index import DATA_PROPERTY, OBJECT_PROPERTY, INDIVIDUAL
+from .operations import coerce_value, individual_classes
+
+LIST_SEPARATOR = '|'
+# Campos que ``IndividualBatch`` sabe gravar
+PLAIN_FIELDS = {'name', 'classes', 'properties', 'object_properties'}
+# Quantos erros ficam no relatório devolvido (o log completo vai para error_log)
+MAX_REPORTED_ERRORS = 100
+
+
+def _split(cell):
+    return [v.strip() for v in (cell or '').split(LIST_SEPARATOR) if v.strip()]
+
+
+def _decode_lines(lines):
+    for i, line in enumerate(lines):
+        line = line.decode('utf-8') if isinstance(line, bytes) else line
+        yield line.lstrip('﻿') if i == 0 else line
+
+
+def csv_row_to_body(record):
+    body = {
+        'name': (record.get('name') or '').strip(),
+        'classes': _split(record.get('classes')),
+        'properties': {},
+        'object_properties': {},
+    }
+    for column, cell in record.items():
+        if not column or not cell:
+            continue
+        if column.startswith('data:'):
+            prop, _, datatype = column[5:].partition('^^')
+            body['properties'][prop] = [{'value': v, 'datatype': datatype or None} for v in _split(cell)]
+        elif column.startswith('obj:'):
+            body['object_properties'][column[4:]] = _split(cell)
+    return body
+
+
+def read_csv(lines):
+    """Gera ``(número da linha, corpo)`` para cada linha de dados do CSV."""
+    reader = csv.DictReader(_decode_lines(lines))
+    for record in reader:
+        yield reader.line_num, csv_row_to_body(record)
+
+
+def read_jsonl(lines):
+    """Gera ``(número da linha, corpo)``; uma linha inválida vira ``(número, exceção)``."""
+    for line_no, line in enumerate(_decode_lines(lines), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            body = json.loads(line)
+            if not isinstance(body, dict):
+                raise ValueError('Cada linha deve ser um objeto JSON')
+        except ValueError as e:
+            yield line_no, e
+        else:
+            yield line_no, body
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+def detect_format(filename, default='jsonl'):
+    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return {'csv': 'csv', 'jsonl': 'jsonl', 'ndjson': 'jsonl'}.get(ext, default)
+
+
+class ImportReport:
+    def __init__(self, error_log=None):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.error_log = error_log
+        self.started = time.monotonic()
+
+    def fail(self, line_no, error):
+        self.failed += 1
+        entry = {'row': line_no, 'message': str(error)}
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(entry)
+        if self.error_log is not None:
+            self.error_log.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    @property
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.imported / elapsed if elapsed else 0.0
+
+    def to_dict(self):
+        return {
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'seconds': round(time.monotonic() - self.started, 3),
+            'rows_per_second': round(self.rate, 1),
+        }
+
+
+class IndividualBatch:
+    """
+    Indivíduos novos gravados com ``executemany`` nas tabelas do Owlready2, em vez
+    de criados entidade por entidade (várias consultas e um SAVEPOINT por linha).
+
+    ``add`` valida a linha e monta as triplas que ``create_individual`` gravaria
+    (rdf:type owl:NamedIndividual, as classes e os valores das propriedades);
+    ``flush`` grava todas as linhas de uma vez e só então carrega e indexa as
+    entidades. Os objetos de uma relação podem ser indivíduos do próprio lote,
+    pelo nome ou IRI (que têm precedência sobre o índice).
+    """
+
+    def __init__(self, onto, index):
+        self.onto = onto
+        self.index = index
+        self.graph = onto.world.graph
+        self._clear()
+
+    def _clear(self):
+        self.rows = []
+        self.iris = []
+        # nome e IRI -> storid dos indivíduos do lote
+        self.pending = {}
+        self.objs = []
+        self.datas = []
+        # Indivíduos já existentes que ganham uma relação
+        self.targets = []
+        self.start = None
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def add(self, line_no, row):
+        """
+        Enfileira a linha; ``False`` se ela tem que passar por ``create_individual``
+        (campos extras ou um indivíduo que já existe). Linhas inválidas levantam o
+        mesmo erro que ``create_individual`` levantaria.
+        """
+        if not row.keys() <= PLAIN_FIELDS:
+            return False
+        classes = individual_classes(self.index, row)
+        name = row['name']
+        iri = self.onto.base_iri + name
+        if name in self.pending or iri in self.pending or self.graph._abbreviate(iri, False) is not None:
+            return False
+        if self.start is None:
+            self.start = self.graph.execute("SELECT current_resource FROM store").fetchone()[0]
+        storid = self.start + len(self.rows) + 1
+
+        objs = [(storid, rdf_type, owl_named_individual)] + [(storid, rdf_type, cls.storid) for cls in classes]
+        datas = []
+        for prop_name, values in (row.get('properties') or {}).items():
+            prop = self.index.resolve(prop_name, DATA_PROPERTY)
+            if not prop:
+                continue
+            processed = [v for v in (coerce_value(item) for item in values) if v is not None]
+            if issubclass(prop, FunctionalProperty):
+                processed = processed[:1]
+            datas.extend((storid, prop.storid, *to_literal(v)) for v in processed)
+        targets = []
+        for prop_name, names in (row.get('object_properties') or {}).items():
+            prop = self.index.resolve(prop_name, OBJECT_PROPERTY)
+            if not prop:
+                continue
+            for target_name in names:
+                if target_name in (name, iri):
+                    objs.append((storid, prop.storid, storid))
+                elif target_name in self.pending:
+                    objs.append((storid, prop.storid, self.pending[target_name]))
+                elif (target := self.index.resolve(target_name, INDIVIDUAL)) is not None:
+                    objs.append((storid, prop.storid, target.storid))
+                    targets.append(target)
+
+        self.rows.append((line_no, row))
+        self.iris.append(iri)
+        self.pending[name] = self.pending[iri] = storid
+        self.objs.extend(objs)
+        self.datas.extend(datas)
+        self.targets.extend(targets)
+        return True
+
+    def flush(self, changes):
+        """Grava as linhas enfileiradas (num SAVEPOINT) e indexa os indivíduos; devolve as linhas."""
+        rows, iris, start, targets = self.rows, self.iris, self.start, self.targets
+        if not rows:
+            return []
+        db = self.graph.db
+        c = self.onto.graph.c
+        db.execute("SAVEPOINT import_batch")
+        try:
+            db.executemany("INSERT INTO resources VALUES (?, ?)", [(start + i, iri) for i, iri in enumerate(iris, 1)])
+            db.execute("UPDATE store SET current_resource=?", (start + len(iris),))
+            db.executemany(f"INSERT OR IGNORE INTO objs VALUES ({c}, ?, ?, ?)", self.objs)
+            db.executemany(f"INSERT OR IGNORE INTO datas VALUES ({c}, ?, ?, ?, ?)", self.datas)
+        except BaseException:
+            db.execute("ROLLBACK TO import_batch")
+            raise
+        finally:
+            db.execute("RELEASE import_batch")
+            self._clear()
+        world = self.onto.world
+        entities = [world._get_by_storid(start + i) for i in range(1, len(iris) + 1)]
+        self.index.add_many(entities)
+        for entity in entities:
+            changes.add(entity)
+        for target in targets:
+            changes.change(target)
+        return rows
+
+
+def import_rows(rows, apply_chunk, chunk_size, report=None, progress=None):
+    """
+    Consome ``rows`` em blocos de ``chunk_size`` e entrega cada bloco a
+    ``apply_chunk(chunk, report)``; ``progress(report)`` é chamado após cada bloco.
+    """
+    report = report or ImportReport()
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        apply_chunk(chunk, report)
+        if progress:
+            progress(report)
+    return report
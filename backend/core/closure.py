@@ -0,0 +1,199 @@
+"""
+Fecho transitivo de rdfs:subClassOf e rdfs:subPropertyOf.
+
+Cada classe/propriedade indexada guarda o conjunto de todos os ancestrais e de
+todos os descendentes, então "X é subclasse de Y?", "ancestrais de X" e "instâncias
+de X (inclusive das subclasses)" não percorrem a hierarquia no quadstore.
+
+É mantido pelo ``EntityIndex``: montado no carregamento (a partir das superclasses
+de cada entidade, com o fecho calculado uma vez no fim) e atualizado só no ramo
+afetado a cada classe/propriedade criada, alterada ou removida. As listas
+ordenadas por (nome, IRI) usadas na paginação são montadas sob demanda e
+descartadas quando o fecho muda.
+"""
+from bisect import bisect_right
+from itertools import islice
+
+from .hierarchy import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_key
+
+# Relações consultáveis: as diretas e as do fecho
+RELATIONS = ('parents', 'children', 'ancestors', 'descendants')
+
+
+def keys_page(keys, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Uma página de ``keys`` (ordenadas) depois do cursor: ``(chaves, next_cursor)``."""
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    start = bisect_right(keys, tuple(decode_cursor(cursor))) if cursor else 0
+    page = list(islice(keys, start, start + limit + 1))
+    next_cursor = encode_key(page[limit - 1]) if len(page) > limit else None
+    return page[:limit], next_cursor
+
+
+class ClosureIndex:
+    def __init__(self):
+        # iri -> (nome, iri) das entidades do fecho
+        self._keys = {}
+        # iri -> IRIs das superclasses/superpropriedades e das subclasses/subpropriedades diretas
+        self._parents = {}
+        self._children = {}
+        # iri -> todos os ancestrais / descendentes (sem a própria entidade)
+        self._ancestors = {}
+        self._descendants = {}
+        # (relação, iri) -> chaves ordenadas, montadas sob demanda
+        self._sorted = {}
+        self._building = False
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, iri):
+        return iri in self._keys
+
+    # --- manutenção ----------------------------------------------------------------
+
+    def begin_build(self):
+        """Até ``end_build`` só as arestas diretas são guardadas; o fecho sai no fim."""
+        self._building = True
+
+    def end_build(self):
+        self._building = False
+        self._ancestors = {iri: set() for iri in self._keys}
+        self._descendants = {iri: set() for iri in self._keys}
+        self._children = {iri: set() for iri in self._keys}
+        for iri, parents in self._parents.items():
+            self._parents[iri] = parents = {parent for parent in parents if parent in self._keys}
+            for parent in parents:
+                self._children[parent].add(iri)
+        for iri in self._keys:
+            ancestors = self._collect(iri)
+            self._ancestors[iri] = ancestors
+            for ancestor in ancestors:
+                self._descendants[ancestor].add(iri)
+        self._sorted.clear()
+
+    def _collect(self, iri):
+        """Ancestrais de ``iri`` pelas arestas diretas (ciclos de subClassOf são tolerados)."""
+        seen, stack = set(), list(self._parents.get(iri, ()))
+        while stack:
+            parent = stack.pop()
+            if parent in seen or parent == iri:
+                continue
+            seen.add(parent)
+            known = self._ancestors.get(parent)
+            if known:
+                # Fecho do pai já calculado: não precisa descer por ele
+                seen.update(known)
+                seen.discard(iri)
+            else:
+                stack.extend(self._parents.get(parent, ()))
+        return seen
+
+    def add(self, iri, name, parents):
+        """Inclui (ou atualiza as superclasses de) uma classe/propriedade."""
+        self._keys[iri] = (name or '', iri)
+        if self._building:
+            self._parents[iri] = set(parents)
+            return
+        parents = {parent for parent in parents if parent in self._keys}
+        previous = self._parents.get(iri, set())
+        self._parents[iri] = parents
+        self._ancestors.setdefault(iri, set())
+        self._descendants.setdefault(iri, set())
+        self._children.setdefault(iri, set())
+        if parents == previous:
+            return
+        self._sorted.pop(('parents', iri), None)
+        for parent in previous - parents:
+            self._children.get(parent, set()).discard(iri)
+            self._sorted.pop(('children', parent), None)
+        for parent in parents - previous:
+            self._children[parent].add(iri)
+            self._sorted.pop(('children', parent), None)
+        if previous - parents:
+            # Remover uma aresta pode encolher o fecho do ramo de baixo: recalcula só ele
+            self._relink({iri} | self._descendants[iri])
+            return
+        for parent in parents - previous:
+            self._link(iri, parent)
+
+    def _link(self, child, parent):
+        """Aresta nova ``child`` -> ``parent``: todo o ramo de baixo ganha o ramo de cima."""
+        below = {child} | self._descendants[child]
+        above = {parent} | self._ancestors[parent]
+        # Se a aresta fecha um ciclo, os dois ramos se cruzam: ninguém é ancestral de si mesmo
+        for iri in below:
+            self._ancestors[iri] |= above - {iri}
+            self._sorted.pop(('ancestors', iri), None)
+        for iri in above:
+            self._descendants[iri] |= below - {iri}
+            self._sorted.pop(('descendants', iri), None)
+
+    def _relink(self, nodes):
+        """
+        Recalcula os ancestrais de ``nodes`` (um ramo: cada nó com todos os seus
+        descendentes) e ajusta os descendentes dos ancestrais que mudaram. O fecho
+        dos nós fora do ramo não passa por ele, então continua valendo.
+        """
+        previous = {iri: self._ancestors[iri] for iri in nodes}
+        # Vazios, os nós do ramo não servem de atalho em ``_collect`` até serem recalculados
+        for iri in nodes:
+            self._ancestors[iri] = set()
+        for iri in nodes:
+            ancestors = self._ancestors[iri] = self._collect(iri)
+            if ancestors == previous[iri]:
+                continue
+            self._sorted.pop(('ancestors', iri), None)
+            for ancestor in previous[iri] - ancestors:
+                # O ancestral pode ser a entidade removida (ver ``remove``)
+                self._descendants.get(ancestor, set()).discard(iri)
+                self._sorted.pop(('descendants', ancestor), None)
+            for ancestor in ancestors - previous[iri]:
+                self._descendants[ancestor].add(iri)
+                self._sorted.pop(('descendants', ancestor), None)
+
+    def remove(self, iri):
+        if self._keys.pop(iri, None) is None:
+            return
+        parents = self._parents.pop(iri, set())
+        if self._building:
+            # As arestas para ``iri`` são descartadas em ``end_build``
+            return
+        children = self._children.pop(iri, set())
+        for parent in parents - {iri}:
+            self._children[parent].discard(iri)
+            self._sorted.pop(('children', parent), None)
+        for child in children - {iri}:
+            self._parents[child].discard(iri)
+            self._sorted.pop(('parents', child), None)
+        for ancestor in self._ancestors.pop(iri, set()):
+            self._descendants[ancestor].discard(iri)
+            self._sorted.pop(('descendants', ancestor), None)
+        descendants = self._descendants.pop(iri, set())
+        for relation in RELATIONS:
+            self._sorted.pop((relation, iri), None)
+        # Só o ramo de baixo pode perder ancestrais (os que passavam por ``iri``)
+        self._relink(descendants)
+
+    # --- consulta ------------------------------------------------------------------
+
+    def relation(self, relation, iri):
+        """IRIs de ``relation`` (ver ``RELATIONS``) de ``iri``; o conjunto do índice, não alterar."""
+        return getattr(self, f'_{relation}').get(iri, set())
+
+    def ancestors(self, iri):
+        """IRIs de todos os ancestrais (o conjunto do índice: não deve ser alterado)."""
+        return self._ancestors.get(iri, set())
+
+    def descendants(self, iri):
+        """IRIs de todos os descendentes (o conjunto do índice: não deve ser alterado)."""
+        return self._descendants.get(iri, set())
+
+    def is_descendant(self, iri, ancestor):
+        return ancestor in self._ancestors.get(iri, ())
+
+    def sorted_keys(self, relation, iri):
+        """Chaves (nome, IRI) ordenadas de ``relation``, guardadas até o fecho mudar."""
+        keys = self._sorted.get((relation, iri))
+        if keys is None:
+            keys = self._sorted[(relation, iri)] = sorted(self._keys[m] for m in self.relation(relation, iri))
+        return keys
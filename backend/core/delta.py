@@ -0,0 +1,98 @@
+"""
+Conjunto de alterações (delta) devolvido pelas views de mutação.
+
+Em vez de reserializar a ontologia inteira depois de cada mutação, as views
+registram aqui só as entidades que adicionaram, alteraram ou removeram; o
+frontend aplica o delta sobre o estado que já tem.
+"""
+from owlready2 import Thing, ThingClass
+
+from .index import (
+    entity_kind, CLASS, OBJECT_PROPERTY, DATA_PROPERTY, ANNOTATION_PROPERTY, INDIVIDUAL,
+)
+from .serialization import build_entity_hierarchy, serialize_individual, serialize_individuals, serialize_property
+
+# Mesmas chaves usadas no payload de load-ontology/
+PAYLOAD_KEYS = {
+    CLASS: 'classes',
+    OBJECT_PROPERTY: 'object_properties',
+    DATA_PROPERTY: 'data_properties',
+    ANNOTATION_PROPERTY: 'annotation_properties',
+    INDIVIDUAL: 'individuals',
+}
+
+
+def serialize_class_node(cls):
+    """Nó da árvore de classes, com os pais para o frontend saber onde inseri-lo."""
+    node = build_entity_hierarchy(cls)
+    node['iri'] = cls.iri
+    node['parents'] = [p.name for p in cls.is_a if isinstance(p, ThingClass) and p is not Thing]
+    return node
+
+
+SERIALIZERS = {
+    CLASS: serialize_class_node,
+    OBJECT_PROPERTY: serialize_property,
+    DATA_PROPERTY: serialize_property,
+    ANNOTATION_PROPERTY: serialize_property,
+    INDIVIDUAL: serialize_individual,
+}
+
+
+class ChangeSet:
+    def __init__(self):
+        self.added = {}
+        self.changed = {}
+        # iri -> (tipo, nome); a entidade pode já ter sido destruída
+        self.removed = {}
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+    def iris(self):
+        """IRIs de todas as entidades tocadas (para invalidar o cache de serialização)."""
+        return [*self.added, *self.changed, *self.removed]
+
+    def add(self, entity):
+        if entity_kind(entity) is None:
+            return
+        self.removed.pop(entity.iri, None)
+        self.added[entity.iri] = entity
+
+    def change(self, entity):
+        if entity_kind(entity) is None or entity.iri in self.added:
+            return
+        self.changed[entity.iri] = entity
+
+    def remove(self, entity):
+        kind = entity_kind(entity)
+        if kind is None:
+            return
+        self.changed.pop(entity.iri, None)
+        if self.added.pop(entity.iri, None) is None:
+            self.removed[entity.iri] = (kind, entity.name)
+
+    def to_dict(self):
+        removed = {}
+        for kind, name in self.removed.values():
+            removed.setdefault(PAYLOAD_KEYS[kind], []).append(name)
+        return {
+            'added': self._serialize(self.added),
+            'changed': self._serialize(self.changed),
+            'removed': removed,
+        }
+
+    @staticmethod
+    def _serialize(entities):
+        grouped = {}
+        individuals = []
+        for entity in entities.values():
+            kind = entity_kind(entity)
+            if kind == INDIVIDUAL:
+                individuals.append(entity)
+            else:
+                grouped.setdefault(PAYLOAD_KEYS[kind], []).append(SERIALIZERS[kind](entity))
+        if individuals:
+            # Indivíduos em lote: uma consulta só, em vez de uma por indivíduo e propriedade
+            grouped[PAYLOAD_KEYS[INDIVIDUAL]] = serialize_individuals(individuals)
+        return grouped
@@ -0,0 +1,337 @@
+"""
+Diff estrutural entre duas versões de uma ontologia (arquivos ou o quadstore).
+
+Cada lado vira um conjunto de triplas canônicas, lidas em streaming (o parser do
+Owlready2 chama de volta a cada tripla; o quadstore é lido por SQL), sem criar
+entidades do Owlready2. Nós em branco (restrições, listas, axiomas anotados) não
+têm nome estável entre arquivos, então cada um é identificado pelo hash da sua
+estrutura: a tripla que aponta para ele carrega o axioma inteiro.
+
+As triplas viram hashes de 64 bits ordenados, e a diferença sai de uma
+intercalação das duas listas, em O(n log n). Só as triplas que mudaram são
+renderizadas, agrupadas por entidade (classes, propriedades, indivíduos) e, para
+os axiomas sem entidade como sujeito, em ``axioms``.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+
+from owlready2 import owlxml_2_ntriples, rdfxml_2_ntriples
+from owlready2.driver import _guess_format
+
+RDF_TYPE = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'
+XSD_STRING = 'http://www.w3.org/2001/XMLSchema#string'
+OWL = 'http://www.w3.org/2002/07/owl#'
+
+# rdf:type -> grupo da entidade no diff
+GROUPS = {
+    OWL + 'Ontology': 'ontology',
+    OWL + 'Class': 'classes',
+    OWL + 'ObjectProperty': 'object_properties',
+    OWL + 'DatatypeProperty': 'data_properties',
+    OWL + 'AnnotationProperty': 'annotation_properties',
+    OWL + 'NamedIndividual': 'individuals',
+}
+GROUP_ORDER = ('ontology', 'classes', 'object_properties', 'data_properties', 'annotation_properties',
+               'individuals', 'axioms', 'other')
+
+ORIGINAL_SUFFIX = '.original'
+
+_NT_TERM = r'<[^>]*>|_:\S+|"(?:[^"\\]|\\.)*"(?:@[A-Za-z0-9-]+|\^\^<[^>]*>)?'
+_NT_LINE_RE = re.compile(rf'\s*({_NT_TERM})\s+<([^>]*)>\s+({_NT_TERM})\s*(?:<[^>]*>\s*)?\.\s*$')
+
+
+def original_path(path):
+    """Onde fica a cópia do arquivo enviado (o ``path`` é regravado pela compactação)."""
+    return path + ORIGINAL_SUFFIX
+
+
+def keep_original(path):
+    """Guarda o arquivo recém-enviado (hardlink, ou cópia) para os diffs contra ele."""
+    try:
+        os.link(path, original_path(path))
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copyfile(path, original_path(path))
+
+
+# --- leitura -------------------------------------------------------------------------
+
+
+class _Collector:
+    """Recebe as triplas de um parser: (s, p, o) de objeto e (s, p, valor, datatype/@lang)."""
+
+    def __init__(self):
+        self.objs = []
+        self.datas = []
+
+    def obj(self, s, p, o):
+        self.objs.append((s, p, o))
+
+    def data(self, s, p, o, d):
+        self.datas.append((s, p, o, d))
+
+
+def _unescape(literal):
+    return json.loads('"' + literal.replace('\t', '\\t') + '"')
+
+
+def _parse_ntriples(f, collector):
+    for line in f:
+        line = line.decode('utf-8')
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        match = _NT_LINE_RE.match(line)
+        if not match:
+            raise ValueError(f'Linha N-Triples inválida: {line.strip()[:200]}')
+        s, p, o = match.groups()
+        s = s[1:-1] if s.startswith('<') else s
+        if o.startswith('"'):
+            body, _, suffix = o[1:].rpartition('"')
+            d = suffix[1:] if suffix.startswith('@') else suffix[3:-1]
+            collector.data(s, p, _unescape(body), '@' + d if suffix.startswith('@') else d)
+        else:
+            collector.obj(s, p, o[1:-1] if o.startswith('<') else o)
+
+
+def read_file(path):
+    """``TripleSet`` do arquivo (RDF/XML, OWL/XML ou N-Triples/N-Quads)."""
+    collector = _Collector()
+    with open(path, 'rb') as f:
+        fmt = _guess_format(f)
+        if fmt == 'ntriples':
+            _parse_ntriples(f, collector)
+        else:
+            parser = rdfxml_2_ntriples if fmt == 'rdfxml' else owlxml_2_ntriples
+            parser.parse(f, collector.obj, collector.data)
+    return TripleSet(collector.objs, collector.datas)
+
+
+def read_store(onto, changes=None):
+    """
+    ``TripleSet`` da ontologia no quadstore (só as triplas dela, sem os imports).
+
+    ``changes`` (linhas de ``History.changes``) são aplicadas em memória antes: é
+    o estado de um snapshot, sem tocar no quadstore.
+    """
+    graph = onto.world.graph
+    c = onto.graph.c
+    if changes is not None:
+        return _read_store_changed(graph, c, changes)
+    # Nós em branco têm storid negativo e não estão em ``resources``
+    objs = graph.execute("""
+        SELECT COALESCE(rs.iri, '_:' || q.s), rp.iri, COALESCE(ro.iri, '_:' || q.o)
+        FROM objs q
+        LEFT JOIN resources rs ON rs.storid = q.s
+        JOIN resources rp ON rp.storid = q.p
+        LEFT JOIN resources ro ON ro.storid = q.o
+        WHERE q.c = ?""", (c,))
+    datas = graph.execute("""
+        SELECT COALESCE(rs.iri, '_:' || q.s), rp.iri, q.o, COALESCE(rd.iri, q.d)
+        FROM datas q
+        LEFT JOIN resources rs ON rs.storid = q.s
+        JOIN resources rp ON rp.storid = q.p
+        LEFT JOIN resources rd ON rd.storid = q.d AND typeof(q.d) = 'integer'
+        WHERE q.c = ?""", (c,))
+    return TripleSet(objs, datas)
+
+
+def _read_store_changed(graph, c, changes):
+    objs = set(graph.execute("SELECT s, p, o FROM objs WHERE c=?", (c,)))
+    datas = set(graph.execute("SELECT s, p, o, d FROM datas WHERE c=?", (c,)))
+    for sign, tbl, row_c, s, p, o, d in changes:
+        if row_c != c:
+            continue
+        rows, row = (datas, (s, p, o, d)) if tbl else (objs, (s, p, o))
+        if sign > 0:
+            rows.add(row)
+        else:
+            rows.discard(row)
+    iris = dict(graph.execute("SELECT storid, iri FROM resources"))
+
+    def iri(storid):
+        return iris[storid] if storid > 0 else f'_:{storid}'
+
+    return TripleSet(
+        ((iri(s), iri(p), iri(o)) for s, p, o in objs),
+        ((iri(s), iri(p), o, iris.get(d, d) if isinstance(d, int) else d) for s, p, o, d in datas))
+
+
+# --- canonização ---------------------------------------------------------------------
+
+
+def _is_blank(term):
+    return term.startswith('_:')
+
+
+def _literal(value, d):
+    if isinstance(value, bool):
+        value = 'true' if value else 'false'
+    if not d or d == XSD_STRING or d == 0:
+        return f'"{value}"'
+    if isinstance(d, str) and d.startswith('@'):
+        return f'"{value}"{d}'
+    return f'"{value}"^^<{d}>'
+
+
+def _hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class TripleSet:
+    """
+    As triplas de um lado do diff: hash -> (sujeito, predicado, objeto), os hashes
+    ordenados e o tipo de cada sujeito.
+    """
+
+    def __init__(self, objs, datas):
+        # (p, termo canônico do objeto ou nó em branco) de cada nó em branco
+        self._blank = {}
+        named = []
+        referenced = set()
+        for s, p, o in objs:
+            o = o if _is_blank(o) else f'<{o}>'
+            if _is_blank(o):
+                referenced.add(o)
+            if _is_blank(s):
+                self._blank.setdefault(s, []).append((p, o))
+            else:
+                named.append((s, p, o))
+        for s, p, o, d in datas:
+            o = _literal(o, d)
+            if _is_blank(s):
+                self._blank.setdefault(s, []).append((p, o))
+            else:
+                named.append((s, p, o))
+
+        self._keys = {}
+        self.triples = {}
+        self.kinds = {}
+        for s, p, o in named:
+            key = self._key(o) if _is_blank(o) else o
+            self.triples[_hash(f'<{s}> <{p}> {key}')] = (s, p, o)
+            if p == RDF_TYPE and o[1:-1] in GROUPS:
+                self.kinds.setdefault(s, GROUPS[o[1:-1]])
+        # Axiomas soltos (AllDisjointClasses, owl:Axiom...): nós em branco que ninguém referencia
+        for blank in self._blank:
+            if blank not in referenced:
+                self.triples[_hash(self._key(blank))] = (None, None, blank)
+        self.hashes = sorted(self.triples)
+
+    def _key(self, blank):
+        """Hash da estrutura do nó em branco (iterativo: listas RDF podem ser longas)."""
+        stack, visiting = [blank], set()
+        while stack:
+            node = stack[-1]
+            if node in self._keys:
+                stack.pop()
+                continue
+            visiting.add(node)
+            pending = [o for _, o in self._blank.get(node, ()) if _is_blank(o)
+                       and o not in self._keys and o not in visiting]
+            if pending:
+                stack.extend(pending)
+                continue
+            parts = sorted(f'<{p}> {self._keys.get(o, "_:ciclo") if _is_blank(o) else o}'
+                           for p, o in self._blank.get(node, ()))
+            self._keys[node] = f'_:{_hash(";".join(parts)):016x}'
+            visiting.discard(node)
+            stack.pop()
+        return self._keys[blank]
+
+    def subjects(self):
+        return {s for s, _, _ in self.triples.values() if s is not None}
+
+    def render(self, term, depth=0):
+        """Termo canônico como JSON: IRI, literal ou a estrutura do nó em branco."""
+        if not _is_blank(term):
+            if term.startswith('<'):
+                return {'iri': term[1:-1]}
+            body, _, suffix = term[1:].rpartition('"')
+            literal = {'literal': body}
+            if suffix.startswith('@'):
+                literal['lang'] = suffix[1:]
+            elif suffix:
+                literal['datatype'] = suffix[3:-1]
+            return literal
+        if depth > 32:
+            return {'blank': '...'}
+        structure = {}
+        for p, o in self._blank.get(term, ()):
+            structure.setdefault(p, []).append(self.render(o, depth + 1))
+        return {'blank': structure}
+
+
+# --- diff ----------------------------------------------------------------------------
+
+
+def _merge(old, new):
+    """Hashes só de ``old`` e só de ``new`` (as duas listas já ordenadas)."""
+    removed, added = [], []
+    i = j = 0
+    while i < len(old) and j < len(new):
+        if old[i] == new[j]:
+            i += 1
+            j += 1
+        elif old[i] < new[j]:
+            removed.append(old[i])
+            i += 1
+        else:
+            added.append(new[j])
+            j += 1
+    removed.extend(old[i:])
+    added.extend(new[j:])
+    return removed, added
+
+
+def _local_name(iri):
+    return re.split(r'[#/]', iri.rstrip('#/'))[-1]
+
+
+def diff(old, new):
+    """
+    Diferenças de ``old`` para ``new`` (``TripleSet``), agrupadas por entidade.
+
+    Retorna ``{'summary': {...}, 'changes': {grupo: [...]}}``; cada entidade traz
+    ``status`` (added, removed, modified) e as triplas ``added``/``removed`` dela.
+    """
+    removed, added = _merge(old.hashes, new.hashes)
+    entities, axioms = {}, []
+    old_subjects = new_subjects = None
+    for side, hashes, key in ((old, removed, 'removed'), (new, added, 'added')):
+        for h in hashes:
+            s, p, o = side.triples[h]
+            if s is None:
+                axioms.append({'status': key, 'axiom': side.render(o)})
+                continue
+            entity = entities.get(s)
+            if entity is None:
+                entity = entities[s] = {'iri': s, 'name': _local_name(s), 'added': [], 'removed': []}
+            entity[key].append({'predicate': p, 'value': side.render(o)})
+
+    if entities:
+        old_subjects, new_subjects = old.subjects(), new.subjects()
+    changes = {group: [] for group in GROUP_ORDER}
+    for iri in sorted(entities):
+        entity = entities[iri]
+        if iri not in old_subjects:
+            entity['status'] = 'added'
+        elif iri not in new_subjects:
+            entity['status'] = 'removed'
+        else:
+            entity['status'] = 'modified'
+        group = new.kinds.get(iri) or old.kinds.get(iri) or 'other'
+        changes[group].append(entity)
+    changes['axioms'] = axioms
+    return {
+        'summary': {
+            'triples_added': len(added),
+            'triples_removed': len(removed),
+            'entities_changed': len(entities),
+            'unchanged': len(old.hashes) - len(removed),
+        },
+        'changes': {group: items for group, items in changes.items() if items},
+    }
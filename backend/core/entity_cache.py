@@ -0,0 +1,73 @@
+"""
+Cache dos dicts serializados de cada entidade de uma ontologia aberta, por IRI.
+
+As views de leitura montam as respostas com ``serialize`` e só recalculam as
+entidades que não estão no cache; as mutações marcam como sujas (removem) as
+entidades que tocaram, a partir do ``ChangeSet``. Os dicts devolvidos são
+compartilhados: quem precisar alterá-los deve copiar antes.
+"""
+import threading
+
+
+class SerializationCache:
+    def __init__(self):
+        # iri -> {nome do serializador: dict}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def serialize(self, entities, serializer, bulk=None):
+        """
+        ``[serializer(e) for e in entities]``, reaproveitando o que estiver no cache.
+
+        ``bulk(faltando)`` (opcional) serializa de uma vez as entidades ausentes,
+        com o mesmo resultado de ``serializer``.
+        """
+        name = serializer.__name__
+        entities = list(entities)
+        result = [None] * len(entities)
+        missing = []
+        with self._lock:
+            for i, entity in enumerate(entities):
+                cached = self._entries.get(entity.iri)
+                if cached is not None and name in cached:
+                    result[i] = cached[name]
+                else:
+                    missing.append(i)
+            self.hits += len(entities) - len(missing)
+            self.misses += len(missing)
+        if not missing:
+            return result
+
+        pending = [entities[i] for i in missing]
+        values = bulk(pending) if bulk is not None else [serializer(e) for e in pending]
+        with self._lock:
+            for i, entity, value in zip(missing, pending, values):
+                self._entries.setdefault(entity.iri, {})[name] = value
+                result[i] = value
+        return result
+
+    def invalidate(self, iris):
+        """Marca as entidades (por IRI) como sujas: a próxima leitura as recalcula."""
+        with self._lock:
+            for iri in iris:
+                if self._entries.pop(iri, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'entities': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / requests, 3) if requests else None,
+                'invalidations': self.invalidations,
+            }
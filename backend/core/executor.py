@@ -0,0 +1,108 @@
+"""
+Executores limitados para o trabalho bloqueante das views assíncronas.
+
+Sob ASGI as views são ``async``: o parse, a serialização e as consultas do
+Owlready2 (todas bloqueantes) rodam num pool de threads e o event loop fica livre.
+Há dois pools: ``heavy`` (upload/parse, exportação, importação em massa) e
+``light`` (listagens, consultas e mutações), para que cargas lentas não ocupem as
+threads das chamadas baratas. Cada pool tem um limite de fila; acima dele a
+requisição é recusada com 503 em vez de acumular.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse
+
+_END = object()
+
+
+class ExecutorSaturated(RuntimeError):
+    def __init__(self, name):
+        super().__init__(f'Servidor ocupado ({name}): tente novamente em instantes')
+
+
+class BoundedExecutor:
+    def __init__(self, name, max_workers, max_queue):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'ontology-{name}')
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _submit(self, fn, *args, **kwargs):
+        def task():
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        with self._lock:
+            self.queued += 1
+        return asyncio.wrap_future(self._pool.submit(task))
+
+    async def run(self, fn, *args, **kwargs):
+        """Executa ``fn`` no pool; levanta ``ExecutorSaturated`` se a fila estiver cheia."""
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturated(self.name)
+        return await self._submit(fn, *args, **kwargs)
+
+    async def iterate(self, iterator):
+        """Consome um iterador bloqueante (ex.: exportação em streaming) no pool."""
+        iterator = iter(iterator)
+        while True:
+            item = await self._submit(next, iterator, _END)
+            if item is _END:
+                return
+            yield item
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'active': self.active,
+                'queued': self.queued,
+                'max_queue': self.max_queue,
+                'saturation': round(self.active / self.max_workers, 3),
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+
+light = BoundedExecutor('light', settings.ONTOLOGY_LIGHT_WORKERS, settings.ONTOLOGY_LIGHT_MAX_QUEUE)
+heavy = BoundedExecutor('heavy', settings.ONTOLOGY_HEAVY_WORKERS, settings.ONTOLOGY_HEAVY_MAX_QUEUE)
+
+
+def offload(executor):
+    """
+    Transforma uma view síncrona numa view ``async`` que roda no ``executor``.
+
+    Sob ASGI, respostas em streaming também são consumidas no executor, bloco a
+    bloco, em vez de serem acumuladas em memória pelo Django.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                response = await executor.run(view, request, *args, **kwargs)
+            except ExecutorSaturated as e:
+                return JsonResponse({'status': 'error', 'message': str(e)}, status=503)
+            if response.streaming and not response.is_async and isinstance(request, ASGIRequest):
+                response.streaming_content = executor.iterate(response.streaming_content)
+            return response
+        return wrapper
+    return decorator
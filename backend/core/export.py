@@ -0,0 +1,235 @@
+"""
+Exportação da ontologia em streaming.
+
+``onto.save`` roda numa thread produtora e escreve direto numa fila limitada de
+blocos, que a resposta consome como gerador: o cliente recebe os primeiros bytes
+enquanto a serialização ainda está no começo. Para que um cliente lento não segure
+o lock de leitura (nem as mutações que esperam por ele) durante o download, o lock
+só é mantido enquanto o quadstore é copiado (backup do SQLite, como na
+compactação do journal); a serialização lê a cópia.
+
+Exportações completas ficam num cache LRU em memória chaveado por
+(ontologia, revisão, formato, compressão): enquanto a ontologia não muda, as
+repetições são servidas do cache e o ETag permite ao cliente nem baixar de novo.
+"""
+import hashlib
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import nullcontext
+
+from . import store
+
+# formato -> (content type, extensão)
+FORMATS = {
+    'rdfxml': ('application/rdf+xml', '.owl'),
+    'ntriples': ('application/n-triples', '.nt'),
+    'nquads': ('application/n-quads', '.nq'),
+}
+COMPRESSIONS = ('gzip',)
+
+CHUNK_SIZE = 64 * 1024
+# Blocos aguardando o cliente; limita a memória quando o cliente é lento
+MAX_PENDING_CHUNKS = 16
+
+_DONE = object()
+
+
+class ExportCancelled(Exception):
+    """O cliente desconectou antes do fim da exportação."""
+
+
+class _QueueWriter:
+    """Arquivo só-escrita que agrupa os bytes em blocos e os entrega à fila."""
+
+    def __init__(self, chunks, cancelled, compress=None):
+        self.chunks = chunks
+        self.cancelled = cancelled
+        self.buffer = bytearray()
+        # wbits=31: formato gzip (cabeçalho + CRC), não zlib puro
+        self.compressor = zlib.compressobj(wbits=31) if compress == 'gzip' else None
+
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= CHUNK_SIZE:
+            self._emit(bytes(self.buffer))
+            self.buffer.clear()
+        return len(data)
+
+    def close(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        if self.compressor is not None:
+            data = self.compressor.compress(data) + self.compressor.flush()
+            self.compressor = None
+            self._put(data)
+        elif data:
+            self._put(data)
+
+    def _emit(self, data):
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+        if data:
+            self._put(data)
+
+    def _put(self, item):
+        while True:
+            if self.cancelled.is_set():
+                raise ExportCancelled()
+            try:
+                self.chunks.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+
+def _snapshot(onto, lock):
+    """
+    Copia o quadstore da ontologia (com ``lock``, se houver) para um arquivo
+    temporário ao lado dele e devolve o caminho da cópia.
+    """
+    fd, path = tempfile.mkstemp(prefix='export-', suffix='.sqlite3', dir=os.path.dirname(onto.world.filename))
+    os.close(fd)
+    try:
+        target = sqlite3.connect(path)
+        try:
+            with lock or nullcontext():
+                onto.world.graph.db.backup(target)
+        finally:
+            target.close()
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def stream_ontology(onto, format='rdfxml', compress=None, lock=None):
+    """
+    Gera a ontologia serializada em blocos de bytes.
+
+    ``lock`` (opcional) é mantido só durante a cópia do quadstore, para que
+    mutações não apareçam pela metade no arquivo exportado; a serialização e o
+    envio leem a cópia, sem o lock.
+    """
+    if format not in FORMATS:
+        raise ValueError(f'Formato "{format}" não suportado')
+    if compress is not None and compress not in COMPRESSIONS:
+        raise ValueError(f'Compressão "{compress}" não suportada')
+
+    chunks = queue.Queue(maxsize=MAX_PENDING_CHUNKS)
+    cancelled = threading.Event()
+
+    def produce():
+        writer = _QueueWriter(chunks, cancelled, compress)
+        try:
+            path = _snapshot(onto, lock)
+            try:
+                copy = store.open_world(path)
+                try:
+                    copy.get_ontology(onto.base_iri).load().save(file=writer, format=format)
+                finally:
+                    copy.close()
+            finally:
+                os.remove(path)
+            writer.close()
+        except ExportCancelled:
+            return
+        except Exception as e:
+            _put_final(e)
+            return
+        _put_final(_DONE)
+
+    def _put_final(item):
+        while not cancelled.is_set():
+            try:
+                chunks.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def consume():
+        producer = threading.Thread(target=produce, name='ontology-export', daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = chunks.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Cliente desconectou (gerador fechado) ou terminou: libera o produtor
+            cancelled.set()
+
+    return consume()
+
+
+def export_filename(filename, format='rdfxml', compress=None):
+    """Nome do arquivo com a extensão do formato (e ``.gz`` se comprimido)."""
+    if filename.endswith('.gz'):
+        filename = filename[:-3]
+    for _, ext in FORMATS.values():
+        if filename.endswith(ext):
+            filename = filename[:-len(ext)]
+    filename += FORMATS[format][1]
+    if compress == 'gzip':
+        filename += '.gz'
+    return filename
+
+
+def export_etag(key):
+    """ETag (forte) de uma exportação; ``key`` identifica a ontologia e a revisão."""
+    return '"%s"' % hashlib.sha1(repr(key).encode()).hexdigest()[:20]
+
+
+class ExportCache:
+    """
+    Exportações serializadas, em LRU limitado pelo total de bytes.
+
+    As chaves incluem a revisão, então nada precisa ser invalidado: uma mutação
+    gera uma chave nova e as entradas antigas saem pelo LRU.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+            return content
+
+    def put(self, key, content):
+        if len(content) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key))
+            self._entries[key] = content
+            self.size += len(content)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def tee(self, key, chunks, is_current):
+        """
+        Repassa ``chunks`` e, ao final, guarda o conteúdo completo no cache se
+        ``is_current()`` confirmar que a ontologia não mudou durante a serialização.
+        """
+        parts, size = [], 0
+        for chunk in chunks:
+            size += len(chunk)
+            if size <= self.max_bytes:
+                parts.append(chunk)
+            yield chunk
+        if size <= self.max_bytes and is_current():
+            self.put(key, b''.join(parts))
@@ -0,0 +1,146 @@
+"""
+Consulta paginada da hierarquia de classes.
+
+Em vez de montar a árvore inteira, devolve uma página de filhos de uma classe (ou
+das raízes), cada nó com a contagem de filhos para o frontend expandir sob demanda.
+"""
+import base64
+import json
+from collections import deque
+
+from owlready2.base import rdf_type, owl_class, owl_thing, rdfs_subclassof
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_DEPTH = 5
+
+
+def encode_cursor(entity):
+    return encode_key(_sort_key(entity))
+
+
+def encode_key(key):
+    """Cursor da chave (nome, IRI) do último item entregue."""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Chave de ordenação do último item já entregue (``ValueError`` se inválido)."""
+    try:
+        name, iri = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError('Cursor inválido')
+    return name, iri
+
+
+def _sort_key(entity):
+    return entity.name or "", entity.iri
+
+
+# Classes da ontologia sem superclasse nomeada (além de owl:Thing). ``o3po_name`` é
+# registrada em ``store.open_world``
+_ROOTS = """
+    SELECT r.storid AS s, o3po_name(r.iri) AS name, r.iri AS iri FROM resources r WHERE r.storid IN (
+        SELECT q.s FROM objs q WHERE q.c=? AND q.p=? AND q.o=? AND q.s > 0 AND NOT EXISTS (
+            SELECT 1 FROM objs sup WHERE sup.s=q.s AND sup.p=? AND sup.o > 0 AND sup.o != ?
+        ))"""
+
+# Todas as classes da ontologia (quando nenhuma é raiz, ex.: ciclos de subClassOf)
+_CLASSES = """
+    SELECT r.storid AS s, o3po_name(r.iri) AS name, r.iri AS iri FROM resources r WHERE r.storid IN (
+        SELECT s FROM objs WHERE c=? AND p=? AND o=? AND s > 0)"""
+
+# Subclasses diretas de uma classe
+_CHILDREN = """
+    SELECT r.storid AS s, o3po_name(r.iri) AS name, r.iri AS iri FROM resources r WHERE r.storid IN (
+        SELECT s FROM objs WHERE p=? AND o=? AND s > 0)"""
+
+
+def root_classes(onto):
+    """
+    Classes da ontologia sem superclasse nomeada (além de owl:Thing).
+
+    Uma única consulta ao quadstore, sem carregar todas as classes; se a ontologia
+    não tiver raízes explícitas, cai no mesmo fallback da árvore completa.
+    """
+    world = onto.world
+    rows = world.graph.execute(_ROOTS, _roots_params(onto)).fetchall()
+    roots = [world._get_by_storid(storid) for storid, _, _ in rows]
+    return [c for c in roots if c is not None] or list(onto.classes())
+
+
+def _roots_params(onto):
+    return onto.graph.c, rdf_type, owl_class, rdfs_subclassof, owl_thing
+
+
+def child_counts(world, storids):
+    """``{storid: número de subclasses diretas}`` das classes, numa consulta agrupada."""
+    if not storids:
+        return {}
+    marks = ','.join('?' * len(storids))
+    return dict(world.graph.execute(
+        f"SELECT o, COUNT(DISTINCT s) FROM objs WHERE p=? AND s > 0 AND o IN ({marks}) GROUP BY o",
+        (rdfs_subclassof, *storids)))
+
+
+def children_page(onto, parent=None, cursor=None, limit=DEFAULT_PAGE_SIZE, depth=1):
+    """
+    Uma página (ordenada por nome) das subclasses diretas de ``parent`` (ou das
+    classes raiz) serializada como nós da árvore.
+
+    A ordenação e o cursor ficam no SQL (``(nome, IRI) > cursor ... LIMIT``): só as
+    classes da página são carregadas, e as contagens de filhos vêm de uma consulta
+    só. O SQLite ainda ordena todos os irmãos (o esquema do Owlready2 não tem uma
+    coluna de nome para indexar), mas sem criar uma entidade Python por irmão. Com ``depth > 1`` cada nó traz também a primeira página dos seus filhos.
+    Retorna ``(nodes, next_cursor)``.
+    """
+    world = onto.world
+    if parent is not None:
+        select, params = _CHILDREN, (rdfs_subclassof, parent.storid)
+    else:
+        select, params = _ROOTS, _roots_params(onto)
+        if world.graph.execute(f"{select} LIMIT 1", params).fetchone() is None:
+            select, params = _CLASSES, _roots_params(onto)[:3]
+
+    # MATERIALIZED: o nome é calculado uma vez por classe, não no filtro e de novo na ordenação
+    sql = f"WITH classes AS MATERIALIZED ({select}) SELECT s, name, iri FROM classes"
+    if cursor:
+        sql += " WHERE (name, iri) > (?, ?)"
+        params = (*params, *decode_cursor(cursor))
+    rows = world.graph.execute(f"{sql} ORDER BY name, iri LIMIT ?", (*params, limit + 1)).fetchall()
+    page = rows[:limit]
+    next_cursor = encode_key(page[-1][1:]) if len(rows) > limit else None
+
+    counts = child_counts(world, [storid for storid, _, _ in page])
+    nodes = []
+    for storid, name, iri in page:
+        node = {'name': name, 'iri': iri, 'child_count': counts.get(storid, 0)}
+        if depth > 1 and node['child_count']:
+            node['children'], node['next_cursor'] = children_page(
+                onto, world._get_by_storid(storid), limit=limit, depth=depth - 1)
+        nodes.append(node)
+    return nodes, next_cursor
+
+
+def build_class_graph(roots):
+    """
+    Hierarquia como tabela de nós + arestas pai -> filhos.
+
+    Percorre em largura a partir de ``roots`` emitindo cada classe uma única vez,
+    então poli-hierarquias não duplicam subárvores e ciclos não travam a busca.
+    """
+    roots = sorted(roots, key=_sort_key)
+    nodes, edges = {}, {}
+    seen = set(roots)
+    queue = deque(roots)
+    while queue:
+        cls = queue.popleft()
+        nodes[cls.iri] = {'name': cls.name, 'iri': cls.iri}
+        children = sorted(cls.subclasses(), key=_sort_key)
+        if children:
+            edges[cls.iri] = [child.iri for child in children]
+        for child in children:
+            if child not in seen:
+                seen.add(child)
+                queue.append(child)
+    return {'roots': [cls.iri for cls in roots], 'nodes': nodes, 'edges': edges}
@@ -0,0 +1,282 @@
+"""
+Desfazer/refazer e snapshots nomeados, sobre as alterações do quadstore.
+
+Enquanto uma mutação roda, triggers (temporários, da conexão do World) copiam
+cada linha inserida ou apagada de ``objs``/``datas`` para ``o3po_changes``, sob
+o número do passo (a revisão que a mutação vai gravar). Desfazer um passo é
+aplicar essas linhas ao contrário; refazer, aplicá-las de novo: o custo é o
+tamanho da alteração, não o da ontologia.
+
+Um snapshot é só o nome de uma posição no histórico (o último passo aplicado
+quando foi tirado). Restaurá-lo desfaz ou refaz os passos até essa posição, e
+os passos que ele precisa não são descartados. Fora isso, só os últimos
+``ONTOLOGY_UNDO_LIMIT`` passos são guardados; uma mutação nova descarta os passos
+desfeitos (e os snapshots que apontavam para eles).
+"""
+import time
+from contextlib import contextmanager
+
+from owlready2.base import rdf_type
+
+from . import store
+
+# Operações do histórico, como aparecem no journal
+UNDO, REDO, RESTORE = 'undo', 'redo', 'restore_snapshot'
+OPS = (UNDO, REDO, RESTORE)
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS o3po_history (step INTEGER PRIMARY KEY, op TEXT, time REAL, undone INTEGER NOT NULL DEFAULT 0)",
+    # action: 1 = linha inserida, -1 = apagada; tbl: 0 = objs, 1 = datas. Sem tipo
+    # nas colunas, para os valores de ``datas.o`` voltarem com o mesmo tipo
+    "CREATE TABLE IF NOT EXISTS o3po_changes (step INTEGER, action INTEGER, tbl INTEGER, c, s, p, o, d)",
+    "CREATE INDEX IF NOT EXISTS o3po_changes_step ON o3po_changes (step)",
+    "CREATE TABLE IF NOT EXISTS o3po_snapshots (name TEXT PRIMARY KEY, step INTEGER, revision INTEGER, time REAL)",
+]
+
+# ``o3po_recording.step`` é o passo sendo gravado (NULL fora das mutações; é o
+# valor que fica em todo commit). Numa tabela temporária e não numa função Python:
+# a condição do trigger roda a cada linha escrita, e chamar Python por linha deixava
+# as inserções em massa várias vezes mais lentas
+_RECORDING = [
+    "CREATE TEMP TABLE IF NOT EXISTS o3po_recording (step INTEGER)",
+    "INSERT INTO o3po_recording SELECT NULL WHERE NOT EXISTS (SELECT 1 FROM o3po_recording)",
+]
+_STEP = "(SELECT step FROM o3po_recording)"
+_TRIGGER = f"""
+CREATE TEMP TRIGGER IF NOT EXISTS o3po_{{table}}_{{event}} AFTER {{event}} ON {{table}}
+WHEN {_STEP} IS NOT NULL
+BEGIN
+{{body}}
+END"""
+
+
+def _record(action, tbl, row):
+    d = f'{row}.d' if tbl else 'NULL'
+    return (f"INSERT INTO o3po_changes (step, action, tbl, c, s, p, o, d) "
+            f"VALUES ({_STEP}, {action}, {tbl}, {row}.c, {row}.s, {row}.p, {row}.o, {d});")
+
+
+def _triggers():
+    for tbl, table in enumerate(('objs', 'datas')):
+        yield _TRIGGER.format(table=table, event='INSERT', body=_record(1, tbl, 'NEW'))
+        yield _TRIGGER.format(table=table, event='DELETE', body=_record(-1, tbl, 'OLD'))
+        yield _TRIGGER.format(table=table, event='UPDATE', body=_record(-1, tbl, 'OLD') + '\n' + _record(1, tbl, 'NEW'))
+
+
+class HistoryError(Exception):
+    """Não há o que desfazer/refazer, ou o snapshot não pode ser alcançado."""
+
+
+class SnapshotNotFound(LookupError):
+    def __init__(self, name):
+        self.name = name
+        super().__init__(f'Snapshot "{name}" não encontrado')
+
+
+class History:
+    def __init__(self, onto, limit, max_snapshots):
+        self.onto = onto
+        self.limit = limit
+        self.max_snapshots = max_snapshots
+        graph = onto.world.graph
+        for statement in [*_SCHEMA, *_RECORDING, *_triggers()]:
+            graph.execute(statement)
+        if 'history_floor' not in store.get_state(onto):
+            # Nenhum passo antes desta revisão pode ser desfeito
+            store.set_state(onto, history_floor=store.get_revision(onto))
+        store.commit(onto)
+
+    def _execute(self, sql, params=()):
+        return self.onto.world.graph.execute(sql, params)
+
+    # --- gravação ------------------------------------------------------------------
+
+    @contextmanager
+    def record(self, op):
+        """
+        Grava as linhas alteradas dentro do bloco como o passo ``op``.
+
+        O passo é a próxima revisão: o bloco deve terminar com ``bump_revision``
+        antes do commit. Se o bloco levantar exceção, nada é registrado (as linhas
+        somem no rollback da transação).
+        """
+        step = self.next_step()
+        self._execute("UPDATE o3po_recording SET step=?", (step,))
+        try:
+            yield
+        finally:
+            self._execute("UPDATE o3po_recording SET step=NULL")
+        if self._execute("SELECT 1 FROM o3po_changes WHERE step=? LIMIT 1", (step,)).fetchone():
+            self._discard_undone()
+            self._execute("INSERT INTO o3po_history (step, op, time) VALUES (?, ?, ?)", (step, op, time.time()))
+            self._prune()
+
+    def _discard_undone(self):
+        """Uma mutação nova apaga os passos desfeitos (não há mais como refazê-los)."""
+        first, = self._execute("SELECT MIN(step) FROM o3po_history WHERE undone").fetchone()
+        if first is None:
+            return
+        # O passo novo já está em o3po_changes: só saem os desfeitos
+        self._execute("DELETE FROM o3po_changes WHERE step IN (SELECT step FROM o3po_history WHERE undone)")
+        self._execute("DELETE FROM o3po_history WHERE undone")
+        self._execute("DELETE FROM o3po_snapshots WHERE step >= ?", (first,))
+
+    def _prune(self):
+        """Mantém ``limit`` passos, sem apagar os que algum snapshot ainda precisa."""
+        count, = self._execute("SELECT COUNT(*) FROM o3po_history").fetchone()
+        if count <= self.limit:
+            return
+        pinned, = self._execute("SELECT MIN(step) FROM o3po_snapshots").fetchone()
+        cut, = self._execute(
+            "SELECT step FROM o3po_history ORDER BY step LIMIT 1 OFFSET ?", (count - self.limit - 1,)).fetchone()
+        if pinned is not None:
+            cut = min(cut, pinned)
+        if cut <= store.get_state(self.onto).get('history_floor', 0):
+            return
+        self._execute("DELETE FROM o3po_changes WHERE step <= ?", (cut,))
+        self._execute("DELETE FROM o3po_history WHERE step <= ?", (cut,))
+        store.set_state(self.onto, history_floor=cut)
+
+    # --- consulta ------------------------------------------------------------------
+
+    def next_step(self):
+        """Número do passo que a próxima mutação vai gravar."""
+        return store.get_revision(self.onto) + 1
+
+    def touched(self, step):
+        """
+        Storids das entidades tocadas pelas linhas gravadas em ``step``. Para uma
+        mutação que falhou, deve ser chamado antes do rollback (que apaga as linhas).
+        """
+        return self._touched(self._execute("SELECT tbl, s, p, o FROM o3po_changes WHERE step=?", (step,)))
+
+    def position(self):
+        """Último passo aplicado: o estado atual é o de logo depois dele."""
+        step, = self._execute("SELECT MAX(step) FROM o3po_history WHERE NOT undone").fetchone()
+        return step if step is not None else store.get_state(self.onto).get('history_floor', 0)
+
+    def steps(self):
+        return [{'step': step, 'op': op, 'time': at, 'undone': bool(undone)}
+                for step, op, at, undone in self._execute(
+                    "SELECT step, op, time, undone FROM o3po_history ORDER BY step")]
+
+    def status(self):
+        undo, redo = self._execute(
+            "SELECT COUNT(*) - COALESCE(SUM(undone), 0), COALESCE(SUM(undone), 0) FROM o3po_history").fetchone()
+        return {'position': self.position(), 'undo': undo, 'redo': redo, 'limit': self.limit}
+
+    def snapshots(self):
+        return [{'name': name, 'step': step, 'revision': revision, 'time': at}
+                for name, step, revision, at in self._execute(
+                    "SELECT name, step, revision, time FROM o3po_snapshots ORDER BY time")]
+
+    def snapshot_step(self, name):
+        row = self._execute("SELECT step FROM o3po_snapshots WHERE name=?", (name,)).fetchone()
+        if row is None:
+            raise SnapshotNotFound(name)
+        return row[0]
+
+    def path(self, target):
+        """
+        Passos para ir da posição atual até ``target``: ``[(passo, inverso)]`` na
+        ordem de aplicação (``inverso`` ao desfazer).
+        """
+        position = self.position()
+        if target < position:
+            if target < store.get_state(self.onto).get('history_floor', 0):
+                raise HistoryError('Os passos até esse ponto já saíram do histórico')
+            return [(step, True) for step, in self._execute(
+                "SELECT step FROM o3po_history WHERE NOT undone AND step > ? ORDER BY step DESC", (target,))]
+        steps = [(step, False) for step, in self._execute(
+            "SELECT step FROM o3po_history WHERE undone AND step <= ? ORDER BY step", (target,))]
+        if target > position and (not steps or steps[-1][0] != target):
+            raise HistoryError('Esse ponto do histórico não existe mais')
+        return steps
+
+    def changes(self, steps):
+        """
+        Linhas ``(sinal, tbl, c, s, p, o, d)`` que levam o quadstore pelos ``steps``
+        (de ``path``), na ordem: sinal 1 insere, -1 apaga.
+        """
+        for step, inverse in steps:
+            order = 'DESC' if inverse else 'ASC'
+            for action, tbl, c, s, p, o, d in self._execute(
+                    f"SELECT action, tbl, c, s, p, o, d FROM o3po_changes WHERE step=? ORDER BY rowid {order}", (step,)):
+                yield (-action if inverse else action), tbl, c, s, p, o, d
+
+    # --- aplicação -----------------------------------------------------------------
+
+    def snapshot(self, name):
+        """Marca a posição atual como ``name`` (substitui um snapshot com o mesmo nome)."""
+        exists = self._execute("SELECT 1 FROM o3po_snapshots WHERE name=?", (name,)).fetchone()
+        count, = self._execute("SELECT COUNT(*) FROM o3po_snapshots").fetchone()
+        if not exists and count >= self.max_snapshots:
+            raise HistoryError(f'Limite de {self.max_snapshots} snapshots atingido: remova algum antes')
+        snapshot = {'name': name, 'step': self.position(), 'revision': store.get_revision(self.onto), 'time': time.time()}
+        self._execute("INSERT OR REPLACE INTO o3po_snapshots (name, step, revision, time) VALUES (?, ?, ?, ?)",
+                      (name, snapshot['step'], snapshot['revision'], snapshot['time']))
+        return snapshot
+
+    def delete_snapshot(self, name):
+        if self._execute("DELETE FROM o3po_snapshots WHERE name=?", (name,)).rowcount == 0:
+            raise SnapshotNotFound(name)
+
+    def apply(self, op, data):
+        """
+        Desfaz (``undo``), refaz (``redo``) ou restaura o snapshot ``data['name']``
+        no quadstore. Retorna os storids dos sujeitos e objetos tocados.
+        """
+        if op == UNDO:
+            row = self._execute("SELECT MAX(step) FROM o3po_history WHERE NOT undone").fetchone()
+            if row[0] is None:
+                raise HistoryError('Nada para desfazer')
+            steps = [(row[0], True)]
+        elif op == REDO:
+            row = self._execute("SELECT MIN(step) FROM o3po_history WHERE undone").fetchone()
+            if row[0] is None:
+                raise HistoryError('Nada para refazer')
+            steps = [(row[0], False)]
+        elif op == RESTORE:
+            steps = self.path(self.snapshot_step(data.get('name')))
+        else:
+            raise ValueError(f'Operação de histórico desconhecida: {op}')
+
+        rows = list(self.changes(steps))
+        for sign, tbl, c, s, p, o, d in rows:
+            table = 'datas' if tbl else 'objs'
+            if sign > 0:
+                if tbl:
+                    self._execute("INSERT INTO datas (c, s, p, o, d) VALUES (?, ?, ?, ?, ?)", (c, s, p, o, d))
+                else:
+                    self._execute("INSERT INTO objs (c, s, p, o) VALUES (?, ?, ?, ?)", (c, s, p, o))
+            else:
+                where = "c=? AND s=? AND p=? AND o=?" + (" AND d IS ?" if tbl else "")
+                params = (c, s, p, o, d) if tbl else (c, s, p, o)
+                self._execute(f"DELETE FROM {table} WHERE rowid = (SELECT rowid FROM {table} WHERE {where} LIMIT 1)",
+                              params)
+        for step, inverse in steps:
+            self._execute("UPDATE o3po_history SET undone=? WHERE step=?", (int(inverse), step))
+        return self._touched((tbl, s, p, o) for _, tbl, _, s, p, o, _ in rows)
+
+    def _touched(self, rows):
+        """Sujeitos e objetos (entidades) de linhas ``(tbl, s, p, o)``."""
+        touched = set()
+        for tbl, s, p, o in rows:
+            touched.add(s)
+            if not tbl and p != rdf_type:
+                touched.add(o)
+        return self._owners(touched)
+
+    def _owners(self, storids):
+        """Troca os nós em branco tocados pelas entidades que os usam (restrições, listas)."""
+        result, pending, seen = set(), list(storids), set()
+        while pending:
+            storid = pending.pop()
+            if storid in seen:
+                continue
+            seen.add(storid)
+            if storid > 0:
+                result.add(storid)
+            else:
+                pending.extend(s for s, in self._execute("SELECT s FROM objs WHERE o=?", (storid,)))
+        return result
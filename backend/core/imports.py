@@ -0,0 +1,402 @@
+"""
+Resolução dos ``owl:imports`` sem depender da rede.
+
+Antes do parse, os imports do arquivo enviado (e os imports deles) são lidos do
+cabeçalho e resolvidos pelo catálogo local em ``ONTOLOGY_IMPORTS_DIR``:
+
+* ``catalog.json``: ``{"IRI do import": "arquivo"}``, mantido por este módulo;
+* ``catalog-v001.xml`` (o catálogo do Protégé), se existir, só para leitura.
+
+Imports fora do catálogo são baixados em paralelo para o mesmo diretório e
+registrados no catálogo (a não ser com ``ONTOLOGY_IMPORTS_OFFLINE``). Os que não
+puderem ser resolvidos viram ontologias vazias no quadstore, para o Owlready2 não
+tentar baixá-los no parse nem ao reabrir a ontologia.
+
+Cada import parseado é guardado à parte, por IRI e sha256 do arquivo (ver
+``ParsedImports``): um import compartilhado (iao.owl, por exemplo) é parseado uma
+vez e só copiado, por SQL, para o quadstore das próximas ontologias que o usarem,
+seja qual for o resto do conjunto. Por cima disso, o quadstore base com todos os
+imports é guardado por conjunto (IRIs e sha256 dos arquivos): toda ontologia que
+importa exatamente o mesmo conjunto parte de uma cópia dele sem compor nada.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from owlready2.namespace import Metadata
+
+logger = logging.getLogger(__name__)
+
+OWL_IMPORTS = '{http://www.w3.org/2002/07/owl#}imports'
+OWL_ONTOLOGY = '{http://www.w3.org/2002/07/owl#}Ontology'
+RDF_RESOURCE = '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}resource'
+# owl:imports em Turtle / N-Triples
+_TEXT_IMPORTS_RE = re.compile(r'(?:owl:imports|<http://www\.w3\.org/2002/07/owl#imports>)\s+<([^>]+)>')
+
+ACCEPT = 'application/rdf+xml, application/owl+xml;q=0.9, text/turtle;q=0.8, */*;q=0.1'
+
+
+def normalize_iri(iri):
+    return iri.rstrip('#/')
+
+
+def scan_imports(path):
+    """IRIs dos ``owl:imports`` declarados no cabeçalho da ontologia em ``path``."""
+    imports = []
+    try:
+        with open(path, 'rb') as f:
+            for event, elem in ET.iterparse(f, events=('end',)):
+                if elem.tag == OWL_IMPORTS and elem.get(RDF_RESOURCE):
+                    imports.append(elem.get(RDF_RESOURCE))
+                elif elem.tag == OWL_ONTOLOGY:
+                    # Os imports ficam no cabeçalho: o resto do arquivo não interessa
+                    break
+    except ET.ParseError:
+        # Não é RDF/XML (Turtle, N-Triples...)
+        with open(path, encoding='utf-8', errors='replace') as f:
+            imports = _TEXT_IMPORTS_RE.findall(f.read())
+    return list(dict.fromkeys(imports))
+
+
+class ImportCatalog:
+    """IRI de import -> arquivo local, em ``directory``."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._path = os.path.join(directory, 'catalog.json')
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _read(self):
+        entries = {}
+        protege = os.path.join(self.directory, 'catalog-v001.xml')
+        if os.path.exists(protege):
+            for elem in ET.parse(protege).iter():
+                if elem.tag.endswith('}uri') and elem.get('name') and elem.get('uri'):
+                    entries[normalize_iri(elem.get('name'))] = urllib.parse.unquote(elem.get('uri'))
+        if os.path.exists(self._path):
+            with open(self._path) as f:
+                entries.update({normalize_iri(iri): name for iri, name in json.load(f).items()})
+        return entries
+
+    def entries(self):
+        with self._lock:
+            return self._read()
+
+    def resolve(self, iri):
+        """Caminho do arquivo local do import (``None`` se não estiver no catálogo)."""
+        name = self.entries().get(normalize_iri(iri))
+        if name is None:
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def add(self, iri, name):
+        """Registra ``name`` (arquivo já em ``directory``) como o conteúdo de ``iri``."""
+        with self._lock:
+            entries = {}
+            if os.path.exists(self._path):
+                with open(self._path) as f:
+                    entries = json.load(f)
+            entries[normalize_iri(iri)] = name
+            tmp = f"{self._path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(entries, f, indent=2, sort_keys=True)
+            os.replace(tmp, self._path)
+
+    def store(self, iri, fileobj):
+        """Grava o conteúdo de ``fileobj`` como o arquivo local de ``iri``."""
+        base = os.path.basename(urllib.parse.urlparse(iri).path.rstrip('/')) or 'ontology'
+        name = f"{hashlib.sha256(normalize_iri(iri).encode()).hexdigest()[:12]}-{base}"
+        path = os.path.join(self.directory, name)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, 'wb') as f:
+            shutil.copyfileobj(fileobj, f)
+        os.replace(tmp, path)
+        self.add(iri, name)
+        return path
+
+
+class ImportPlan:
+    """Imports de uma ontologia: resolvidos (na ordem de parse) e faltantes."""
+
+    def __init__(self, resolved, missing):
+        # [(IRI, arquivo)], cada import depois dos que ele importa
+        self.resolved = resolved
+        self.missing = missing
+
+    def __bool__(self):
+        return bool(self.resolved or self.missing)
+
+    def key(self):
+        """Identifica o conjunto de imports (pelo conteúdo dos arquivos)."""
+        digest = hashlib.sha256()
+        for iri, path in self.resolved:
+            digest.update(f"{iri}\0{_file_digest(path)}\n".encode())
+        for iri in self.missing:
+            digest.update(f"{iri}\0\n".encode())
+        return digest.hexdigest()
+
+    def load(self, world, parsed=None):
+        """
+        Parseia os imports no ``world`` (e cria as ontologias vazias dos faltantes).
+
+        Com ``parsed`` (um ``ParsedImports``), os imports já parseados antes são
+        copiados de lá em vez de parseados, e os novos são guardados nele.
+        """
+        for iri in self.missing:
+            placeholder = world.get_ontology(iri)
+            placeholder.graph.set_last_update_time(time.time())
+            placeholder.loaded = True
+            logger.warning(f"Import {iri} não encontrado no catálogo local: carregado vazio")
+        for iri, path in self.resolved:
+            if parsed is not None and parsed.compose(world, iri, path):
+                continue
+            with open(path, 'rb') as f:
+                onto = world.get_ontology(iri).load(fileobj=f)
+            if parsed is not None:
+                parsed.put(world, onto, iri, path)
+        world.save()
+
+
+_digests = {}
+
+
+def _file_digest(path):
+    """sha256 do arquivo, guardado enquanto o tamanho e o mtime não mudarem."""
+    stat = os.stat(path)
+    cached = _digests.get(path)
+    if cached and cached[0] == (stat.st_size, stat.st_mtime_ns):
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    _digests[path] = ((stat.st_size, stat.st_mtime_ns), digest.hexdigest())
+    return digest.hexdigest()
+
+
+class ParsedImports:
+    """
+    Imports já parseados, um arquivo SQLite por (IRI, sha256 do arquivo).
+
+    Cada arquivo tem as triplas do import (``objs`` e ``datas`` do Owlready2, sem a
+    coluna do contexto) com os storids do quadstore em que foi parseado, e os IRIs
+    desses storids (``iris``). ``compose`` copia as triplas para outro quadstore,
+    trocando os storids pelos de lá (criando os recursos que faltarem) e
+    renumerando os nós anônimos.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, iri, path):
+        return os.path.join(self.directory, hashlib.sha256(f"{iri}\0{_file_digest(path)}".encode()).hexdigest() + '.sqlite3')
+
+    def put(self, world, onto, iri, path):
+        """Guarda as triplas de ``onto``, recém-parseada de ``path`` no ``world``."""
+        dest = self._path(iri, path)
+        if os.path.exists(dest):
+            return
+        tmp = f"{dest}.{uuid.uuid4().hex}.tmp"
+        db = world.graph.db
+        c = onto.graph.c
+        # ATTACH e DETACH não rodam dentro de uma transação
+        db.commit()
+        db.execute("ATTACH DATABASE ? AS parsed", (tmp,))
+        try:
+            db.executescript("""
+                CREATE TABLE parsed.ontology (iri TEXT);
+                CREATE TABLE parsed.iris (storid INTEGER PRIMARY KEY, iri TEXT);
+                CREATE TABLE parsed.objs (s INTEGER, p INTEGER, o INTEGER);
+                CREATE TABLE parsed.datas (s INTEGER, p INTEGER, o BLOB, d INTEGER);
+            """)
+            # O IRI declarado no arquivo, se for outro que o do import
+            db.execute("INSERT INTO parsed.ontology SELECT iri FROM main.ontologies WHERE c=?", (c,))
+            db.execute("INSERT INTO parsed.objs SELECT s, p, o FROM main.objs WHERE c=?", (c,))
+            db.execute("INSERT INTO parsed.datas SELECT s, p, o, d FROM main.datas WHERE c=?", (c,))
+            db.execute("""
+                INSERT INTO parsed.iris SELECT storid, iri FROM main.resources WHERE storid IN (
+                    SELECT s FROM parsed.objs WHERE s > 0 UNION SELECT p FROM parsed.objs
+                    UNION SELECT o FROM parsed.objs WHERE o > 0 UNION SELECT s FROM parsed.datas WHERE s > 0
+                    UNION SELECT p FROM parsed.datas UNION SELECT d FROM parsed.datas WHERE typeof(d) = 'integer' AND d > 0)
+            """)
+            db.commit()
+        finally:
+            db.execute("DETACH DATABASE parsed")
+        os.replace(tmp, dest)
+
+    def compose(self, world, iri, path):
+        """Copia o import já parseado para o ``world``; ``False`` se ainda não houver."""
+        source = self._path(iri, path)
+        if not os.path.exists(source):
+            return False
+        onto = world.get_ontology(iri)
+        c = onto.graph.c
+        db = world.graph.db
+        db.commit()
+        db.execute("ATTACH DATABASE ? AS parsed", (source,))
+        try:
+            # Recursos que o quadstore ainda não tem, numerados depois dos existentes
+            db.execute("""
+                INSERT INTO main.resources SELECT
+                    (SELECT current_resource FROM main.store) + ROW_NUMBER() OVER (ORDER BY storid), iri
+                FROM parsed.iris WHERE iri NOT IN (SELECT iri FROM main.resources)
+            """)
+            db.execute("UPDATE main.store SET current_resource = MAX(current_resource, (SELECT MAX(storid) FROM main.resources))")
+            db.execute("""CREATE TEMP TABLE o3po_storids AS SELECT p.storid AS old, r.storid AS new
+                          FROM parsed.iris p JOIN main.resources r ON r.iri = p.iri""")
+            db.execute("CREATE UNIQUE INDEX temp.o3po_storids_old ON o3po_storids(old)")
+            # Nós anônimos (storids negativos) depois dos que o quadstore já usou
+            blank = db.execute("SELECT current_blank FROM main.store").fetchone()[0]
+            used = max(db.execute("SELECT COALESCE(-MIN(s), 0), COALESCE(-MIN(o), 0) FROM parsed.objs").fetchone()
+                       + db.execute("SELECT COALESCE(-MIN(s), 0), 0 FROM parsed.datas").fetchone())
+            db.execute("UPDATE main.store SET current_blank = current_blank + ?", (used,))
+            # Como no parse, o conteúdo do import substitui o que ``get_ontology`` criou
+            db.execute("DELETE FROM main.objs WHERE c=?", (c,))
+            db.execute("DELETE FROM main.datas WHERE c=?", (c,))
+            storid = "CASE WHEN {0} < 0 THEN {0} - :blank ELSE (SELECT new FROM o3po_storids WHERE old = {0}) END"
+            db.execute(f"""INSERT INTO main.objs SELECT :c, {storid.format('s')}, {storid.format('p')}, {storid.format('o')}
+                           FROM parsed.objs""", {'c': c, 'blank': blank})
+            db.execute(f"""INSERT INTO main.datas SELECT :c, {storid.format('s')}, {storid.format('p')}, o,
+                               CASE WHEN typeof(d) = 'integer' AND d > 0 THEN (SELECT new FROM o3po_storids WHERE old = d) ELSE d END
+                           FROM parsed.datas""", {'c': c, 'blank': blank})
+            db.execute("DROP TABLE o3po_storids")
+            base_iri = db.execute("SELECT iri FROM parsed.ontology").fetchone()[0]
+            if base_iri != onto._base_iri:
+                db.execute("UPDATE main.ontologies SET iri=? WHERE c=?", (base_iri, c))
+                db.execute("INSERT INTO main.ontology_alias VALUES (?, ?)", (base_iri, onto._base_iri))
+            onto.graph.set_last_update_time(time.time())
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        finally:
+            db.execute("DETACH DATABASE parsed")
+        if base_iri != onto._base_iri:
+            # O que o ``load`` do Owlready2 faz quando o arquivo declara outro IRI
+            onto._base_iri = base_iri
+            onto._namespaces[base_iri] = world.ontologies[base_iri] = onto
+            onto.storid = world._abbreviate(base_iri[:-1] if base_iri.endswith(('#', '/')) else base_iri)
+            onto.metadata = Metadata(onto, onto.storid)
+        # Já no quadstore: o ``load`` só carrega os imports dele e as propriedades
+        onto.load()
+        return True
+
+
+class ImportResolver:
+    def __init__(self, catalog, store_dir, offline=False, workers=4, timeout=30):
+        self.catalog = catalog
+        # Quadstores base (só os imports parseados), por ``ImportPlan.key()``
+        self.store_dir = store_dir
+        # Cada import parseado, por IRI e sha256 (ver ``ParsedImports``)
+        self.parsed = ParsedImports(os.path.join(store_dir, 'parsed'))
+        self.offline = offline
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ontology-import')
+        os.makedirs(store_dir, exist_ok=True)
+
+    def fetch(self, iri):
+        """Baixa o import para o catálogo; ``None`` se não conseguir."""
+        request = urllib.request.Request(iri, headers={'Accept': ACCEPT})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                path = self.catalog.store(iri, response)
+        except Exception as e:
+            logger.warning(f"Não foi possível baixar o import {iri}: {e}")
+            return None
+        logger.info(f"Import {iri} baixado para o catálogo local")
+        return path
+
+    def plan(self, path, fetch=True):
+        """
+        Resolve os imports de ``path``, nível a nível: os do mesmo nível que não
+        estão no catálogo são baixados em paralelo (com ``fetch`` e fora do modo
+        offline).
+        """
+        paths, missing = {}, []
+        # IRI -> IRIs importados por ele, para ordenar o parse
+        graph = {None: scan_imports(path)}
+        pending = list(graph[None])
+        while pending:
+            level = [iri for iri in dict.fromkeys(pending) if iri not in paths and iri not in missing]
+            found = {iri: self.catalog.resolve(iri) for iri in level}
+            absent = [iri for iri, local in found.items() if local is None]
+            if absent and fetch and not self.offline:
+                found.update(zip(absent, self._pool.map(self.fetch, absent)))
+            pending = []
+            for iri in level:
+                if found[iri] is None:
+                    missing.append(iri)
+                    continue
+                paths[iri] = found[iri]
+                graph[iri] = scan_imports(found[iri])
+                pending.extend(graph[iri])
+
+        # Ordem de parse: cada import depois dos que ele importa
+        ordered, seen = [], set()
+
+        def visit(iri):
+            if iri in seen:
+                return
+            seen.add(iri)
+            for child in graph.get(iri, ()):
+                visit(child)
+            if iri is not None and iri in paths:
+                ordered.append((iri, paths[iri]))
+
+        visit(None)
+        return ImportPlan(ordered, missing)
+
+    def _base_path(self, plan):
+        return os.path.join(self.store_dir, f"{plan.key()}.sqlite3")
+
+    def restore(self, plan, dest):
+        """Copia o quadstore base do ``plan`` para ``dest``; ``False`` se não houver."""
+        try:
+            shutil.copyfile(self._base_path(plan), dest)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def save(self, plan, db):
+        """Guarda o quadstore ``db`` (só com os imports parseados) como base do ``plan``."""
+        path = self._base_path(plan)
+        if os.path.exists(path):
+            return
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        target = sqlite3.connect(tmp)
+        try:
+            db.backup(target)
+        finally:
+            target.close()
+        os.replace(tmp, path)
+
+
+_resolver = None
+
+
+def get_import_resolver():
+    global _resolver
+    if _resolver is None:
+        _resolver = ImportResolver(
+            ImportCatalog(settings.ONTOLOGY_IMPORTS_DIR),
+            os.path.join(settings.ONTOLOGY_STORE_DIR, 'imports'),
+            offline=settings.ONTOLOGY_IMPORTS_OFFLINE,
+            workers=settings.ONTOLOGY_IMPORTS_FETCH_WORKERS,
+            timeout=settings.ONTOLOGY_IMPORTS_FETCH_TIMEOUT,
+        )
+    return _resolver
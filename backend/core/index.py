@@ -0,0 +1,217 @@
+"""
+Índice em memória de nome local / IRI / rdfs:label -> entidade.
+
+Substitui as buscas ``onto.search_one(iri="*nome") or onto.search_one(label=nome)``
+das views: o índice é montado uma vez quando a ontologia é carregada e atualizado a
+cada mutação, então cada resolução é um acesso a dicionário.
+
+Os indivíduos também ficam em listas ordenadas por (nome, IRI), uma geral e uma
+por classe declarada, para a listagem paginada (ver ``individuals``), no índice de
+busca textual (ver ``search``) e, classes e propriedades, no fecho transitivo da
+hierarquia (ver ``closure``).
+"""
+from bisect import bisect_left, insort
+
+from owlready2 import (
+    AnnotationPropertyClass, DataPropertyClass, ObjectPropertyClass, Thing, ThingClass,
+)
+
+from .closure import ClosureIndex
+from .search import SearchIndex
+
+CLASS = 'class'
+OBJECT_PROPERTY = 'object_property'
+DATA_PROPERTY = 'data_property'
+ANNOTATION_PROPERTY = 'annotation_property'
+INDIVIDUAL = 'individual'
+
+KINDS = (CLASS, OBJECT_PROPERTY, DATA_PROPERTY, ANNOTATION_PROPERTY, INDIVIDUAL)
+
+
+class AmbiguousNameError(LookupError):
+    """Mais de uma entidade corresponde ao nome pedido."""
+
+    def __init__(self, name, candidates):
+        self.name = name
+        self.candidates = sorted(e.iri for e in candidates)
+        super().__init__(f'Nome "{name}" é ambíguo: {", ".join(self.candidates)}')
+
+
+def entity_kind(entity):
+    """Bucket do índice ao qual a entidade pertence (ou ``None``)."""
+    if isinstance(entity, ObjectPropertyClass):
+        return OBJECT_PROPERTY
+    if isinstance(entity, DataPropertyClass):
+        return DATA_PROPERTY
+    if isinstance(entity, AnnotationPropertyClass):
+        return ANNOTATION_PROPERTY
+    if isinstance(entity, ThingClass):
+        return CLASS
+    if isinstance(entity, Thing):
+        return INDIVIDUAL
+    return None
+
+
+class EntityIndex:
+    def __init__(self, onto=None):
+        self._iris = {}
+        self._names = {kind: {} for kind in KINDS}
+        self._labels = {kind: {} for kind in KINDS}
+        # Rótulos indexados por entidade, para conseguir removê-los depois
+        self._entity_labels = {}
+        # Chaves (nome, IRI) ordenadas: todos os indivíduos e por IRI de classe declarada
+        self._individuals = []
+        self._members = {}
+        # iri -> (chave, IRIs das classes) de cada indivíduo indexado
+        self._individual_keys = {}
+        self._building = False
+        self.search = SearchIndex()
+        self.closure = ClosureIndex()
+        if onto is not None:
+            self.build(onto)
+
+    def build(self, onto):
+        """Indexa a ontologia e as ontologias importadas por ela."""
+        # Durante a montagem as listas só recebem append e são ordenadas no fim
+        self._building = True
+        self.search.begin_build()
+        self.closure.begin_build()
+        try:
+            for ontology in [onto, *onto.indirectly_imported_ontologies()]:
+                for entities in (ontology.classes(), ontology.object_properties(),
+                                 ontology.data_properties(), ontology.annotation_properties(),
+                                 ontology.individuals()):
+                    for entity in entities:
+                        # individuals() repete o indivíduo a cada rdf:type, e uma entidade pode
+                        # estar declarada em mais de uma ontologia
+                        if entity.iri not in self._iris:
+                            self.add(entity)
+        finally:
+            self._building = False
+            self.search.end_build()
+            self.closure.end_build()
+            self._individuals.sort()
+            for members in self._members.values():
+                members.sort()
+
+    def add(self, entity):
+        """Indexa (ou reindexa, se os rótulos mudaram) uma entidade."""
+        kind = entity_kind(entity)
+        if kind is None:
+            return
+        if entity.iri in self._iris:
+            self._unindex(entity)
+        self._iris[entity.iri] = entity
+        self._names[kind].setdefault(entity.name, []).append(entity)
+        labels = {str(label) for label in entity.label}
+        for label in labels:
+            self._labels[kind].setdefault(label, []).append(entity)
+        self._entity_labels[entity.iri] = labels
+        self.search.add(entity.iri, kind, entity.name,
+                        [(label, getattr(label, 'lang', '')) for label in entity.label], entity.comment)
+        if kind == INDIVIDUAL:
+            self._add_individual(entity)
+        else:
+            self.closure.add(entity.iri, entity.name,
+                             [parent.iri for parent in entity.is_a if entity_kind(parent) == kind])
+
+    def add_many(self, entities):
+        """
+        ``add`` de várias entidades novas (ex.: um bloco da importação em massa),
+        com as listas ordenadas e o vocabulário da busca atualizados uma vez no fim.
+        """
+        self._building = True
+        self.search.begin_build()
+        try:
+            for entity in entities:
+                self.add(entity)
+        finally:
+            self._building = False
+            self.search.end_build()
+            self._individuals.sort()
+            for members in self._members.values():
+                members.sort()
+
+    def remove(self, entity):
+        self._unindex(entity)
+        self.closure.remove(entity.iri)
+
+    def _unindex(self, entity):
+        kind = entity_kind(entity)
+        if self._iris.pop(entity.iri, None) is None:
+            return
+        self._discard(self._names[kind], entity.name, entity)
+        for label in self._entity_labels.pop(entity.iri, ()):
+            self._discard(self._labels[kind], label, entity)
+        self.search.remove(entity.iri)
+        if kind == INDIVIDUAL:
+            self._remove_individual(entity)
+
+    def _add_individual(self, entity):
+        key = (entity.name or "", entity.iri)
+        classes = [cls.iri for cls in entity.is_a if isinstance(cls, ThingClass)]
+        self._individual_keys[entity.iri] = (key, classes)
+        lists = [self._individuals] + [self._members.setdefault(iri, []) for iri in classes]
+        for keys in lists:
+            if self._building:
+                keys.append(key)
+            else:
+                insort(keys, key)
+
+    def _remove_individual(self, entity):
+        key, classes = self._individual_keys.pop(entity.iri, (None, ()))
+        if key is None:
+            return
+        for keys in [self._individuals] + [self._members.get(iri, []) for iri in classes]:
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+
+    @staticmethod
+    def _discard(bucket, key, entity):
+        entities = bucket.get(key)
+        if not entities:
+            return
+        entities[:] = [e for e in entities if e.iri != entity.iri]
+        if not entities:
+            del bucket[key]
+
+    def classes(self):
+        """Todas as classes indexadas, sem consultar o quadstore."""
+        return [e for entities in self._names[CLASS].values() for e in entities]
+
+    def entity(self, iri):
+        return self._iris.get(iri)
+
+    def individual_keys(self, cls=None):
+        """
+        Chaves (nome, IRI) ordenadas dos indivíduos, ou só dos declarados como ``cls``
+        (a classe ou o IRI dela).
+
+        A lista é a do próprio índice: não deve ser alterada por quem a recebe.
+        """
+        if cls is None:
+            return self._individuals
+        return self._members.get(cls if isinstance(cls, str) else cls.iri, [])
+
+    def resolve(self, name, *kinds):
+        """
+        Resolve ``name`` (IRI completo, nome local ou rótulo) para uma entidade.
+
+        Restringe a busca aos buckets ``kinds`` (todos, se omitido). Retorna ``None``
+        quando nada corresponde e levanta ``AmbiguousNameError`` quando mais de uma
+        entidade tem o mesmo nome local (ou, na falta dele, o mesmo rótulo).
+        """
+        if not name:
+            return None
+        kinds = kinds or KINDS
+        entity = self._iris.get(name)
+        if entity is not None:
+            return entity if entity_kind(entity) in kinds else None
+        for buckets in (self._names, self._labels):
+            matches = [e for kind in kinds for e in buckets[kind].get(name, ())]
+            if len(matches) == 1:
+                return matches[0]
+            if matches:
+                raise AmbiguousNameError(name, matches)
+        return None
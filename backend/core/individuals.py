@@ -0,0 +1,103 @@
+"""
+Listagem paginada e filtrável dos indivíduos.
+
+As páginas saem das listas ordenadas do ``EntityIndex`` (todos os indivíduos ou os
+de cada classe declarada): o cursor e o prefixo de nome viram uma busca binária, e
+só os indivíduos da página são lidos do quadstore. Com ``inherited`` as listas das
+subclasses (tiradas do fecho transitivo do índice) são intercaladas; o filtro por
+propriedade é verificado item a item.
+"""
+import heapq
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+from owlready2 import ObjectPropertyClass
+
+from .hierarchy import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor
+from .serialization import serialize_individual, serialize_individuals
+
+FIELDS = ('name', 'iri', 'type', 'properties')
+DEFAULT_FIELDS = ('name', 'type', 'properties')
+
+
+def parse_fields(value):
+    """Campos pedidos em ``fields`` (separados por vírgula); ``ValueError`` se inválido."""
+    if not value:
+        return DEFAULT_FIELDS
+    fields = tuple(dict.fromkeys(f.strip() for f in value.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in FIELDS]
+    if unknown:
+        raise ValueError(f'Campo(s) desconhecido(s): {", ".join(unknown)} (use {", ".join(FIELDS)})')
+    return fields
+
+
+def has_property(ind, prop):
+    """O indivíduo tem ao menos um valor de ``prop`` (inclusive pela propriedade inversa)."""
+    graph = ind.namespace.world.graph
+    if graph.execute("SELECT 1 FROM quads WHERE s=? AND p=? LIMIT 1", (ind.storid, prop.storid)).fetchone():
+        return True
+    inverse = getattr(prop, '_inverse_storid', 0) if isinstance(prop, ObjectPropertyClass) else 0
+    return bool(inverse and graph.execute(
+        "SELECT 1 FROM objs WHERE p=? AND o=? LIMIT 1", (inverse, ind.storid)).fetchone())
+
+
+def _keys_from(keys, after, prefix):
+    """As chaves de ``keys`` depois do cursor ``after`` e a partir do ``prefix``."""
+    start = bisect_right(keys, after) if after is not None else 0
+    if prefix:
+        start = max(start, bisect_left(keys, (prefix, '')))
+    return islice(keys, start, None)
+
+
+def individuals_page(index, cls=None, inherited=False, properties=(), prefix='', cursor=None,
+                     limit=DEFAULT_PAGE_SIZE):
+    """
+    Uma página de indivíduos ordenada por (nome, IRI).
+
+    ``cls`` restringe aos declarados como a classe (com ``inherited``, também como
+    uma das subclasses); ``properties`` exige valor para cada propriedade e
+    ``prefix`` filtra pelo início do nome. Retorna ``(indivíduos, next_cursor)``.
+    """
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    after = tuple(decode_cursor(cursor)) if cursor else None
+    if cls is None:
+        sources = [index.individual_keys()]
+    else:
+        classes = [cls.iri, *index.closure.descendants(cls.iri)] if inherited else [cls.iri]
+        sources = [index.individual_keys(iri) for iri in classes]
+    streams = [_keys_from(keys, after, prefix) for keys in sources]
+    keys = heapq.merge(*streams) if len(streams) > 1 else streams[0]
+
+    page, previous = [], None
+    for key in keys:
+        # Um indivíduo de várias subclasses aparece em mais de uma lista
+        if key == previous:
+            continue
+        previous = key
+        if prefix and not key[0].startswith(prefix):
+            break
+        ind = index.entity(key[1])
+        if ind is None or not all(has_property(ind, prop) for prop in properties):
+            continue
+        page.append(ind)
+        if len(page) > limit:
+            break
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return page[:limit], next_cursor
+
+
+def serialize_page(individuals, fields=DEFAULT_FIELDS, cache=None):
+    """
+    Os indivíduos com só os campos pedidos. As propriedades (se pedidas) vêm do
+    ``cache`` de serialização da ontologia ou são lidas em lote.
+    """
+    if 'properties' in fields:
+        if cache is not None:
+            items = cache.serialize(individuals, serialize_individual, serialize_individuals)
+        else:
+            items = serialize_individuals(individuals)
+    else:
+        items = [{'name': ind.name, 'type': [cls.name for cls in ind.is_a if hasattr(cls, 'name')]}
+                 for ind in individuals]
+    return [{field: ind.iri if field == 'iri' else item[field] for field in fields}
+            for ind, item in zip(individuals, items)]
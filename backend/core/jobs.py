@@ -0,0 +1,140 @@
+"""
+Jobs em segundo plano com progresso consultável (usados pelo carregamento de ontologias).
+
+A função do job recebe o próprio ``Job`` e informa o andamento com
+``job.update(fase, percentual)``; entre um passo e outro chama
+``job.check_cancelled()``, que levanta ``JobCancelled`` se alguém pediu o
+cancelamento. Jobs terminados ficam disponíveis por ``ONTOLOGY_JOB_TTL`` segundos
+para a consulta do resultado.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class JobCancelled(Exception):
+    """O job foi cancelado durante a execução."""
+
+
+class Job:
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = RUNNING
+        self.phase = None
+        self.percent = 0.0
+        self.error = None
+        self.result = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    def update(self, phase, percent=None):
+        self.phase = phase
+        if percent is not None:
+            self.percent = round(min(max(percent, 0.0), 100.0), 1)
+        self.check_cancelled()
+
+    def finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        if status == DONE:
+            self.percent = 100.0
+        self.finished_at = time.time()
+
+    def cancel(self):
+        """Pede o cancelamento; retorna ``False`` se o job já terminou."""
+        if self.status != RUNNING:
+            return False
+        self._cancel.set()
+        return True
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'phase': self.phase,
+            'percent': self.percent,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobManager:
+    def __init__(self, max_workers, ttl):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ontology-job')
+
+    def create(self, kind):
+        """Registra um job novo (já consultável), antes de ele começar a rodar."""
+        job = Job(kind)
+        with self._lock:
+            self._expire()
+            self._jobs[job.id] = job
+        return job
+
+    def start(self, job, fn, *args, **kwargs):
+        """Agenda ``fn(job, *args, **kwargs)``; o valor retornado vira ``job.result``."""
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def run(self, job, fn, *args, **kwargs):
+        """Como ``start``, mas roda ``fn`` já, na thread atual (para trabalhos instantâneos)."""
+        self._run(job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def _run(self, job, fn, args, kwargs):
+        try:
+            job.check_cancelled()
+            job.result = fn(job, *args, **kwargs)
+        except JobCancelled:
+            job.finish(CANCELLED)
+        except Exception as e:
+            logger.exception(f"Job {job.id} ({job.kind}) falhou")
+            job.finish(FAILED, str(e))
+        else:
+            job.finish(DONE)
+
+    def _expire(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and now - job.finished_at > self.ttl:
+                del self._jobs[job_id]
+
+
+_manager = None
+
+
+def get_job_manager():
+    global _manager
+    if _manager is None:
+        _manager = JobManager(settings.ONTOLOGY_JOB_WORKERS, settings.ONTOLOGY_JOB_TTL)
+    return _manager
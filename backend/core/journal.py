@@ -0,0 +1,181 @@
+"""
+Journal de alterações (write-ahead) e compactação do RDF/XML em segundo plano.
+
+Cada mutação é anexada a ``<arquivo>.journal`` (uma linha JSON com revisão,
+operação e corpo da requisição, com fsync) antes do commit no quadstore, e a
+requisição é respondida sem reescrever o RDF/XML. Um compactador em thread
+grava o arquivo consolidado a cada ``ONTOLOGY_COMPACT_INTERVAL`` segundos ou
+quando o journal passa de ``ONTOLOGY_COMPACT_MAX_ENTRIES`` entradas. O lock de
+leitura só é mantido durante uma cópia do quadstore (backup do SQLite); o RDF/XML
+é gerado a partir da cópia, sem travar as mutações.
+
+Na reabertura, entradas com revisão maior que a gravada no quadstore (crash
+entre o journal e o commit) são reaplicadas e o RDF/XML é compactado.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+from . import store
+from .locks import ReadWriteLock
+
+logger = logging.getLogger(__name__)
+
+class ChangeJournal:
+    def __init__(self, onto_path):
+        self.path = f"{onto_path}.journal"
+        # Mutações escrevem, compactação e consultas leem: onto.save() não pode ver a
+        # ontologia pela metade (ver ``locks``)
+        self.lock = ReadWriteLock()
+        # Duas compactações simultâneas gravariam o mesmo arquivo temporário
+        self.compacting = threading.Lock()
+        self.pending = len(self.entries())
+        self._file = None
+
+    def append(self, revision, op, payload):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        record = {'revision': revision, 'op': op, 'payload': payload, 'time': time.time()}
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.pending += 1
+
+    def entries(self):
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # Última linha truncada por um crash no meio da escrita
+                    break
+        return entries
+
+    def discard(self, revision):
+        """Descarta as entradas até ``revision``, já incorporadas ao RDF/XML."""
+        kept = [entry for entry in self.entries() if entry['revision'] > revision]
+        if not kept:
+            self.truncate()
+            return
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in kept:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.pending = len(kept)
+
+    def truncate(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.pending = 0
+
+
+def compact(onto, onto_path, journal):
+    """
+    Grava o RDF/XML consolidado e descarta as entradas já incorporadas.
+
+    Com o lock de leitura, só copia o quadstore (``sqlite3.Connection.backup``); o
+    ``onto.save`` roda na cópia, e as mutações feitas nesse meio tempo continuam no
+    journal para a próxima compactação.
+    """
+    with journal.compacting:
+        copy_path = f"{onto_path}.compact.sqlite3"
+        with journal.lock.reader:
+            if not journal.pending:
+                return
+            revision = store.get_revision(onto)
+            target = sqlite3.connect(copy_path)
+            try:
+                onto.world.graph.db.backup(target)
+            finally:
+                target.close()
+        try:
+            copy = store.open_world(copy_path)
+            try:
+                tmp_path = f"{onto_path}.tmp"
+                copy.get_ontology(onto.base_iri).load().save(file=tmp_path, format="rdfxml")
+                os.replace(tmp_path, onto_path)
+            finally:
+                copy.close()
+        finally:
+            os.remove(copy_path)
+        with journal.lock.reader:
+            journal.discard(revision)
+
+
+def recover(onto, onto_path, journal, apply):
+    """
+    Reaplica as entradas do journal que não chegaram ao quadstore e compacta.
+
+    ``apply(op, payload)`` executa uma operação (ver ``operations.apply``).
+    """
+    with journal.lock.writer:
+        revision = store.get_revision(onto)
+        replayed = 0
+        for entry in journal.entries():
+            if entry['revision'] <= revision:
+                continue
+            apply(entry['op'], entry['payload'])
+            store.set_state(onto, revision=entry['revision'])
+            replayed += 1
+        store.commit(onto)
+        if replayed:
+            logger.warning(f"{replayed} alteração(ões) reaplicada(s) do journal {journal.path}")
+    compact(onto, onto_path, journal)
+
+
+class Compactor(threading.Thread):
+    def __init__(self, interval, max_entries):
+        super().__init__(name='ontology-compactor', daemon=True)
+        self.interval = interval
+        self.max_entries = max_entries
+        self.targets = {}
+        self._wake = threading.Event()
+
+    def track(self, onto, onto_path, journal):
+        self.targets[onto_path] = (onto, journal)
+
+    def untrack(self, onto_path):
+        self.targets.pop(onto_path, None)
+
+    def notify(self, journal):
+        """Chamado após cada mutação; antecipa a compactação se o journal cresceu demais."""
+        if journal.pending >= self.max_entries:
+            self._wake.set()
+
+    def run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            for onto_path, (onto, journal) in list(self.targets.items()):
+                try:
+                    compact(onto, onto_path, journal)
+                except Exception:
+                    logger.exception(f"Falha ao compactar {onto_path}")
+
+
+_compactor = None
+
+
+def get_compactor():
+    global _compactor
+    if _compactor is None:
+        _compactor = Compactor(settings.ONTOLOGY_COMPACT_INTERVAL, settings.ONTOLOGY_COMPACT_MAX_ENTRIES)
+        _compactor.start()
+    return _compactor
@@ -0,0 +1,89 @@
+"""
+Lock de leitores/escritor usado por cada ontologia aberta.
+
+Vários leitores (listagens, hierarquia, exportação, compactação) rodam ao mesmo
+tempo; um escritor (mutação) espera os leitores atuais saírem e tem preferência
+sobre leitores novos, para não passar fome sob carga de leitura. Os dois lados
+são reentrantes na mesma thread, e quem tem a escrita também pode ler.
+"""
+import threading
+
+
+class _Side:
+    def __init__(self, acquire, release):
+        self.acquire = acquire
+        self.release = release
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class ReadWriteLock:
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+        self._local = threading.local()
+        self.reader = _Side(self.acquire_read, self.release_read)
+        self.writer = _Side(self.acquire_write, self.release_write)
+
+    def _read_depth(self):
+        return getattr(self._local, 'depth', 0)
+
+    def is_writing(self):
+        """A thread atual tem o lock de escrita."""
+        return self._writer == threading.get_ident()
+
+    def acquire_read(self):
+        if self._read_depth():
+            self._local.depth += 1
+            return
+        if self.is_writing():
+            # Leitura dentro da escrita: não conta como leitor
+            self._local.counted = False
+        else:
+            with self._cond:
+                while self._writer is not None or self._waiting_writers:
+                    self._cond.wait()
+                self._readers += 1
+            self._local.counted = True
+        self._local.depth = 1
+
+    def release_read(self):
+        self._local.depth -= 1
+        if self._local.depth or not self._local.counted:
+            return
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            if self._read_depth():
+                raise RuntimeError('Não é possível promover um lock de leitura para escrita')
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._writer_depth = 1
+
+    def release_write(self):
+        with self._cond:
+            self._writer_depth -= 1
+            if not self._writer_depth:
+                self._writer = None
+                self._cond.notify_all()
@@ -0,0 +1,419 @@
+"""
+Operações de mutação da ontologia.
+
+Cada operação recebe o mesmo corpo JSON da view correspondente, aplica a mudança
+dentro de ``with onto:``, atualiza o índice de nomes e registra no ``ChangeSet``
+o que foi alterado. As views, o journal (replay após crash) e as rotinas em lote
+usam estas mesmas funções.
+"""
+import datetime
+import types
+
+from owlready2 import (
+    And, AnnotationProperty, DataProperty, FunctionalProperty, ObjectProperty,
+    SymmetricProperty, Thing, TransitiveProperty, locstr, normstr,
+)
+
+from .delta import ChangeSet
+from .index import CLASS, OBJECT_PROPERTY, DATA_PROPERTY, ANNOTATION_PROPERTY, INDIVIDUAL
+
+# Mapeamento dos tipos de dados para OwlReady2 (tipos Python nativos)
+DATA_TYPES = {
+    'str': str,
+    'normstr': normstr,
+    'locstr': locstr,
+    'int': int,
+    'float': float,
+    'bool': bool,
+    'date': datetime.date,
+    'time': datetime.time,
+    'datetime': datetime.datetime,
+}
+
+
+class OperationError(Exception):
+    """Erro de validação de uma operação; ``status`` é o código HTTP da resposta."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class BatchError(OperationError):
+    """Uma ou mais operações do lote falharam; ``errors`` traz o índice de cada uma."""
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} operação(ões) do lote falharam; nenhuma alteração foi aplicada')
+        self.errors = errors
+
+
+def coerce_value(item):
+    """
+    Converte um valor ``{'value', 'lang', 'datatype'}`` para o tipo Python nativo.
+
+    Retorna ``None`` quando não há valor.
+    """
+    val = item.get('value')
+    dt_uri = item.get('datatype')
+    if val is None:
+        return None
+    # Convert to Python type based on datatype
+    if dt_uri and dt_uri.startswith('xsd:'):
+        t = dt_uri[4:]
+        try:
+            if t in ('integer', 'int'):
+                return int(val)
+            elif t in ('float', 'double', 'decimal'):
+                return float(val)
+            elif t in ('boolean',):
+                return val.lower() in ('true', '1')
+        except Exception:
+            pass
+    return val
+
+
+def create_class(onto, index, data, changes):
+    class_name = data.get('name')
+    parent_names = data.get('parents', [])
+
+    if not class_name:
+        raise OperationError('Nome da classe é obrigatório')
+
+    # Definindo classes-pai
+    if parent_names:
+        parents = []
+        for parent_name in parent_names:
+            parent_cls = index.resolve(parent_name, CLASS)
+            if not parent_cls:
+                raise OperationError(f'Classe pai "{parent_name}" não encontrada')
+            parents.append(parent_cls)
+    else:
+        parents = [Thing]
+
+    # Criando a nova classe
+    NewClass = types.new_class(class_name, tuple(parents))
+    index.add(NewClass)
+    changes.add(NewClass)
+
+
+def individual_classes(index, data):
+    """Valida o nome do corpo de ``create-individual/`` e resolve as classes dele."""
+    class_names = data.get('classes', [])
+
+    if not data.get('name'):
+        raise OperationError('Nome do indivíduo é obrigatório')
+    if not class_names:
+        raise OperationError('Pelo menos uma classe deve ser especificada')
+
+    classes = []
+    for cls_name in class_names:
+        ontology_class = index.resolve(cls_name, CLASS)
+        if not ontology_class:
+            raise OperationError(f'Classe "{cls_name}" não encontrada')
+        classes.append(ontology_class)
+    return classes
+
+
+def create_individual(onto, index, data, changes):
+    individual_name = data.get('name')
+    properties = data.get('properties', {})
+    annotations = data.get('annotations', {})
+    obj_props = data.get('object_properties', {})
+    description = data.get('description', {})
+    same_as = data.get('same_as', [])
+    different_from = data.get('different_from', [])
+
+    # instantiate classes
+    classes = individual_classes(index, data)
+
+    # create individual
+    new_individual = classes[0](individual_name)
+    if len(classes) > 1:
+        new_individual.is_a.extend(classes[1:])
+    index.add(new_individual)
+
+    # data properties
+    for prop_name, values in properties.items():
+        prop = index.resolve(prop_name, DATA_PROPERTY)
+        if not prop:
+            continue
+        processed = [v for v in (coerce_value(item) for item in values) if v is not None]
+        # Assign to the individual
+        if issubclass(prop, FunctionalProperty) and processed:
+            setattr(new_individual, prop.name, processed[0])
+        else:
+            for v in processed:
+                getattr(new_individual, prop.name).append(v)
+
+    # object properties
+    for prop_name, targets in obj_props.items():
+        prop = index.resolve(prop_name, OBJECT_PROPERTY)
+        if not prop:
+            continue
+        for t in targets:
+            target_ind = index.resolve(t, INDIVIDUAL)
+            if target_ind:
+                getattr(new_individual, prop.name).append(target_ind)
+                changes.change(target_ind)
+
+    # annotations
+    for anno_name, values in annotations.items():
+        prop = index.resolve(anno_name, ANNOTATION_PROPERTY)
+        if not prop:
+            continue
+        for v in values:
+            prop[new_individual].append(v)
+
+    # description, same_as, different_from
+    for extra in description.get('types', []):
+        cls = index.resolve(extra, CLASS)
+        if cls:
+            new_individual.is_a.append(cls)
+    for same in same_as:
+        other = index.resolve(same, INDIVIDUAL)
+        if other:
+            new_individual.same_as.append(other)
+            changes.change(other)
+    for diff in different_from:
+        other = index.resolve(diff, INDIVIDUAL)
+        if other:
+            new_individual.different_from.append(other)
+            changes.change(other)
+
+    # Reindexa para incluir rótulos atribuídos pelas anotações
+    index.add(new_individual)
+    changes.add(new_individual)
+
+
+def manage_relationship(onto, index, data, changes):
+    subject_name = data.get('subject')
+    object_property_name = data.get('object_property')
+    target_name = data.get('target')
+    action = data.get('action')
+    replace_with_name = data.get('replace_with')
+
+    if not subject_name or not object_property_name or not action:
+        raise OperationError('Parâmetros obrigatórios ausentes')
+
+    # Localiza indivíduos e propriedade
+    subject = index.resolve(subject_name, INDIVIDUAL)
+    if not subject:
+        raise OperationError(f'Indivíduo sujeito "{subject_name}" não encontrado', status=404)
+
+    obj_prop = index.resolve(object_property_name, OBJECT_PROPERTY)
+    if not obj_prop:
+        raise OperationError(f'Propriedade "{object_property_name}" não encontrada ou não é uma ObjectProperty')
+
+    if action == 'add':
+        target = index.resolve(target_name, INDIVIDUAL)
+        if not target:
+            raise OperationError(f'Indivíduo destino "{target_name}" não encontrado', status=404)
+        getattr(subject, obj_prop.name).append(target)
+        touched = [target]
+
+    elif action == 'remove':
+        target = index.resolve(target_name, INDIVIDUAL)
+        if not target:
+            raise OperationError(f'Indivíduo destino "{target_name}" não encontrado', status=404)
+        current_values = getattr(subject, obj_prop.name)
+        if target in current_values:
+            current_values.remove(target)
+        else:
+            raise OperationError(f'Relação não encontrada entre "{subject_name}" e "{target_name}" via "{object_property_name}"', status=404)
+        touched = [target]
+
+    elif action == 'replace':
+        if not replace_with_name:
+            raise OperationError('Parâmetro "replace_with" obrigatório para ação replace')
+        old_target = index.resolve(target_name, INDIVIDUAL)
+        new_target = index.resolve(replace_with_name, INDIVIDUAL)
+        if not old_target or not new_target:
+            raise OperationError('Indivíduos de origem ou destino não encontrados', status=404)
+        current_values = getattr(subject, obj_prop.name)
+        if old_target in current_values:
+            current_values.remove(old_target)
+            current_values.append(new_target)
+        else:
+            raise OperationError(f'Relação original não encontrada entre "{subject_name}" e "{target_name}"', status=404)
+        touched = [old_target, new_target]
+
+    else:
+        raise OperationError('Ação inválida. Use "add", "remove" ou "replace"')
+
+    # Só o sujeito e os alvos envolvidos mudaram
+    changes.change(subject)
+    for individual in touched:
+        changes.change(individual)
+
+
+def _parent_properties(index, names, kind, base):
+    """Superpropriedades pedidas em ``parents`` (ou a classe base do Owlready2)."""
+    parents = []
+    for parent_name in names:
+        parent = index.resolve(parent_name, kind)
+        if not parent:
+            raise OperationError(f'Propriedade pai "{parent_name}" não encontrada')
+        parents.append(parent)
+    return tuple(parents) or (base,)
+
+
+def create_object_property(onto, index, data, changes):
+    name = data.get('property_name')
+    domain_names = data.get('domain', [])
+    range_names = data.get('range', [])
+    characteristics = data.get('characteristics', [])
+
+    if not name:
+        raise OperationError('Nome é obrigatório')
+
+    # Busca por classes de domínio
+    domains = []
+    for domain_name in domain_names:
+        cls = index.resolve(domain_name, CLASS)
+        if not cls:
+            raise OperationError(f'Domínio "{domain_name}" não encontrado')
+        domains.append(cls)
+
+    # Busca por classes de range
+    ranges = []
+    for range_name in range_names:
+        cls = index.resolve(range_name, CLASS)
+        if not cls:
+            raise OperationError(f'Range "{range_name}" não encontrado')
+        ranges.append(cls)
+
+    parents = _parent_properties(index, data.get('parents', []), OBJECT_PROPERTY, ObjectProperty)
+
+    # Criação da nova propriedade seguindo padrão Owlready2
+    NewProperty = types.new_class(name, parents)
+    NewProperty.namespace = onto
+
+    # Define domínio
+    if domains:
+        NewProperty.domain = domains if len(domains) == 1 else [And(domains)]
+
+    # Define range
+    if ranges:
+        NewProperty.range = ranges if len(ranges) == 1 else [And(ranges)]
+
+    # Define características
+    if 'functional' in [c.lower() for c in characteristics]:
+        NewProperty.is_a.append(FunctionalProperty)
+    if 'transitive' in [c.lower() for c in characteristics]:
+        NewProperty.is_a.append(TransitiveProperty)
+    if 'symmetric' in [c.lower() for c in characteristics]:
+        NewProperty.is_a.append(SymmetricProperty)
+
+    index.add(NewProperty)
+    changes.add(NewProperty)
+
+
+def create_data_property(onto, index, data, changes):
+    name = data.get('property_name')
+    domain_names = data.get('domain', [])
+    data_type_str = data.get('range')  # ex: "str", "int", "xsd:float", etc.
+    characteristics = data.get('characteristics', [])
+
+    if not name:
+        raise OperationError('Nome é obrigatório')
+    if not data_type_str:
+        raise OperationError('Tipo de dado (range) é obrigatório')
+
+    # Normaliza chave, removendo prefixo xsd: se presente
+    key = data_type_str.lower()
+    if key.startswith('xsd:'):
+        key = key.split(':', 1)[1]
+
+    data_type = DATA_TYPES.get(key)
+    if data_type is None:
+        raise OperationError(f'Tipo de dado "{data_type_str}" não suportado')
+
+    # Busca por classes de domínio
+    domains = []
+    for domain_name in domain_names:
+        cls = index.resolve(domain_name, CLASS)
+        if not cls:
+            raise OperationError(f'Domínio "{domain_name}" não encontrado')
+        domains.append(cls)
+
+    parents = _parent_properties(index, data.get('parents', []), DATA_PROPERTY, DataProperty)
+
+    # Criação da nova propriedade usando types.new_class
+    NewDataProp = types.new_class(name, parents)
+    NewDataProp.namespace = onto
+
+    # Define domínio
+    if domains:
+        NewDataProp.domain = domains if len(domains) == 1 else [And(domains)]
+
+    # Define range como tipo primitivo
+    NewDataProp.range = [data_type]
+
+    # Define características (functional)
+    if any(c.lower() == 'functional' for c in characteristics):
+        NewDataProp.is_a.append(FunctionalProperty)
+
+    index.add(NewDataProp)
+    changes.add(NewDataProp)
+
+
+def create_annotation_property(onto, index, data, changes):
+    name, domains = data.get('name'), data.get('domain', [])
+    if not name:
+        raise OperationError('Nome é obrigatório')
+
+    parents = _parent_properties(index, data.get('parents', []), ANNOTATION_PROPERTY, AnnotationProperty)
+
+    New = types.new_class(name, parents)
+    New.namespace = onto
+    if domains:
+        New.domain = [d for d in domains if d]
+
+    index.add(New)
+    changes.add(New)
+
+
+def run_batch(onto, index, data, changes):
+    """
+    Aplica ``data['operations']`` (lista de ``{'op', 'data'}``) em ordem.
+
+    Continua depois de uma falha para reportar todos os erros por índice e, se
+    houver algum, levanta ``BatchError``; quem chamou deve desfazer o lote inteiro.
+    """
+    items = data.get('operations')
+    if not isinstance(items, list) or not items:
+        raise OperationError('Lista "operations" é obrigatória')
+
+    errors = []
+    for i, item in enumerate(items):
+        op = item.get('op') if isinstance(item, dict) else None
+        try:
+            if op not in OPERATIONS or op == 'batch':
+                raise OperationError(f'Operação "{op}" desconhecida')
+            OPERATIONS[op](onto, index, item.get('data', {}), changes)
+        except Exception as e:
+            errors.append({'index': i, 'op': op, 'message': str(e)})
+    if errors:
+        raise BatchError(errors)
+
+
+OPERATIONS = {
+    'create_class': create_class,
+    'create_individual': create_individual,
+    'manage_relationship': manage_relationship,
+    'create_object_property': create_object_property,
+    'create_data_property': create_data_property,
+    'create_annotation_property': create_annotation_property,
+    'batch': run_batch,
+}
+
+
+def apply(op, onto, index, data, changes=None):
+    """Aplica a operação ``op`` com o corpo ``data``; retorna o ``ChangeSet``."""
+    if op not in OPERATIONS:
+        raise OperationError(f'Operação "{op}" desconhecida')
+    if changes is None:
+        changes = ChangeSet()
+    with onto:
+        OPERATIONS[op](onto, index, data, changes)
+    return changes
@@ -0,0 +1,394 @@
+"""
+Registro das ontologias carregadas, identificadas pelo id devolvido em ``load-ontology/``.
+
+Cada ontologia tem o seu quadstore (``<ONTOLOGY_STORE_DIR>/<id>.sqlite3``) e o seu
+RDF/XML (``<MEDIA_ROOT>/<id>/``), então uploads de usuários diferentes não se
+sobrescrevem. As ontologias abertas ficam num LRU: quando o tamanho estimado
+(o tamanho dos quadstores) passa de ``ONTOLOGY_MEMORY_BUDGET``, as menos usadas
+são compactadas e fechadas, e reabertas do quadstore no próximo acesso.
+"""
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import history, store, operations
+from .entity_cache import SerializationCache
+from .imports import get_import_resolver
+from .index import EntityIndex, entity_kind
+from .journal import ChangeJournal, compact, recover, get_compactor
+
+logger = logging.getLogger(__name__)
+
+_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class OntologyNotFound(LookupError):
+    def __init__(self, ontology_id):
+        self.ontology_id = ontology_id
+        super().__init__(f'Ontologia "{ontology_id}" não encontrada')
+
+
+class OntologyLoading(LookupError):
+    """A ontologia ainda está sendo carregada (o job de ``load-ontology/`` não terminou)."""
+
+    def __init__(self, ontology_id):
+        self.ontology_id = ontology_id
+        super().__init__(f'Ontologia "{ontology_id}" ainda está sendo carregada')
+
+
+def store_path(ontology_id):
+    return os.path.join(settings.ONTOLOGY_STORE_DIR, f"{ontology_id}.sqlite3")
+
+
+class LoadedOntology:
+    """Uma ontologia aberta: World, índice de nomes e journal de alterações."""
+
+    def __init__(self, ontology_id, world, onto, path):
+        self.id = ontology_id
+        self.world = world
+        self.onto = onto
+        self.path = path
+        self.index = EntityIndex(onto)
+        self.journal = ChangeJournal(path)
+        # Desfazer/refazer e snapshots (ver ``history``)
+        self.history = history.History(onto, settings.ONTOLOGY_UNDO_LIMIT, settings.ONTOLOGY_MAX_SNAPSHOTS)
+        # Dicts serializados por IRI; as mutações invalidam as entidades tocadas
+        self.serialized = SerializationCache()
+        # Requisições usando a ontologia agora; só é fechada quando chega a zero
+        self.users = 0
+        # Fila única de escrita: as mutações rodam uma por vez, nesta thread
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'ontology-writer-{ontology_id[:8]}')
+
+    @property
+    def lock(self):
+        return self.journal.lock
+
+    @property
+    def size(self):
+        """Estimativa do custo em memória: o tamanho do quadstore em disco."""
+        try:
+            return os.path.getsize(store_path(self.id))
+        except OSError:
+            return 0
+
+    def reading(self):
+        """Contexto de leitura: roda junto com outras leituras, nunca durante uma mutação."""
+        return self.lock.reader
+
+    def write(self, fn, *args):
+        """
+        Executa ``fn(*args)`` na fila de escrita da ontologia, com o lock de escrita,
+        e devolve o resultado (ou levanta a exceção) na thread que chamou.
+        """
+        if self.lock.is_writing():
+            return fn(*args)
+
+        def run():
+            with self.lock.writer:
+                return fn(*args)
+        return self._writer.submit(run).result()
+
+    def replay(self, op, data):
+        if op in history.OPS:
+            self.apply_history(op, data)
+            return
+        with self.history.record(op):
+            operations.apply(op, self.onto, self.index, data)
+
+    def apply_history(self, op, data, changes=None):
+        """
+        Desfaz, refaz ou restaura um snapshot (ver ``history``) e atualiza só as
+        entidades tocadas (ver ``refresh``). Roda com o lock de escrita; ``changes``
+        (um ``ChangeSet``) recebe as entidades adicionadas, alteradas e removidas.
+        """
+        storids = self.history.apply(op, data)
+        try:
+            self.refresh(store.resource_iris(self.onto, storids), changes)
+        except Exception:
+            self.rollback(storids)
+            raise
+
+    def rollback(self, storids):
+        """
+        Desfaz a transação aberta (uma mutação que falhou) e relê só as entidades
+        em ``storids`` (ver ``History.touched``), em vez de reindexar a ontologia.
+        """
+        # Os IRIs de entidades criadas na transação somem com ela
+        iris = store.resource_iris(self.onto, storids)
+        if store.rollback(self.onto):
+            self.refresh(iris)
+
+    def refresh(self, iris, changes=None):
+        """
+        Relê do quadstore as entidades ``{storid: IRI}`` depois de alterações feitas
+        direto nas tabelas: reindexadas e tiradas do cache de serialização.
+        """
+        touched = []
+        for storid, iri in iris.items():
+            old = self.index.entity(iri)
+            # Todas esquecidas antes de reler: as relidas não podem herdar as antigas
+            store.forget(self.onto, storid, old)
+            exists = store.has_type(self.onto, storid)
+            # Recursos que não são entidades da ontologia (owl:Thing, owl:Class...)
+            if old is None and not exists:
+                continue
+            touched.append((storid, iri, old, exists))
+        for storid, iri, old, exists in touched:
+            entity = self.onto.world._get_by_storid(storid) if exists else None
+            if entity is not None and entity_kind(entity) is not None:
+                if old is not None and entity_kind(old) != entity_kind(entity):
+                    self.index.remove(old)
+                self.index.add(entity)
+                if changes is not None:
+                    (changes.change if old is not None else changes.add)(entity)
+            elif old is not None:
+                self.index.remove(old)
+                if changes is not None:
+                    changes.remove(old)
+        self.serialized.invalidate(iris.values())
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        compact(self.onto, self.path, self.journal)
+        get_compactor().untrack(self.path)
+        with self.lock.writer:
+            self.world.close()
+
+
+class OntologyRegistry:
+    def __init__(self, memory_budget):
+        self.memory_budget = memory_budget
+        self._entries = OrderedDict()
+        # Ontologias sendo reabertas ou fechadas agora (id -> Future), fora do lock:
+        # quem pede o mesmo id espera o Future em vez de abrir o quadstore de novo
+        self._loading = {}
+        self._closing = {}
+        # Ids reservados por ``allocate`` cujo carregamento não terminou (ver ``publish``)
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def allocate(self, filename):
+        """Reserva um id novo e o caminho do upload (``<MEDIA_ROOT>/<id>/<arquivo>``)."""
+        ontology_id = uuid.uuid4().hex
+        media_dir = os.path.join(settings.MEDIA_ROOT, ontology_id)
+        os.makedirs(media_dir, exist_ok=True)
+        with self._lock:
+            self._pending.add(ontology_id)
+        return ontology_id, os.path.join(media_dir, os.path.basename(filename))
+
+    def publish(self, ontology_id):
+        """
+        Libera o id reservado por ``allocate`` para as requisições. Até aqui ``acquire``
+        levanta ``OntologyLoading``: nenhuma mutação altera o quadstore enquanto o
+        job ainda o copia para o ``upload_cache``.
+        """
+        with self._lock:
+            self._pending.discard(ontology_id)
+
+    def create(self, ontology_id, path, progress=None, imports=None):
+        """
+        Parseia ``path`` num quadstore novo e registra a ontologia (já reservada).
+
+        O parse acontece fora do lock do registro, para não travar as outras
+        ontologias durante uploads grandes. Os ``owl:imports`` são resolvidos antes,
+        pelo catálogo local (ver ``imports``), a não ser que ``imports`` já traga o
+        ``ImportPlan``. ``progress(fase, percentual)`` recebe o andamento do parse
+        (pelos bytes lidos) e o início da indexação.
+        """
+        on_read = None
+        if progress is not None:
+            size = os.path.getsize(path) or 1
+            on_read = lambda offset: progress('parsing', 100 * offset / size)
+        # Os imports vêm do catálogo local; já parseados, se outra ontologia importou os mesmos
+        resolver = get_import_resolver()
+        if imports is None:
+            if progress is not None:
+                progress('imports', 0)
+            imports = resolver.plan(path)
+        restored = bool(imports) and resolver.restore(imports, store_path(ontology_id))
+        world = store.open_world(store_path(ontology_id))
+        try:
+            if imports and not restored:
+                imports.load(world, resolver.parsed)
+                resolver.save(imports, world.graph.db)
+            onto = store.load_ontology(world, path, on_read)
+            if progress is not None:
+                progress('indexing', 0)
+            entry = LoadedOntology(ontology_id, world, onto, path)
+        except BaseException:
+            world.close()
+            os.remove(store_path(ontology_id))
+            raise
+        return self._register(entry)
+
+    def restore(self, ontology_id, path, copy_store):
+        """
+        Registra a ontologia (já reservada) a partir de um quadstore pronto, sem parse.
+
+        ``copy_store(destino)`` grava o quadstore (ver ``upload_cache``) e retorna
+        ``False`` se não puder; nesse caso ``restore`` retorna ``None``.
+        """
+        if not copy_store(store_path(ontology_id)):
+            return None
+        world = store.open_world(store_path(ontology_id))
+        try:
+            onto, _ = store.reopen_ontology(world)
+            if onto is None:
+                raise OntologyNotFound(ontology_id)
+            store.set_state(onto, path=path, loaded_at=time.time())
+            store.commit(onto)
+            entry = LoadedOntology(ontology_id, world, onto, path)
+        except BaseException:
+            world.close()
+            os.remove(store_path(ontology_id))
+            raise
+        return self._register(entry)
+
+    def _register(self, entry):
+        # O arquivo recém-enviado já é o estado consolidado
+        entry.journal.truncate()
+        get_compactor().track(entry.onto, entry.path, entry.journal)
+        with self._lock:
+            entry.users += 1
+            self._entries[entry.id] = entry
+            evicted = self._evict()
+        self._close(evicted)
+        return entry
+
+    def discard(self, ontology_id):
+        """Fecha a ontologia (se aberta) e apaga o quadstore e os arquivos dela."""
+        with self._lock:
+            entry = self._entries.pop(ontology_id, None)
+            self._pending.discard(ontology_id)
+        if entry is not None:
+            entry._writer.shutdown(wait=True)
+            get_compactor().untrack(entry.path)
+            with entry.lock.writer:
+                entry.world.close()
+        if os.path.exists(store_path(ontology_id)):
+            os.remove(store_path(ontology_id))
+        shutil.rmtree(os.path.join(settings.MEDIA_ROOT, ontology_id), ignore_errors=True)
+
+    def acquire(self, ontology_id):
+        """
+        Ontologia pelo id (reabrindo do quadstore se preciso); devolver com ``release``.
+
+        A reabertura (e a reaplicação do journal) roda fora do lock do registro: as
+        outras ontologias seguem atendendo, e quem pede o mesmo id espera por ela.
+        """
+        while True:
+            with self._lock:
+                if ontology_id in self._pending:
+                    raise OntologyLoading(ontology_id)
+                entry = self._entries.get(ontology_id)
+                if entry is not None:
+                    self._entries.move_to_end(ontology_id)
+                    entry.users += 1
+                    evicted = self._evict()
+                    break
+                pending = self._loading.get(ontology_id) or self._closing.get(ontology_id)
+                if pending is None:
+                    loading = self._loading[ontology_id] = Future()
+            if pending is not None:
+                # Reabrindo (levanta o erro dela) ou fechando (e então reabre aqui)
+                pending.result()
+                continue
+            try:
+                entry = self._reopen(ontology_id)
+            except BaseException as e:
+                with self._lock:
+                    del self._loading[ontology_id]
+                loading.set_exception(e)
+                raise
+            with self._lock:
+                del self._loading[ontology_id]
+                self._entries[ontology_id] = entry
+                entry.users += 1
+                evicted = self._evict()
+            loading.set_result(entry)
+            break
+        self._close(evicted)
+        return entry
+
+    def release(self, entry):
+        with self._lock:
+            entry.users -= 1
+            evicted = self._evict()
+        self._close(evicted)
+
+    def _reopen(self, ontology_id):
+        if not _ID_RE.match(ontology_id or '') or not os.path.exists(store_path(ontology_id)):
+            raise OntologyNotFound(ontology_id)
+        started = time.monotonic()
+        world = store.open_world(store_path(ontology_id))
+        onto, path = store.reopen_ontology(world)
+        if onto is None:
+            world.close()
+            raise OntologyNotFound(ontology_id)
+        entry = LoadedOntology(ontology_id, world, onto, path)
+        recover(onto, path, entry.journal, entry.replay)
+        get_compactor().track(onto, path, entry.journal)
+        logger.info(f"Ontologia {ontology_id} reaberta em {time.monotonic() - started:.2f}s")
+        return entry
+
+    def _evict(self):
+        """
+        Tira do registro as ontologias menos usadas (e ociosas) até caber no
+        orçamento. Roda com o lock; quem chamou as fecha depois com ``_close``.
+        """
+        evicted = []
+        total = sum(entry.size for entry in self._entries.values())
+        for ontology_id, entry in list(self._entries.items()):
+            if total <= self.memory_budget:
+                break
+            # A mais recente fica aberta mesmo sozinha acima do orçamento
+            if entry.users or ontology_id == next(reversed(self._entries)):
+                continue
+            total -= entry.size
+            del self._entries[ontology_id]
+            self._closing[ontology_id] = Future()
+            evicted.append(entry)
+        return evicted
+
+    def _close(self, evicted):
+        """Compacta e fecha, fora do lock do registro, as ontologias tiradas por ``_evict``."""
+        for entry in evicted:
+            closed = True
+            try:
+                entry.close()
+            except Exception:
+                logger.exception(f"Falha ao fechar a ontologia {entry.id}")
+                closed = False
+            with self._lock:
+                if not closed:
+                    # Continua aberta, como a menos usada
+                    self._entries[entry.id] = entry
+                    self._entries.move_to_end(entry.id, last=False)
+                closing = self._closing.pop(entry.id)
+            closing.set_result(None)
+
+    def loaded_ids(self):
+        with self._lock:
+            return list(self._entries)
+
+    def loaded(self):
+        with self._lock:
+            return list(self._entries.values())
+
+
+_registry = None
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        _registry = OntologyRegistry(settings.ONTOLOGY_MEMORY_BUDGET)
+    return _registry
@@ -0,0 +1,133 @@
+"""
+Renderização das respostas JSON das rotas de ontologia.
+
+O JSON é gerado pelo codificador configurado em ``ONTOLOGY_JSON_ENCODER``
+(``orjson`` se instalado, senão o ``json`` da biblioteca padrão) e comprimido com
+gzip ou brotli (se instalado) conforme o ``Accept-Encoding`` do cliente.
+
+Respostas que se repetem (o resultado de um carregamento, por exemplo) ficam
+num ``Payload``: os bytes do JSON e as versões comprimidas são gerados uma vez e
+reaproveitados a cada nova requisição.
+"""
+import gzip
+import json
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CONTENT_TYPE = 'application/json'
+
+
+def _dumps_json(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def _dumps_orjson(data):
+    return orjson.dumps(data, default=str)
+
+
+# nome -> função(dados) -> bytes
+ENCODERS = {'json': _dumps_json}
+if orjson is not None:
+    ENCODERS['orjson'] = _dumps_orjson
+
+# Content-Encoding -> (compressão rápida, compressão máxima), na ordem de preferência
+COMPRESSORS = {}
+if brotli is not None:
+    COMPRESSORS['br'] = (lambda data: brotli.compress(data, quality=4),
+                         lambda data: brotli.compress(data, quality=9))
+COMPRESSORS['gzip'] = (lambda data: gzip.compress(data, compresslevel=5, mtime=0),
+                       lambda data: gzip.compress(data, compresslevel=9, mtime=0))
+
+
+def register_encoder(name, dumps):
+    """Registra um codificador JSON (``dumps(dados) -> bytes``) para ``ONTOLOGY_JSON_ENCODER``."""
+    ENCODERS[name] = dumps
+
+
+def dumps(data):
+    encoder = ENCODERS.get(settings.ONTOLOGY_JSON_ENCODER) or ENCODERS['json']
+    return encoder(data)
+
+
+def splice(data, key, raw):
+    """
+    JSON de ``data`` com a chave ``key`` valendo ``raw`` (bytes de JSON já pronto),
+    sem decodificar e recodificar ``raw``.
+    """
+    head = dumps(data)
+    separator = b',' if len(head) > 2 else b''
+    return head[:-1] + separator + dumps(key) + b':' + raw + b'}'
+
+
+def accepted_encodings(request):
+    """Compressões aceitas pelo cliente (``Accept-Encoding``), da preferida à menos."""
+    accepted = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name] = q
+    order = list(COMPRESSORS)
+    candidates = [name for name in order if accepted.get(name, accepted.get('*', 0)) > 0]
+    return sorted(candidates, key=lambda name: -accepted.get(name, accepted.get('*', 0)))
+
+
+class Payload:
+    """Corpo JSON pronto, com as versões comprimidas geradas sob demanda e guardadas."""
+
+    def __init__(self, body, best=True):
+        self.body = body
+        self.best = best
+        self._compressed = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_data(cls, data, best=True):
+        return cls(dumps(data), best)
+
+    def encoded(self, encoding):
+        with self._lock:
+            content = self._compressed.get(encoding)
+            if content is None:
+                fast, best = COMPRESSORS[encoding]
+                content = self._compressed[encoding] = (best if self.best else fast)(self.body)
+            return content
+
+    def response(self, request, status=200):
+        content, encoding = self.body, None
+        if len(self.body) >= settings.ONTOLOGY_COMPRESS_MIN_BYTES:
+            for encoding in accepted_encodings(request):
+                content = self.encoded(encoding)
+                break
+            else:
+                encoding = None
+        response = HttpResponse(content, content_type=CONTENT_TYPE, status=status)
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+def render(request, data, status=200):
+    """Resposta JSON de ``data`` (usada uma vez: compressão rápida e nada guardado)."""
+    return Payload.from_data(data, best=False).response(request, status)
@@ -0,0 +1,356 @@
+"""
+Busca textual (com autocompletar e tolerância a erros de digitação) nas entidades.
+
+Índice invertido em memória: cada termo (nome local, rótulos por idioma, IRI e
+comentário, normalizados e quebrados em palavras e camelCase) aponta para as
+entidades que o contêm, com o peso do campo. O vocabulário fica ordenado, então
+o prefixo do autocompletar é uma busca binária, e indexado por trigramas, para
+achar termos a até 1-2 edições de distância sem percorrer o vocabulário todo.
+
+É mantido pelo ``EntityIndex``: montado no carregamento e atualizado a cada
+entidade adicionada/removida.
+"""
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from functools import lru_cache
+from itertools import chain, islice
+
+# Peso de cada campo no placar
+NAME, LABEL, IRI, COMMENT = 4.0, 3.0, 1.0, 0.5
+# Qualidade da correspondência do termo
+EXACT, PREFIX, FUZZY = 1.0, 0.7, 0.4
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Termos do vocabulário considerados por prefixo / por correção, por termo da busca
+MAX_EXPANSIONS = 64
+# Entidades avaliadas por termo da busca: termos muito frequentes (um prefixo de
+# uma letra, o namespace das IRIs) não fazem a busca percorrer a ontologia toda
+MAX_CANDIDATES = 2000
+# Termos presentes em mais que essa fração das entidades (ex.: o namespace das
+# IRIs) só contam se forem os únicos termos da busca
+COMMON_FRACTION = 0.2
+
+_CAMEL_RE = re.compile(r'(?<=[a-z])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])|(?<=[A-Za-z])(?=[0-9])|(?<=[0-9])(?=[A-Za-z])')
+_WORD_RE = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=65536)
+def normalize(text):
+    """Minúsculas e sem acentos."""
+    if text.isascii():
+        return text.lower()
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+
+
+@lru_cache(maxsize=65536)
+def _word_tokens(word):
+    parts = [normalize(part) for part in _CAMEL_RE.sub(' ', word).split()]
+    if len(parts) > 1:
+        parts.append(normalize(word))
+    return parts
+
+
+def tokenize(text):
+    """Termos de ``text``: as palavras, as partes do camelCase e cada palavra inteira."""
+    return [token for word in _WORD_RE.findall(text.replace('_', ' ')) for token in _word_tokens(word)]
+
+
+@lru_cache(maxsize=1024)
+def _namespace_tokens(namespace):
+    return tokenize(namespace)
+
+
+def _iri_tokens(iri):
+    """Termos da IRI; os do namespace, comum a muitas entidades, são calculados uma vez."""
+    cut = max(iri.rfind('#'), iri.rfind('/')) + 1
+    return _namespace_tokens(iri[:cut]) + tokenize(iri[cut:])
+
+
+def _compact(text):
+    return normalize(re.sub(r'\W|_', '', text))
+
+
+def _trigrams(token):
+    padded = f'${token}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a, b, limit):
+    """Distância de Levenshtein entre ``a`` e ``b``, ou ``limit + 1`` se passar do limite."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _max_edits(token):
+    return 0 if len(token) < 4 else 1 if len(token) < 8 else 2
+
+
+class _Document:
+    __slots__ = ('iri', 'kind', 'name', 'key', 'labels', 'terms')
+
+    def __init__(self, iri, kind, name, labels):
+        self.iri = iri
+        self.kind = kind
+        self.name = name
+        # nome normalizado e sem separadores, para premiar a busca pelo nome exato
+        self.key = _compact(name or '')
+        # idioma ('' sem idioma) -> rótulos
+        self.labels = labels
+        # (idioma do rótulo ou None, termo) indexados, para remover depois
+        self.terms = []
+
+
+class SearchIndex:
+    def __init__(self):
+        self._documents = {}
+        # termo -> {iri: peso}; rótulos à parte, por idioma
+        self._postings = {}
+        self._label_postings = {}
+        # quantas entidades usam cada termo (em qualquer campo)
+        self._document_frequency = {}
+        self._vocabulary = []
+        # (trigrama, tamanho do termo) -> termos: a correção só olha os tamanhos possíveis
+        self._trigram_index = {}
+        self._building = False
+        # Termos novos desde ``begin_build``, indexados por trigramas no ``end_build``
+        self._new_terms = []
+
+    def __len__(self):
+        return len(self._documents)
+
+    # --- manutenção ----------------------------------------------------------------
+
+    def begin_build(self):
+        """
+        Até ``end_build`` o vocabulário só recebe append: é ordenado e os termos
+        novos são indexados por trigramas uma vez no fim. Entre os dois só entram
+        entidades novas (nenhum termo sai do vocabulário).
+        """
+        self._building = True
+
+    def end_build(self):
+        self._building = False
+        self._vocabulary.sort()
+        for token in self._new_terms:
+            self._index_trigrams(token)
+        self._new_terms = []
+
+    def add(self, iri, kind, name, labels=(), comments=()):
+        """
+        Indexa (ou reindexa) uma entidade. ``labels`` é uma lista de
+        ``(texto, idioma)``; ``comments``, de textos.
+        """
+        self.remove(iri)
+        by_language = {}
+        for text, language in labels:
+            by_language.setdefault(language or '', []).append(str(text))
+        document = self._documents[iri] = _Document(iri, kind, name, by_language)
+
+        weights = {}
+        for token in tokenize(name or ''):
+            weights[token] = max(weights.get(token, 0), NAME)
+        for token in _iri_tokens(iri):
+            weights.setdefault(token, IRI)
+        for comment in comments:
+            for token in tokenize(str(comment)):
+                weights.setdefault(token, COMMENT)
+        for token, weight in weights.items():
+            self._postings.setdefault(token, {})[iri] = weight
+            document.terms.append((None, token))
+
+        for language, texts in by_language.items():
+            postings = self._label_postings.setdefault(language, {})
+            for token in {t for text in texts for t in tokenize(text)}:
+                postings.setdefault(token, {})[iri] = LABEL
+                document.terms.append((language, token))
+
+        for token in {token for _, token in document.terms}:
+            self._count(token, +1)
+
+    def remove(self, iri):
+        document = self._documents.pop(iri, None)
+        if document is None:
+            return
+        for language, token in document.terms:
+            postings = self._postings if language is None else self._label_postings.get(language, {})
+            entries = postings.get(token)
+            if entries is not None:
+                entries.pop(iri, None)
+                if not entries:
+                    del postings[token]
+        for token in {token for _, token in document.terms}:
+            self._count(token, -1)
+
+    def _count(self, token, delta):
+        frequency = self._document_frequency.get(token, 0) + delta
+        if frequency > 0:
+            if token not in self._document_frequency:
+                self._add_term(token)
+            self._document_frequency[token] = frequency
+        elif token in self._document_frequency:
+            del self._document_frequency[token]
+            self._remove_term(token)
+
+    def _add_term(self, token):
+        if self._building:
+            self._vocabulary.append(token)
+            self._new_terms.append(token)
+        else:
+            insort(self._vocabulary, token)
+            self._index_trigrams(token)
+
+    def _index_trigrams(self, token):
+        for trigram in _trigrams(token):
+            self._trigram_index.setdefault((trigram, len(token)), set()).add(token)
+
+    def _remove_term(self, token):
+        i = bisect_left(self._vocabulary, token)
+        if i < len(self._vocabulary) and self._vocabulary[i] == token:
+            del self._vocabulary[i]
+        for trigram in _trigrams(token):
+            key = (trigram, len(token))
+            tokens = self._trigram_index.get(key)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._trigram_index[key]
+
+    # --- consulta ------------------------------------------------------------------
+
+    def _term_postings(self, token, language):
+        """
+        Os ``(iri, peso)`` do termo (no máximo ``MAX_CANDIDATES`` por campo), com os
+        rótulos só do ``language`` (ou de todos).
+        """
+        sources = [self._postings]
+        if language is not None:
+            sources.append(self._label_postings.get(language, {}))
+        else:
+            sources.extend(self._label_postings.values())
+        for postings in sources:
+            yield from islice(postings.get(token, {}).items(), MAX_CANDIDATES)
+
+    def _prefix_terms(self, token):
+        start = bisect_left(self._vocabulary, token)
+        terms = []
+        for term in self._vocabulary[start:start + MAX_EXPANSIONS + 1]:
+            if not term.startswith(token):
+                break
+            if term != token:
+                terms.append(term)
+        return terms
+
+    def _fuzzy_terms(self, token):
+        """Termos do vocabulário a até 1-2 edições de ``token`` (com a distância)."""
+        edits = _max_edits(token)
+        if not edits:
+            return []
+        trigrams = _trigrams(token)
+        shared = Counter(chain.from_iterable(
+            self._trigram_index.get((trigram, length), ())
+            for trigram in trigrams
+            for length in range(len(token) - edits, len(token) + edits + 1)))
+        # Cada edição destrói no máximo 3 trigramas
+        needed = max(1, len(trigrams) - 3 * edits)
+        candidates = heapq.nlargest(MAX_EXPANSIONS, (item for item in shared.items() if item[1] >= needed),
+                                    key=lambda item: item[1])
+        result = []
+        for term, _ in candidates:
+            if term == token:
+                continue
+            distance = _edit_distance(token, term, edits)
+            if distance <= edits:
+                result.append((term, distance))
+        return result
+
+    def _match(self, token, language, fuzzy, enough):
+        """{iri: pontuação} das entidades que correspondem ao termo da busca."""
+        scores = {}
+
+        def merge(term, quality):
+            for iri, weight in self._term_postings(term, language):
+                score = weight * quality
+                if score > scores.get(iri, 0):
+                    scores[iri] = score
+
+        merge(token, EXACT)
+        for term in self._prefix_terms(token):
+            if len(scores) >= MAX_CANDIDATES:
+                break
+            merge(term, PREFIX)
+        if fuzzy and len(scores) < enough:
+            for term, distance in self._fuzzy_terms(token):
+                merge(term, FUZZY / distance)
+        return scores
+
+    def search(self, query, kinds=None, language=None, limit=DEFAULT_LIMIT, fuzzy=True):
+        """
+        Entidades que correspondem a todos os termos de ``query``, da melhor para a pior.
+
+        Cada termo casa por inteiro, como prefixo (autocompletar) ou, com ``fuzzy``,
+        a até 1-2 edições. ``kinds`` restringe os tipos de entidade e ``language``
+        os rótulos considerados (e o rótulo devolvido).
+        """
+        limit = min(max(limit, 1), MAX_LIMIT)
+        tokens = list(dict.fromkeys(tokenize(query)))
+        # As partes do camelCase bastam; a palavra inteira só se for a única
+        joined = _compact(query)
+        if len(tokens) > 1:
+            tokens = [t for t in tokens if t != joined] or tokens
+        if not tokens:
+            return []
+
+        common = max(1, COMMON_FRACTION * len(self._documents))
+        rare = [t for t in tokens if self._document_frequency.get(t, 0) <= common]
+        if rare:
+            tokens = rare
+
+        matches = [self._match(token, language, fuzzy, limit) for token in tokens]
+        matches.sort(key=len)
+        candidates = matches[0]
+        if kinds:
+            candidates = {iri: score for iri, score in candidates.items()
+                          if self._documents[iri].kind in kinds}
+        scores = {}
+        for iri, score in candidates.items():
+            for other in matches[1:]:
+                if iri not in other:
+                    break
+                score += other[iri]
+            else:
+                if self._documents[iri].key == joined:
+                    score += NAME
+                scores[iri] = score
+
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (
+            -item[1], len(self._documents[item[0]].name or ''), self._documents[item[0]].name or '', item[0]))
+        return [self._result(iri, score, language) for iri, score in best]
+
+    def _result(self, iri, score, language):
+        document = self._documents[iri]
+        labels = document.labels.get(language) if language is not None else None
+        if not labels and document.labels:
+            # Sem o idioma pedido: o rótulo sem idioma ou o do menor código, não o que o
+            # quadstore devolveu primeiro (a ordem muda entre carregamentos)
+            labels = document.labels.get('') or document.labels[min(document.labels)]
+        return {
+            'name': document.name,
+            'iri': iri,
+            'kind': document.kind,
+            'label': labels[0] if labels else None,
+            'score': round(score, 3),
+        }
@@ -0,0 +1,300 @@
+"""
+Conversão de entidades do Owlready2 para os dicionários JSON devolvidos pela API.
+"""
+import json
+import logging
+
+from owlready2 import Or, And, Not, ObjectPropertyClass, DataPropertyClass, AnnotationPropertyClass, rdf_type
+
+logger = logging.getLogger(__name__)
+
+
+def build_entity_hierarchy(entity, memo=None):
+    """
+    Árvore de subclasses de ``entity`` no formato {'name', 'children'}.
+
+    Iterativa e memoizada: em poli-hierarquias cada subárvore é montada uma vez e o
+    mesmo dict é reaproveitado nos outros pais (passe o mesmo ``memo`` para várias
+    raízes). Um ciclo em ``subclass_of`` vira um nó com ``ref`` em vez de recursão
+    infinita.
+    """
+    if memo is None:
+        memo = {}
+    if entity in memo:
+        return memo[entity]
+
+    children = {entity: sorted(entity.subclasses(), key=lambda x: x.name or "")}
+    stack = [(entity, iter(children[entity]))]
+    while stack:
+        cls, pending = stack[-1]
+        for sub in pending:
+            if sub not in memo and sub not in children:
+                children[sub] = sorted(sub.subclasses(), key=lambda x: x.name or "")
+                stack.append((sub, iter(children[sub])))
+                break
+        else:
+            stack.pop()
+            memo[cls] = {
+                'name': cls.name,
+                # sub ainda em montagem = ciclo; vira referência
+                'children': [memo[sub] if sub in memo else {'name': sub.name, 'ref': sub.iri, 'children': []}
+                             for sub in children[cls]]
+            }
+    return memo[entity]
+
+def serialize_entity(entity):
+    return {
+        'name': entity.name,
+        'iri': entity.iri,
+        'comment': entity.comment.first() if entity.comment else ''
+    }
+
+def _process_value(value):
+    if hasattr(value, 'name'):
+        return value.name
+    elif isinstance(value, (Or, And, Not)):
+        return str(value)
+    return str(value)
+
+
+def _property_values(ind, name):
+    try:
+        values = getattr(ind, name)
+        if not isinstance(values, list):
+            values = [values]
+        return [_process_value(v) for v in values]
+    except AttributeError:
+        return []
+    except Exception:
+        return ["ErroAoAcessar"]
+
+
+def _ordered_properties(outgoing, incoming, entity):
+    """
+    As propriedades de ``get_properties()`` numa ordem estável (o Owlready2 devolve
+    um ``set``): as das triplas do indivíduo por storid, depois as inversas das
+    triplas que apontam para ele. ``outgoing``/``incoming`` são os storids dos
+    predicados; ``entity`` carrega a entidade de um storid.
+    """
+    props = {}
+    for p in sorted(outgoing):
+        prop = entity(p)
+        if prop is not None:
+            props[prop] = None
+    for p in sorted(incoming):
+        prop = entity(p)
+        if prop is not None and prop._inverse_property:
+            props[prop._inverse_property] = None
+    return list(props)
+
+
+def serialize_individual(ind):
+    world = ind.namespace.world
+    properties_data = {}
+    for prop in _ordered_properties(world._get_triples_s_p(ind.storid), world._get_obj_triples_o_p(ind.storid),
+                                    world._get_by_storid):
+        properties_data[prop.name] = _property_values(ind, prop.name)
+    return {
+        'name': ind.name,
+        'type': [cls.name for cls in ind.is_a if hasattr(cls, 'name')],
+        'properties': properties_data
+    }
+
+
+# Triplas em que os indivíduos (lista JSON de storids) são sujeito (menos rdf:type) e
+# triplas de objeto em que são objeto por uma propriedade que tem inversa
+_INDIVIDUAL_TRIPLES = """
+    WITH ids(s) AS (SELECT value FROM json_each(?))
+    SELECT 0, s, p, o, NULL, rowid FROM objs WHERE s IN ids AND p != ?
+    UNION ALL SELECT 1, s, p, o, d, rowid FROM datas WHERE s IN ids
+    UNION ALL SELECT 2, o, p, s, c, rowid FROM objs WHERE o IN ids AND p IN (SELECT value FROM json_each(?))
+"""
+_OBJS, _DATAS, _INCOMING = 0, 1, 2
+
+_PROPERTY_CLASSES = (ObjectPropertyClass, DataPropertyClass, AnnotationPropertyClass)
+
+
+class _BulkIndividuals:
+    """
+    Triplas dos indivíduos agrupadas em memória, lidas numa única consulta.
+
+    Reproduz o que ``get_properties()`` e ``getattr`` do Owlready2 devolveriam
+    para cada indivíduo, inclusive a ordem dos valores (que vem dos índices do
+    quadstore). Propriedades com o nome escondido por um atributo Python, ou já
+    lidas por ``getattr`` (ficam no ``__dict__`` do indivíduo), seguem pelo caminho
+    normal.
+    """
+
+    def __init__(self, world, individuals):
+        self.world = world
+        # s -> {p: [(tabela, o, d, rowid)]}; o -> {p: [(c, s)]}
+        self.outgoing = {}
+        self.incoming = {}
+        with_inverse = [prop.storid for prop in world.object_properties() if prop._inverse_property]
+        rows = world.graph.execute(_INDIVIDUAL_TRIPLES, (
+            json.dumps([ind.storid for ind in individuals]), rdf_type, json.dumps(with_inverse),
+        )).fetchall()
+        outgoing, incoming = self.outgoing, self.incoming
+        for table, s, p, o, d, rowid in rows:
+            if table == _INCOMING:
+                incoming.setdefault(s, {}).setdefault(p, []).append((d, o))
+            else:
+                outgoing.setdefault(s, {}).setdefault(p, []).append((table, o, d, rowid))
+        self._entities = {}
+        self._props = {}
+        self._shadowed = {}
+        self._names = {}
+
+    def _entity(self, storid):
+        try:
+            return self._entities[storid]
+        except KeyError:
+            entity = self._entities[storid] = self.world._get_by_storid(storid)
+            return entity
+
+    def _prop(self, name):
+        """A propriedade que ``getattr(ind, name)`` leria (``None`` se não houver)."""
+        try:
+            return self._props[name]
+        except KeyError:
+            prop = self._props[name] = self.world._props.get(name)
+            return prop
+
+    def _is_shadowed(self, ind, name):
+        """``getattr(ind, name)`` não passaria pelo ``__getattr__`` do Owlready2."""
+        if name in ind.__dict__:
+            return True
+        key = (ind.__class__, name)
+        try:
+            return self._shadowed[key]
+        except KeyError:
+            shadowed = self._shadowed[key] = any(name in vars(k) for k in ind.__class__.__mro__)
+            return shadowed
+
+    def _name(self, onto, o, d=None):
+        key = (onto, o, d)
+        try:
+            return self._names[key]
+        except KeyError:
+            name = self._names[key] = _process_value(onto._to_python(o, d))
+            return name
+
+    def serialize(self, ind):
+        outgoing = self.outgoing.get(ind.storid, {})
+        incoming = self.incoming.get(ind.storid, {})
+        properties_data = {}
+        for prop in _ordered_properties(outgoing, incoming, self._entity):
+            name = prop.name
+            target = self._prop(name)
+            if target is None:
+                properties_data[name] = []
+            elif self._is_shadowed(ind, name) or not isinstance(target, _PROPERTY_CLASSES):
+                properties_data[name] = _property_values(ind, name)
+            else:
+                try:
+                    properties_data[name] = self._values(ind, target, outgoing, incoming)
+                except Exception:
+                    properties_data[name] = ["ErroAoAcessar"]
+        return {
+            'name': ind.name,
+            'type': [cls.name for cls in ind.is_a if hasattr(cls, 'name')],
+            'properties': properties_data
+        }
+
+    def _values(self, ind, prop, outgoing, incoming):
+        onto = ind.namespace.ontology
+        rows = outgoing.get(prop.storid, ())
+        if len(rows) > 1:
+            rows = sorted(rows, key=lambda row: (row[0], row[3]))
+        functional = prop.is_functional_for(ind.__class__)
+        if isinstance(prop, ObjectPropertyClass):
+            objects = [o for table, o, d, rowid in rows if table == _OBJS]
+            inverse = incoming.get(prop._inverse_storid, ()) if prop._inverse_storid else ()
+            if functional:
+                # sp_o LIMIT 1, senão po_s LIMIT 1 (índice (o, p, c, s))
+                value = objects[0] if objects else (min(inverse)[1] if inverse else None)
+                return [self._name(onto, value) if value else 'None']
+            if inverse:
+                # O Owlready2 junta as duas direções com UNION (ordenado e sem repetição)
+                objects = sorted(set(objects).union(s for c, s in inverse))
+            return [self._name(onto, o) for o in objects]
+        if isinstance(prop, DataPropertyClass):
+            rows = [row for row in rows if row[0] == _DATAS]
+        values = [self._name(onto, o, d) for table, o, d, rowid in rows]
+        if functional:
+            return values[:1] or ['None']
+        return values
+
+
+def serialize_individuals(individuals):
+    """
+    O mesmo que ``[serialize_individual(i) for i in individuals]``, com as triplas de
+    todos os indivíduos lidas numa única consulta ao quadstore em vez de uma
+    consulta por indivíduo e por propriedade.
+    """
+    individuals = list(individuals)
+    if not individuals:
+        return []
+    bulk = _BulkIndividuals(individuals[0].namespace.world, individuals)
+    return [bulk.serialize(ind) for ind in individuals]
+
+
+def serialize_property(prop):
+    try:
+        from owlready2 import And, Or, FunctionalProperty, TransitiveProperty, SymmetricProperty, ObjectProperty
+
+        # Helper para extrair nomes de classes de expressões lógicas (And/Or)
+        def extract_classes(item):
+            if isinstance(item, (And, Or)):
+                return [extract_classes(c) for c in item.Classes]
+            elif hasattr(item, 'name'):
+                return item.name
+            else:
+                return str(item)
+
+        # Converter IRI para string e garantir valores padrão
+        prop_data = {
+            'name': getattr(prop, 'name', ''),
+            'iri': str(getattr(prop, 'iri', '')),
+            'domain': [],
+            'range': [],
+            'is_functional': False,
+            'is_transitive': False,
+            'is_symmetric': False,
+            'error': None
+        }
+
+        # Verificar se é uma propriedade de objeto
+        if not isinstance(prop, ObjectProperty):
+            prop_data['error'] = 'Tipo de propriedade não suportado'
+            return prop_data
+
+        # Processar domínio
+        domain = getattr(prop, 'domain', [])
+        if not isinstance(domain, list):
+            domain = [domain]
+        prop_data['domain'] = [extract_classes(item) for item in domain]
+
+        # Processar range
+        prop_range = getattr(prop, 'range', [])
+        if not isinstance(prop_range, list):
+            prop_range = [prop_range]
+        prop_data['range'] = [extract_classes(item) for item in prop_range]
+
+        # Verificar características especiais
+        prop_data['is_functional'] = isinstance(prop, FunctionalProperty)
+        prop_data['is_transitive'] = isinstance(prop, TransitiveProperty)
+        prop_data['is_symmetric'] = isinstance(prop, SymmetricProperty)
+
+        return prop_data
+
+    except Exception as e:
+        # Log detalhado para debug
+        import logging
+        logger = logging.getLogger(__name__)
+        logger.error(f"Erro serializando propriedade {prop}: {str(e)}", exc_info=True)
+        
+        return {
+            'name': getattr(prop, 'name', 'ErroDesconhecido'),
+            'error': str(e)
+        }
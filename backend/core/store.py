@@ -0,0 +1,186 @@
+"""
+Quadstore persistente (SQLite) do Owlready2 usado pelas views de ontologia.
+
+Cada ontologia carregada tem o seu próprio arquivo (ver ``registry``), então
+reabrir uma ontologia depois de reiniciar o servidor ou de ela sair da memória
+não exige parsear o RDF/XML de novo.
+"""
+import json
+import logging
+import os
+import time
+
+from owlready2 import World
+from owlready2.base import rdf_type
+
+logger = logging.getLogger(__name__)
+
+
+def open_world(path):
+    """Abre o World persistente (quadstore SQLite) de uma ontologia."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # exclusive=False permite que vários workers abram o mesmo arquivo
+    world = World(filename=path, exclusive=False)
+    world.graph.execute(
+        "CREATE TABLE IF NOT EXISTS o3po_state (iri TEXT PRIMARY KEY, data TEXT)"
+    )
+    # ``o3po_name(iri)``: o nome local, para ordenar por nome no SQL (ver ``hierarchy``)
+    world.graph.db.create_function('o3po_name', 1, local_name, deterministic=True)
+    world.save()
+    return world
+
+
+def local_name(iri):
+    """Nome local do IRI, como o Owlready2 calcula ``entity.name``."""
+    i = iri.rfind('#')
+    return iri[i + 1:] if i >= 0 else iri[iri.rfind('/') + 1:]
+
+
+def get_state(onto):
+    """Metadados gravados para a ontologia (dict vazio se não houver)."""
+    row = onto.world.graph.execute("SELECT data FROM o3po_state WHERE iri=?", (onto.base_iri,)).fetchone()
+    return json.loads(row[0]) if row else {}
+
+
+def set_state(onto, **fields):
+    """Atualiza os metadados da ontologia. O commit acontece no próximo ``commit()``."""
+    data = get_state(onto)
+    data.update(fields)
+    onto.world.graph.execute(
+        "INSERT OR REPLACE INTO o3po_state (iri, data) VALUES (?, ?)", (onto.base_iri, json.dumps(data))
+    )
+
+
+def commit(onto):
+    """Grava no disco as alterações pendentes do quadstore."""
+    onto.world.save()
+
+
+def rollback(onto):
+    """
+    Descarta as alterações ainda não commitadas no quadstore.
+
+    As entidades em memória não são tocadas: quem chamou relê as que a transação
+    alterou (ver ``LoadedOntology.rollback``). Retorna ``False`` se não havia nada
+    a desfazer.
+    """
+    db = onto.world.graph.db
+    if not db.in_transaction:
+        return False
+    db.rollback()
+    return True
+
+
+def _unregister_property(world, entity):
+    """Tira a propriedade dos registros por nome do Owlready2 (se for a registrada)."""
+    python_name = getattr(entity, 'python_name', None)
+    for registry in (world._props, world._reasoning_props):
+        if python_name and registry.get(python_name) is entity:
+            del registry[python_name]
+
+
+def forget(onto, storid, entity=None):
+    """
+    Descarta a entidade em memória de ``storid`` (``entity``, se já carregada): o
+    próximo acesso a relê do quadstore. Para alterações feitas direto nas tabelas.
+    """
+    world = onto.world
+    cached = world._entities.get(storid)
+    # As entidades predefinidas (owl:Thing...) são compartilhadas entre os Worlds
+    if cached is not None and cached.namespace.world is world:
+        del world._entities[storid]
+        _unregister_property(world, cached)
+    if entity is not None:
+        _unregister_property(world, entity)
+
+
+def resource_iris(onto, storids):
+    """``{storid: IRI}`` dos recursos nomeados em ``storids``."""
+    graph = onto.world.graph
+    return {storid: row[0] for storid in storids
+            if (row := graph.execute("SELECT iri FROM resources WHERE storid=?", (storid,)).fetchone())}
+
+
+def resource_storids(onto, iris):
+    """``{storid: IRI}`` dos IRIs em ``iris`` que já são recursos do quadstore."""
+    graph = onto.world.graph
+    return {row[0]: iri for iri in iris
+            if (row := graph.execute("SELECT storid FROM resources WHERE iri=?", (iri,)).fetchone())}
+
+
+def has_type(onto, storid):
+    """Se o recurso tem algum ``rdf:type`` no quadstore (em qualquer ontologia)."""
+    return onto.world.graph.execute(
+        "SELECT 1 FROM objs WHERE s=? AND p=? LIMIT 1", (storid, rdf_type)).fetchone() is not None
+
+
+def get_revision(onto):
+    return get_state(onto).get('revision', 0)
+
+
+def bump_revision(onto):
+    """Incrementa a revisão da ontologia (gravada junto com o próximo ``commit()``)."""
+    revision = get_revision(onto) + 1
+    set_state(onto, revision=revision)
+    return revision
+
+
+class _ProgressReader:
+    """Arquivo binário que informa a ``callback`` quantos bytes o parser já leu."""
+
+    def __init__(self, f, callback):
+        self._f = f
+        self._callback = callback
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self._callback(self._f.tell())
+        return data
+
+    def readline(self, size=-1):
+        line = self._f.readline(size)
+        self._callback(self._f.tell())
+        return line
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+def load_ontology(world, path, on_read=None):
+    """
+    Parseia o arquivo ``path`` para dentro do quadstore, substituindo a versão anterior.
+
+    ``on_read(bytes_lidos)`` (opcional) é chamado conforme o parser avança no
+    arquivo; uma exceção levantada por ele interrompe o parse.
+    """
+    if on_read is None:
+        onto = world.get_ontology(path).load(reload=True)
+    else:
+        onto = world.get_ontology(path).load(fileobj=_ProgressReader(open(path, 'rb'), on_read), reload=True)
+    set_state(onto, path=path, loaded_at=time.time())
+    # Recarregar substitui o conteúdo, então também conta como nova revisão
+    bump_revision(onto)
+    commit(onto)
+    return onto
+
+
+def reopen_ontology(world):
+    """
+    Reabre a ontologia gravada no quadstore, sem parsear o arquivo.
+
+    Retorna ``(onto, path)`` ou ``(None, "")`` se nada foi carregado nele ainda.
+    """
+    rows = world.graph.execute("SELECT iri, data FROM o3po_state").fetchall()
+    if not rows:
+        return None, ""
+    iri, data = max(rows, key=lambda row: json.loads(row[1]).get('loaded_at', 0))
+    data = json.loads(data)
+    try:
+        onto = world.get_ontology(iri).load()
+    except Exception:
+        logger.exception(f"Não foi possível reabrir a ontologia {iri}")
+        return None, ""
+    return onto, data.get('path', "")
@@ -0,0 +1,149 @@
+"""
+Bases dos testes: tudo o que eles gravam fica num diretório temporário.
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+import types
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, SimpleTestCase, override_settings
+from owlready2 import Thing
+
+from .. import diff, imports, operations, store, upload_cache, views
+from ..index import EntityIndex
+from ..registry import get_registry
+
+IRI = 'http://example.org/teste#'
+
+
+def ontology_file(path, build, iri=IRI):
+    """Grava em ``path`` (RDF/XML) a ontologia que ``build(onto)`` monta."""
+    world = store.open_world(f"{path}.sqlite3")
+    try:
+        onto = world.get_ontology(iri)
+        with onto:
+            build(onto)
+        onto.save(file=path, format='rdfxml')
+    finally:
+        world.close()
+        os.remove(f"{path}.sqlite3")
+    return path
+
+
+def animal(onto):
+    """Ontologia mínima: só a classe ``Animal``."""
+    types.new_class('Animal', (Thing,))
+
+
+def create_ontology(registry, path):
+    """Carrega ``path`` em ``registry`` como o job de ``load-ontology/``; devolve o id."""
+    ontology_id, upload_path = registry.allocate(os.path.basename(path))
+    shutil.copyfile(path, upload_path)
+    entry = registry.create(ontology_id, upload_path)
+    registry.publish(ontology_id)
+    registry.release(entry)
+    return ontology_id
+
+
+class IsolatedTestCase(SimpleTestCase):
+    """
+    MEDIA_ROOT, quadstores, caches e catálogo de imports num diretório temporário.
+
+    As views guardam o cache de uploads e o resolvedor de imports criados quando o
+    módulo é importado; durante o teste eles são trocados pelos do diretório
+    temporário.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.mkdtemp(prefix='o3po-test-')
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        stores = os.path.join(self.dir, 'stores')
+        self._start(override_settings(
+            MEDIA_ROOT=os.path.join(self.dir, 'media'),
+            ONTOLOGY_STORE_DIR=stores,
+            ONTOLOGY_UPLOAD_CACHE_DIR=os.path.join(stores, 'uploads'),
+            ONTOLOGY_IMPORTS_DIR=os.path.join(self.dir, 'imports'),
+            ONTOLOGY_IMPORTS_OFFLINE=True,
+        ))
+        self._start(mock.patch.object(imports, '_resolver', None))
+        self._start(mock.patch.object(upload_cache, '_cache', None))
+        resolver = imports.get_import_resolver()
+        self.addCleanup(resolver._pool.shutdown)
+        self._start(mock.patch.object(views, 'import_resolver', resolver))
+        self._start(mock.patch.object(views, 'upload_cache', upload_cache.get_upload_cache()))
+
+    def _start(self, context):
+        context.__enter__()
+        self.addCleanup(context.__exit__, None, None, None)
+
+    def ontology_file(self, build=animal, name='teste.owl', iri=IRI):
+        return ontology_file(os.path.join(self.dir, name), build, iri)
+
+
+class QuadstoreTestCase(IsolatedTestCase):
+    """Ontologia pequena (classe ``Animal``) num quadstore temporário."""
+
+    def setUp(self):
+        super().setUp()
+        self.world = store.open_world(os.path.join(self.dir, 'store.sqlite3'))
+        self.addCleanup(self.world.close)
+        self.onto = self.world.get_ontology(IRI)
+        with self.onto:
+            animal(self.onto)
+        store.commit(self.onto)
+        self.index = EntityIndex(self.onto)
+
+    def mutate(self, op, data):
+        """Aplica ``op`` como as views: uma revisão nova e um commit."""
+        operations.apply(op, self.onto, self.index, data)
+        revision = store.bump_revision(self.onto)
+        store.commit(self.onto)
+        return revision
+
+    def assertSameStore(self, expected):
+        result = diff.diff(expected, diff.read_store(self.onto))
+        self.assertEqual(result['changes'], {})
+        self.assertEqual(result['summary']['triples_added'], 0)
+        self.assertEqual(result['summary']['triples_removed'], 0)
+
+
+class ApiTestCase(IsolatedTestCase):
+    """Rotas HTTP sobre uma ontologia carregada por ``load-ontology/``."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = Client(HTTP_HOST='localhost')
+
+    def load(self, path=None, filename='teste.owl', **data):
+        """Envia ``path`` (padrão: ``animal``), espera o job e devolve o corpo do resultado."""
+        if path is None:
+            path = self.ontology_file()
+        with open(path, 'rb') as f:
+            response = self.client.post('/load-ontology/', {'ontology_file': SimpleUploadedFile(filename, f.read()),
+                                                            **data})
+        self.assertEqual(response.status_code, 202, response.content)
+        self.started = response.json()
+        job = self.started['job_id']
+        self.addCleanup(get_registry().discard, self.started['ontology_id'])
+        deadline = time.monotonic() + 60
+        while self.client.get(f'/load-jobs/{job}/').json()['job']['status'] == 'running':
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        response = self.client.get(f'/load-jobs/{job}/result/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.ontology_id = self.started['ontology_id']
+        return response.json()
+
+    def url(self, url, ontology_id=None):
+        return f"{url}{'&' if '?' in url else '?'}ontology_id={ontology_id or self.ontology_id}"
+
+    def get(self, url, ontology_id=None, **headers):
+        return self.client.get(self.url(url, ontology_id), **headers)
+
+    def post(self, url, body, ontology_id=None):
+        return self.client.post(self.url(url, ontology_id), json.dumps(body), content_type='application/json')
@@ -0,0 +1,32 @@
+from .base import ApiTestCase
+
+
+class BatchTests(ApiTestCase):
+    """A rota ``batch/`` aplica todas as operações ou nenhuma."""
+
+    def setUp(self):
+        super().setUp()
+        self.load()
+
+    def classes(self):
+        return [result['name'] for result in self.get('/search/?q=Gato').json()['results']]
+
+    def test_failed_operation_rolls_back_the_whole_batch(self):
+        before = self.get('/history/').json()
+
+        response = self.post('/batch/', {'operations': [
+            {'op': 'create_class', 'data': {'name': 'Gato', 'parents': ['Animal']}},
+            {'op': 'create_individual', 'data': {'name': 'tom', 'classes': ['Gato']}},
+            {'op': 'create_class', 'data': {'name': 'Peixe', 'parents': ['Nada']}},
+        ]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [2])
+        self.assertEqual(self.classes(), [])
+        self.assertEqual(self.get('/history/').json(), before)
+        # O mesmo nome pode ser criado depois do rollback
+        response = self.post('/batch/', {'operations': [
+            {'op': 'create_class', 'data': {'name': 'Gato', 'parents': ['Animal']}},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.classes(), ['Gato'])
@@ -0,0 +1,146 @@
+import json
+import types
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from owlready2 import AnnotationProperty, DataProperty, FunctionalProperty, ObjectProperty, Thing
+
+from .. import diff, views
+from ..index import EntityIndex
+from .base import IRI, ApiTestCase
+
+
+def people(onto):
+    person = types.new_class('Pessoa', (Thing,))
+    types.new_class('Aluno', (person,))
+    types.new_class('idade', (DataProperty, FunctionalProperty))
+    types.new_class('apelido', (DataProperty,))
+    types.new_class('conhece', (ObjectProperty,))
+    types.new_class('nota', (AnnotationProperty,))
+    person('ana')
+
+
+def individual(name, classes=('Pessoa',), age=None, nicknames=(), knows=(), **extra):
+    row = {'name': name, 'classes': list(classes)}
+    if age is not None or nicknames:
+        row['properties'] = {}
+        if age is not None:
+            row['properties']['idade'] = [{'value': str(age), 'datatype': 'xsd:integer'}]
+        if nicknames:
+            row['properties']['apelido'] = [{'value': nickname} for nickname in nicknames]
+    if knows:
+        row['object_properties'] = {'conhece': list(knows)}
+    return {**row, **extra}
+
+
+# Linhas simples (gravadas em lote), uma com anotação no meio (criada por
+# ``create_individual``) e as que dependem dela e das anteriores do mesmo lote
+ROWS = [
+    individual('p1', age=30, knows=['ana']),
+    individual('p2', classes=['Aluno'], nicknames=['dois', 'segundo'], knows=['p1', 'p2']),
+    individual('p3', knows=['p2'], annotations={'nota': ['criado à parte']}),
+    individual('p4', classes=['Pessoa', 'Aluno'], age=20, knows=['p3', 'p1']),
+    # Funcional: só o primeiro valor vale
+    {**individual('p5'), 'properties': {'idade': [{'value': '7', 'datatype': 'xsd:integer'},
+                                                  {'value': '8', 'datatype': 'xsd:integer'}]}},
+    individual('p6', knows=['p5', 'nao-existe']),
+    individual('p7', classes=['Aluno'], knows=[IRI + 'p6']),
+]
+INVALID = [
+    (3, individual('x1', classes=['Nada'])),
+    (6, {'classes': ['Pessoa']}),
+    (8, 'não é JSON'),
+]
+
+
+def jsonl(rows, invalid=()):
+    lines = [json.dumps(row, ensure_ascii=False) for row in rows]
+    for line_no, row in invalid:
+        lines.insert(line_no - 1, row if isinstance(row, str) else json.dumps(row))
+    return '\n'.join(lines).encode()
+
+
+@override_settings(ONTOLOGY_IMPORT_CHUNK_SIZE=4)
+class BulkImportTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = self.ontology_file(people)
+        self.load(self.path)
+
+    def import_file(self, content, filename='pessoas.jsonl'):
+        response = self.client.post(self.url('/import-individuals/'),
+                                    {'file': SimpleUploadedFile(filename, content)})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def individuals(self, ontology_id=None):
+        response = self.get('/individuals/?fields=iri,type,properties&limit=1000', ontology_id)
+        return response.json()['individuals']
+
+    def acquire(self, ontology_id=None):
+        entry = views.registry.acquire(ontology_id or self.ontology_id)
+        self.addCleanup(views.registry.release, entry)
+        return entry
+
+    def test_same_result_as_creating_one_by_one(self):
+        report = self.import_file(jsonl(ROWS, INVALID))
+        self.assertEqual((report['imported'], report['failed']), (len(ROWS), len(INVALID)))
+        self.assertEqual([error['row'] for error in report['errors']], [3, 6, 8])
+        self.assertIn('Nada', report['errors'][0]['message'])
+        imported = self.ontology_id
+        p5 = next(item for item in self.individuals() if item['iri'] == IRI + 'p5')
+        self.assertEqual(p5['properties']['idade'], ['7'])
+
+        self.load(self.path)
+        response = self.post('/batch/', {'operations': [{'op': 'create_individual', 'data': row} for row in ROWS]})
+        self.assertEqual(response.status_code, 200, response.content)
+
+        self.assertEqual(self.individuals(imported), self.individuals())
+        bulk, one_by_one = self.acquire(imported), self.acquire()
+        with bulk.reading(), one_by_one.reading():
+            result = diff.diff(diff.read_store(bulk.onto), diff.read_store(one_by_one.onto))
+        self.assertEqual(result['changes'], {})
+
+    def test_csv(self):
+        content = '\n'.join([
+            'name,classes,data:idade^^xsd:integer,data:apelido,obj:conhece',
+            'p1,Pessoa,30,,ana',
+            'p2,Aluno,,dois|segundo,p1|p2',
+            'x1,Nada,,,',
+        ]).encode()
+        report = self.import_file(content, 'pessoas.csv')
+        self.assertEqual((report['imported'], report['failed']), (2, 1))
+        imported = self.individuals()
+
+        self.load(self.path)
+        self.import_file(jsonl(ROWS[:2]))
+        self.assertEqual(imported, self.individuals())
+
+    def test_index_matches_a_fresh_index(self):
+        self.import_file(jsonl(ROWS, INVALID))
+
+        entry = self.acquire()
+        with entry.reading():
+            fresh = EntityIndex(entry.onto)
+            for cls in (None, IRI + 'Pessoa', IRI + 'Aluno'):
+                self.assertEqual(entry.index.individual_keys(cls), fresh.individual_keys(cls))
+            for row in ROWS:
+                self.assertIs(entry.index.resolve(row['name']), fresh.resolve(row['name']))
+                self.assertEqual(entry.index.search.search(row['name']), fresh.search.search(row['name']))
+            self.assertEqual(entry.index.search.search('segundo'), fresh.search.search('segundo'))
+
+    def test_undo_and_redo(self):
+        before = self.individuals()
+        self.import_file(jsonl(ROWS))
+        after = self.individuals()
+        self.assertEqual(len(after), len(before) + len(ROWS))
+
+        # Cada bloco é uma mutação (outras podem entrar entre eles): um passo por bloco
+        for _ in range(2):
+            self.assertEqual(self.post('/undo/', {}).status_code, 200)
+        self.assertEqual(self.individuals(), before)
+        self.assertEqual(self.get('/search/?q=p4').json()['results'], [])
+
+        for _ in range(2):
+            self.assertEqual(self.post('/redo/', {}).status_code, 200)
+        self.assertEqual(self.individuals(), after)
@@ -0,0 +1,156 @@
+import random
+import types
+
+from django.test import SimpleTestCase
+from owlready2 import Thing
+
+from ..closure import RELATIONS, ClosureIndex, keys_page
+from .base import IRI, ApiTestCase
+
+
+class Model:
+    """O fecho calculado do zero a cada consulta, para comparar com o ``ClosureIndex``."""
+
+    def __init__(self):
+        self.parents = {}
+
+    def add(self, iri, parents):
+        self.parents[iri] = set(parents)
+
+    def remove(self, iri):
+        del self.parents[iri]
+        for parents in self.parents.values():
+            parents.discard(iri)
+
+    def ancestors(self, iri):
+        seen, stack = set(), list(self.parents[iri])
+        while stack:
+            parent = stack.pop()
+            if parent not in seen:
+                seen.add(parent)
+                stack.extend(self.parents[parent])
+        return seen - {iri}
+
+    def relations(self, iri):
+        return {
+            'parents': self.parents[iri],
+            'children': {child for child, parents in self.parents.items() if iri in parents},
+            'ancestors': self.ancestors(iri),
+            'descendants': {other for other in self.parents if iri in self.ancestors(other)},
+        }
+
+
+class ClosureIndexTests(SimpleTestCase):
+    def assertSameClosure(self, closure, model):
+        self.assertEqual(len(closure), len(model.parents))
+        for iri in model.parents:
+            expected = model.relations(iri)
+            for relation in RELATIONS:
+                self.assertEqual(closure.relation(relation, iri), expected[relation], (relation, iri))
+                self.assertEqual(closure.sorted_keys(relation, iri),
+                                 sorted((iri[len(IRI):], iri) for iri in expected[relation]), (relation, iri))
+
+    def test_incremental_updates_match_a_full_recomputation(self):
+        names = [f'{IRI}C{n:02d}' for n in range(25)]
+        for seed in range(10):
+            rng = random.Random(seed)
+            closure, model = ClosureIndex(), Model()
+            for step in range(150):
+                known = list(model.parents)
+                action = rng.random()
+                if known and action < 0.2:
+                    iri = rng.choice(known)
+                    closure.remove(iri)
+                    model.remove(iri)
+                else:
+                    # Classe nova ou superclasses trocadas (inclusive fechando ciclos)
+                    iri = rng.choice(names)
+                    parents = set(rng.sample(known, min(len(known), rng.randint(0, 3))))
+                    closure.add(iri, iri[len(IRI):], parents)
+                    # Superclasses desconhecidas (e a própria, se nova) são ignoradas
+                    model.add(iri, parents & (set(model.parents) | {iri}))
+                # Compara também as listas ordenadas: elas precisam ser invalidadas a cada mudança
+                with self.subTest(seed=seed, step=step):
+                    self.assertSameClosure(closure, model)
+
+    def test_build_matches_incremental(self):
+        rng = random.Random(7)
+        names = [f'{IRI}C{n:02d}' for n in range(40)]
+        edges = {iri: set(rng.sample(names, rng.randint(0, 3))) for iri in names}
+
+        built = ClosureIndex()
+        built.begin_build()
+        for iri, parents in edges.items():
+            built.add(iri, iri[len(IRI):], parents | {f'{IRI}Externa'})
+        built.remove(names[0])
+        built.end_build()
+
+        model = Model()
+        for iri, parents in edges.items():
+            model.add(iri, set(parents))
+        model.remove(names[0])
+        self.assertSameClosure(built, model)
+
+    def test_cycle_does_not_make_a_class_its_own_ancestor(self):
+        closure = ClosureIndex()
+        a, b, c = (f'{IRI}{name}' for name in 'ABC')
+        closure.add(a, 'A', [])
+        closure.add(b, 'B', [a])
+        closure.add(c, 'C', [b])
+        closure.add(a, 'A', [c])
+
+        self.assertEqual(closure.ancestors(a), {b, c})
+        self.assertEqual(closure.descendants(a), {b, c})
+        self.assertTrue(closure.is_descendant(a, c))
+
+        closure.add(a, 'A', [])
+        self.assertEqual(closure.ancestors(a), set())
+        self.assertEqual(closure.descendants(a), {b, c})
+
+    def test_keys_page(self):
+        keys = [(f'C{n:02d}', f'{IRI}C{n:02d}') for n in range(7)]
+        pages, cursor = [], None
+        while True:
+            page, cursor = keys_page(keys, cursor, limit=3)
+            pages.append(page)
+            if cursor is None:
+                break
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), keys)
+
+
+def mammals(onto):
+    animal = types.new_class('Animal', (Thing,))
+    mammal = types.new_class('Mamifero', (animal,))
+    dog = types.new_class('Cachorro', (mammal,))
+    dog('rex')
+
+
+class ClosureViewTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.load(self.ontology_file(mammals))
+
+    def names(self, url, relation):
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [item['name'] for item in response.json()[relation]]
+
+    def test_ancestors_descendants_and_instances(self):
+        self.assertEqual(self.names('/ancestors/?entity=Cachorro', 'ancestors'), ['Animal', 'Mamifero'])
+        self.assertEqual(self.names('/ancestors/?entity=Cachorro&direct=true', 'parents'), ['Mamifero'])
+        self.assertEqual(self.names('/descendants/?entity=Animal', 'descendants'), ['Cachorro', 'Mamifero'])
+        self.assertEqual(self.names('/instances/?class=Animal', 'instances'), ['rex'])
+        self.assertEqual(self.names('/instances/?class=Animal&direct=true', 'instances'), [])
+
+    def test_mutations_update_the_closure(self):
+        response = self.post('/batch/', {'operations': [
+            {'op': 'create_class', 'data': {'name': 'Gato', 'parents': ['Mamifero']}},
+            {'op': 'create_individual', 'data': {'name': 'tom', 'classes': ['Gato']}},
+        ]})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.names('/descendants/?entity=Animal', 'descendants'), ['Cachorro', 'Gato', 'Mamifero'])
+        self.assertEqual(self.names('/instances/?class=Mamifero', 'instances'), ['rex', 'tom'])
+
+    def test_unknown_entity(self):
+        self.assertEqual(self.get('/ancestors/?entity=Nada').status_code, 404)
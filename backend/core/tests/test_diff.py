@@ -0,0 +1,32 @@
+import os
+
+from .. import diff
+from .base import QuadstoreTestCase
+
+
+class DiffTests(QuadstoreTestCase):
+    def test_identical_stores(self):
+        result = diff.diff(diff.read_store(self.onto), diff.read_store(self.onto))
+        self.assertEqual(result['changes'], {})
+        self.assertEqual(result['summary']['entities_changed'], 0)
+        self.assertEqual(result['summary']['unchanged'], len(diff.read_store(self.onto).hashes))
+
+    def test_file_and_store_match(self):
+        path = os.path.join(self.dir, 'teste.owl')
+        self.onto.save(file=path, format='rdfxml')
+        self.assertEqual(diff.diff(diff.read_file(path), diff.read_store(self.onto))['changes'], {})
+
+    def test_changed_store(self):
+        old = diff.read_store(self.onto)
+        self.mutate('create_class', {'name': 'Gato', 'parents': ['Animal']})
+        self.mutate('create_individual', {'name': 'tom', 'classes': ['Gato']})
+
+        result = diff.diff(old, diff.read_store(self.onto))
+
+        self.assertEqual([(e['name'], e['status']) for e in result['changes']['classes']], [('Gato', 'added')])
+        self.assertEqual([(e['name'], e['status']) for e in result['changes']['individuals']], [('tom', 'added')])
+        self.assertEqual(result['summary']['triples_removed'], 0)
+        # E o caminho inverso remove as mesmas triplas
+        back = diff.diff(diff.read_store(self.onto), old)
+        self.assertEqual(back['summary']['triples_removed'], result['summary']['triples_added'])
+        self.assertEqual([e['status'] for e in back['changes']['classes']], ['removed'])
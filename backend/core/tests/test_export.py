@@ -0,0 +1,166 @@
+import gzip
+import io
+import types
+
+from django.test import SimpleTestCase
+from owlready2 import DataProperty, Thing
+
+from .. import export, views
+from .base import ApiTestCase
+
+
+def animals(onto):
+    animal = types.new_class('Animal', (Thing,))
+    age = types.new_class('idade', (DataProperty,))
+    for n in range(300):
+        cls = types.new_class(f'Especie{n}', (animal,))
+        ind = cls(f'exemplar{n}')
+        age[ind] = [n]
+
+
+class ExportTestCase(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.load(self.ontology_file(animals))
+
+    def export(self, query='', **headers):
+        return self.get(f'/export-ontology/?{query}', **headers)
+
+    def content(self, response):
+        self.assertEqual(response.status_code, 200, getattr(response, 'content', b''))
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.content
+
+    def saved(self, fmt):
+        """O que ``onto.save`` grava agora, para comparar com a exportação."""
+        entry = views.registry.acquire(self.ontology_id)
+        try:
+            with entry.reading():
+                f = io.BytesIO()
+                entry.onto.save(file=f, format=fmt)
+                return f.getvalue()
+        finally:
+            views.registry.release(entry)
+
+    def mutate(self, name):
+        response = self.post('/batch/', {'operations': [
+            {'op': 'create_class', 'data': {'name': name, 'parents': ['Animal']}},
+        ]})
+        self.assertEqual(response.status_code, 200, response.content)
+
+
+class ExportTests(ExportTestCase):
+    def test_formats_match_onto_save(self):
+        for fmt in export.FORMATS:
+            with self.subTest(format=fmt):
+                response = self.export(f'format={fmt}')
+                self.assertTrue(response.streaming)
+                self.assertEqual(response['Content-Type'].split(';')[0], export.FORMATS[fmt][0])
+                self.assertEqual(self.content(response), self.saved(fmt))
+
+    def test_gzip(self):
+        response = self.export('format=ntriples&compression=gzip&filename=animais.owl')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="animais.nt.gz"')
+        self.assertEqual(gzip.decompress(self.content(response)), self.saved('ntriples'))
+
+    def test_mutation_during_the_export_is_not_included(self):
+        before = self.saved('ntriples')
+        response = self.export('format=ntriples')
+        chunks = iter(response.streaming_content)
+        # O primeiro bloco só sai depois da cópia do quadstore
+        first = next(chunks)
+        self.mutate('Peixe')
+
+        self.assertEqual(first + b''.join(chunks), before)
+        self.assertIn(b'#Peixe>', self.content(self.export('format=ntriples')))
+
+    def test_client_disconnect_releases_the_export(self):
+        response = self.export('format=ntriples')
+        chunks = iter(response.streaming_content)
+        next(chunks)
+        response.close()
+        # Sem o produtor preso na fila nem o lock de leitura retido, a mutação passa
+        self.mutate('Peixe')
+        self.assertIn(b'#Peixe>', self.content(self.export('format=ntriples')))
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.export('format=turtle').status_code, 400)
+        self.assertEqual(self.export('compression=zip').status_code, 400)
+
+    def test_export_filename(self):
+        self.assertEqual(export.export_filename('ontologia.owl'), 'ontologia.owl')
+        self.assertEqual(export.export_filename('ontologia.owl', 'nquads'), 'ontologia.nq')
+        self.assertEqual(export.export_filename('ontologia.nt.gz', 'rdfxml', 'gzip'), 'ontologia.owl.gz')
+
+
+class ExportCacheTests(ExportTestCase):
+    def test_repeat_is_served_from_the_cache(self):
+        first = self.export('format=nquads')
+        content = self.content(first)
+        second = self.export('format=nquads')
+        self.assertFalse(second.streaming)
+        self.assertEqual(self.content(second), content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second['Cache-Control'], 'no-cache')
+
+    def test_if_none_match(self):
+        response = self.export()
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+        for header in (etag, f'W/{etag}', f'"outro", {etag}'):
+            with self.subTest(header=header):
+                response = self.export(HTTP_IF_NONE_MATCH=header)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.export(HTTP_IF_NONE_MATCH='"outro"').status_code, 200)
+
+    def test_each_format_has_its_own_etag(self):
+        etags = {self.export(f'format={fmt}')['ETag'] for fmt in export.FORMATS}
+        etags.add(self.export('compression=gzip')['ETag'])
+        self.assertEqual(len(etags), len(export.FORMATS) + 1)
+
+    def test_mutation_changes_the_etag(self):
+        response = self.export('format=ntriples')
+        etag, content = response['ETag'], self.content(response)
+        self.mutate('Peixe')
+
+        response = self.export('format=ntriples', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertNotEqual(self.content(response), content)
+        self.assertIn(b'#Peixe>', self.content(self.export('format=ntriples')))
+
+
+class ExportCacheLruTests(SimpleTestCase):
+    def test_evicts_the_least_recently_used(self):
+        cache = export.ExportCache(max_bytes=10)
+        cache.put('a', b'aaaa')
+        cache.put('b', b'bbbb')
+        self.assertEqual(cache.get('a'), b'aaaa')
+        cache.put('c', b'cccc')
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (b'aaaa', b'cccc'))
+        self.assertEqual(cache.size, 8)
+
+    def test_replace_and_oversized(self):
+        cache = export.ExportCache(max_bytes=10)
+        cache.put('a', b'aaaa')
+        cache.put('a', b'aa')
+        self.assertEqual(cache.size, 2)
+        cache.put('b', b'b' * 11)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'aa')
+
+    def test_tee_stores_only_current_complete_content(self):
+        cache = export.ExportCache(max_bytes=10)
+        self.assertEqual(b''.join(cache.tee('a', [b'aa', b'aa'], lambda: True)), b'aaaa')
+        self.assertEqual(cache.get('a'), b'aaaa')
+        self.assertEqual(b''.join(cache.tee('b', [b'bb'], lambda: False)), b'bb')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(b''.join(cache.tee('c', [b'c' * 6, b'c' * 6], lambda: True)), b'c' * 12)
+        self.assertIsNone(cache.get('c'))
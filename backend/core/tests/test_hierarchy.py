@@ -0,0 +1,86 @@
+import types
+from urllib.parse import urlencode
+
+from owlready2 import Thing
+
+from .base import IRI, ApiTestCase
+
+OTHER_IRI = 'http://example.org/outra#'
+
+
+def animals(onto):
+    animal = types.new_class('Animal', (Thing,))
+    types.new_class('Planta', (Thing,))
+    for n in range(23):
+        cls = types.new_class(f'Especie{n:02d}', (animal,))
+        if n % 5 == 0:
+            types.new_class(f'Raca{n:02d}', (cls,))
+    # Mesmo nome local em outro namespace: o IRI desempata a ordenação
+    with onto.get_namespace(OTHER_IRI):
+        types.new_class('Especie10', (animal,))
+
+
+class ClassHierarchyTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.load(self.ontology_file(animals))
+
+    def page(self, **params):
+        response = self.get(f'/class-hierarchy/?{urlencode(params)}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def walk(self, limit, cursor=None, **params):
+        """As páginas de ``class-hierarchy/`` a partir de ``cursor``: ``(nós, número de páginas)``."""
+        nodes, pages = [], 0
+        while True:
+            body = self.page(limit=limit, **params, **({'cursor': cursor} if cursor else {}))
+            nodes += body['nodes']
+            pages += 1
+            cursor = body['next_cursor']
+            if cursor is None:
+                return nodes, pages
+
+    def test_pages_concatenate_to_the_sorted_children(self):
+        everything = self.page(parent='Animal', limit=1000)['nodes']
+        self.assertEqual(len(everything), 24)
+        keys = [(node['name'], node['iri']) for node in everything]
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual([iri for name, iri in keys if name == 'Especie10'], [OTHER_IRI + 'Especie10', IRI + 'Especie10'])
+
+        for limit in (1, 5, 7, 24):
+            nodes, pages = self.walk(limit, parent='Animal')
+            self.assertEqual(nodes, everything)
+            self.assertEqual(pages, -(-24 // limit))
+
+    def test_child_count_and_depth(self):
+        roots = self.page()['nodes']
+        self.assertEqual([(node['name'], node['child_count']) for node in roots], [('Animal', 24), ('Planta', 0)])
+        self.assertNotIn('children', roots[0])
+
+        animal = self.page(depth=2, limit=5)['nodes'][0]
+        self.assertEqual([node['name'] for node in animal['children']],
+                         ['Especie00', 'Especie01', 'Especie02', 'Especie03', 'Especie04'])
+        self.assertEqual(animal['children'][0]['child_count'], 1)
+        self.assertIsNotNone(animal['next_cursor'])
+
+    def test_class_created_between_pages_does_not_repeat_nodes(self):
+        first = self.page(parent='Animal', limit=5)
+        response = self.post('/batch/', {'operations': [
+            {'op': 'create_class', 'data': {'name': 'Aaa', 'parents': ['Animal']}},
+            {'op': 'create_class', 'data': {'name': 'Zzz', 'parents': ['Animal']}},
+        ]})
+        self.assertEqual(response.status_code, 200, response.content)
+
+        rest, _ = self.walk(5, parent='Animal', cursor=first['next_cursor'])
+        nodes = first['nodes'] + rest
+        self.assertEqual(len({node['iri'] for node in nodes}), len(nodes))
+        names = [node['name'] for node in nodes]
+        # Só as classes depois do cursor aparecem nas páginas seguintes
+        self.assertNotIn('Aaa', names)
+        self.assertEqual(names[-1], 'Zzz')
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.get('/class-hierarchy/?cursor=nao-e-cursor').status_code, 400)
+        self.assertEqual(self.get('/class-hierarchy/?limit=muitos').status_code, 400)
+        self.assertEqual(self.get('/class-hierarchy/?parent=Nada').status_code, 404)
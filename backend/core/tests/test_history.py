@@ -0,0 +1,57 @@
+from .. import diff, history, operations, store
+from .base import QuadstoreTestCase
+
+
+class HistoryTests(QuadstoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.history = history.History(self.onto, limit=10, max_snapshots=5)
+
+    def record(self, op, data):
+        with self.history.record(op):
+            operations.apply(op, self.onto, self.index, data)
+        store.bump_revision(self.onto)
+        store.commit(self.onto)
+
+    def test_undo_redo_round_trip(self):
+        before = diff.read_store(self.onto)
+        self.record('create_class', {'name': 'Cachorro', 'parents': ['Animal']})
+        self.record('create_individual', {'name': 'rex', 'classes': ['Cachorro']})
+        after = diff.read_store(self.onto)
+
+        self.history.apply(history.UNDO, {})
+        self.history.apply(history.UNDO, {})
+        self.assertSameStore(before)
+        self.assertEqual(self.history.status()['redo'], 2)
+
+        self.history.apply(history.REDO, {})
+        self.history.apply(history.REDO, {})
+        self.assertSameStore(after)
+        self.assertEqual(self.history.status()['undo'], 2)
+
+    def test_restore_snapshot(self):
+        self.record('create_class', {'name': 'Gato', 'parents': ['Animal']})
+        self.history.snapshot('com-gato')
+        snapshot = diff.read_store(self.onto)
+        self.record('create_individual', {'name': 'tom', 'classes': ['Gato']})
+
+        self.history.apply(history.RESTORE, {'name': 'com-gato'})
+        self.assertSameStore(snapshot)
+
+    def test_new_mutation_discards_undone_steps(self):
+        self.record('create_class', {'name': 'Gato', 'parents': ['Animal']})
+        self.history.apply(history.UNDO, {})
+        self.record('create_class', {'name': 'Peixe', 'parents': ['Animal']})
+        self.assertEqual(self.history.status()['redo'], 0)
+        with self.assertRaises(history.HistoryError):
+            self.history.apply(history.REDO, {})
+
+    def test_nothing_to_undo(self):
+        with self.assertRaises(history.HistoryError):
+            self.history.apply(history.UNDO, {})
+
+    def test_failed_mutation_is_not_recorded(self):
+        with self.assertRaises(operations.OperationError):
+            with self.history.record('create_class'):
+                operations.apply('create_class', self.onto, self.index, {'name': 'Gato', 'parents': ['Nada']})
+        self.assertEqual(self.history.steps(), [])
@@ -0,0 +1,121 @@
+import types
+from urllib.parse import urlencode
+
+from owlready2 import DataProperty, ObjectProperty, Thing
+
+from .base import IRI, ApiTestCase
+
+# Superclasses de cada classe (fecho já calculado) para o resultado esperado
+ANCESTORS = {'Animal': set(), 'Mamifero': {'Animal'}, 'Cachorro': {'Mamifero', 'Animal'},
+             'Gato': {'Mamifero', 'Animal'}, 'Planta': set()}
+INDIVIDUALS = range(60)
+
+
+def name(n):
+    return f"{('ana', 'bia', 'bob')[n % 3]}{n:02d}"
+
+
+def classes(n):
+    declared = [('Cachorro', 'Gato', 'Animal', 'Planta')[n % 4]]
+    # Alguns são de duas subclasses de Mamifero: aparecem uma vez só
+    if n % 7 == 0 and declared != ['Gato']:
+        declared.append('Gato')
+    return declared
+
+
+def owners(n):
+    """``dono`` declarado (n % 6 == 1) ou vindo da inversa ``possui`` (n % 10 == 3 possui n + 1)."""
+    return n % 6 == 1 or (n - 1) % 10 == 3
+
+
+def ontology(onto):
+    animal = types.new_class('Animal', (Thing,))
+    mammal = types.new_class('Mamifero', (animal,))
+    by_name = {'Animal': animal, 'Mamifero': mammal, 'Cachorro': types.new_class('Cachorro', (mammal,)),
+               'Gato': types.new_class('Gato', (mammal,)), 'Planta': types.new_class('Planta', (Thing,))}
+    owner = types.new_class('dono', (ObjectProperty,))
+    owns = types.new_class('possui', (ObjectProperty,))
+    owns.inverse_property = owner
+    age = types.new_class('idade', (DataProperty,))
+    individuals = [by_name[classes(n)[0]](name(n)) for n in INDIVIDUALS]
+    for n, ind in zip(INDIVIDUALS, individuals):
+        ind.is_a.extend(by_name[cls] for cls in classes(n)[1:])
+        if n % 5 == 0:
+            age[ind] = [n]
+        if n % 6 == 1:
+            owner[ind] = [individuals[0]]
+        if n % 10 == 3:
+            owns[ind] = [individuals[n + 1]]
+
+
+class IndividualsTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.load(self.ontology_file(ontology))
+
+    def walk(self, limit=7, **params):
+        """Os nomes de todas as páginas de ``individuals/``."""
+        names, cursor = [], None
+        while True:
+            query = urlencode({'limit': limit, 'fields': 'name', **params, **({'cursor': cursor} if cursor else {})},
+                              doseq=True)
+            response = self.get(f'/individuals/?{query}')
+            self.assertEqual(response.status_code, 200, response.content)
+            body = response.json()
+            self.assertLessEqual(len(body['individuals']), limit)
+            names += [item['name'] for item in body['individuals']]
+            cursor = body['next_cursor']
+            if cursor is None:
+                return names
+
+    def expected(self, cls=None, inherited=False, properties=(), prefix=''):
+        def matches(n):
+            declared = set(classes(n))
+            if inherited:
+                declared |= set().union(*(ANCESTORS[c] for c in declared))
+            return ((cls is None or cls in declared) and name(n).startswith(prefix)
+                    and ('idade' not in properties or n % 5 == 0) and ('dono' not in properties or owners(n)))
+        return sorted(name(n) for n in INDIVIDUALS if matches(n))
+
+    def test_filters_and_paging(self):
+        cases = [
+            {},
+            {'class': 'Gato'},
+            {'class': 'Mamifero'},
+            {'class': 'Mamifero', 'inherited': 'true'},
+            {'class': 'Animal', 'inherited': 'true', 'prefix': 'b'},
+            {'prefix': 'bia'},
+            {'prefix': 'bo', 'property': ['idade']},
+            {'property': ['dono']},
+            {'property': ['dono', 'idade']},
+            {'class': 'Cachorro', 'property': ['dono']},
+        ]
+        for params in cases:
+            with self.subTest(**{key: str(value) for key, value in params.items()}):
+                expected = self.expected(params.get('class'), params.get('inherited') == 'true',
+                                         params.get('property', ()), params.get('prefix', ''))
+                self.assertEqual(self.walk(**params), expected)
+                self.assertEqual(self.walk(limit=1000, **params), expected)
+
+    def test_fields(self):
+        response = self.get('/individuals/?fields=iri,name&prefix=bia01')
+        self.assertEqual(response.json()['individuals'], [{'iri': IRI + 'bia01', 'name': 'bia01'}])
+
+        item = self.get('/individuals/?prefix=bia01').json()['individuals'][0]
+        self.assertEqual(list(item), ['name', 'type', 'properties'])
+        self.assertEqual(item['type'], ['Gato'])
+
+        self.assertEqual(self.get('/individuals/?fields=nome').status_code, 400)
+
+    def test_new_individual_appears_in_order(self):
+        response = self.post('/batch/', {'operations': [
+            {'op': 'create_individual', 'data': {'name': 'bia99', 'classes': ['Cachorro']}},
+        ]})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.walk(limit=3, prefix='bia')[-1], 'bia99')
+        self.assertIn('bia99', self.walk(**{'class': 'Animal', 'inherited': 'true'}))
+
+    def test_unknown_filters_and_cursor(self):
+        self.assertEqual(self.get('/individuals/?class=Nada').status_code, 404)
+        self.assertEqual(self.get('/individuals/?property=nada').status_code, 404)
+        self.assertEqual(self.get('/individuals/?cursor=nao-e-cursor').status_code, 400)
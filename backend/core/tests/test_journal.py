@@ -0,0 +1,92 @@
+import os
+
+from .. import diff, journal, operations, store
+from ..registry import OntologyRegistry
+from .base import IRI, IsolatedTestCase, QuadstoreTestCase, create_ontology
+
+
+class JournalTests(QuadstoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.onto_path = os.path.join(self.dir, 'teste.owl')
+        self.onto.save(file=self.onto_path, format='rdfxml')
+        self.journal = journal.ChangeJournal(self.onto_path)
+        self.addCleanup(self.journal.truncate)
+        self.applied = []
+
+    def apply(self, op, payload):
+        self.applied.append(payload['name'])
+        operations.apply(op, self.onto, self.index, payload)
+
+    def test_recover_replays_missing_entries_and_compacts(self):
+        # Revisão 1 chegou ao quadstore; a 2 só ao journal (crash antes do commit)
+        self.journal.append(self.mutate('create_class', {'name': 'Gato', 'parents': ['Animal']}),
+                            'create_class', {'name': 'Gato', 'parents': ['Animal']})
+        self.journal.append(2, 'create_class', {'name': 'Peixe', 'parents': ['Animal']})
+
+        journal.recover(self.onto, self.onto_path, self.journal, self.apply)
+
+        self.assertEqual(self.applied, ['Peixe'])
+        self.assertEqual(store.get_revision(self.onto), 2)
+        self.assertEqual(self.journal.pending, 0)
+        self.assertEqual(self.journal.entries(), [])
+        # O RDF/XML compactado tem as duas classes
+        self.assertEqual(diff.diff(diff.read_file(self.onto_path), diff.read_store(self.onto))['changes'], {})
+        names = {triple[0] for triple in diff.read_file(self.onto_path).triples.values()}
+        self.assertTrue({IRI + 'Gato', IRI + 'Peixe'} <= names)
+
+    def test_recover_ignores_truncated_last_line(self):
+        self.journal.append(1, 'create_class', {'name': 'Gato', 'parents': ['Animal']})
+        with open(self.journal.path, 'a', encoding='utf-8') as f:
+            f.write('{"revision": 2, "op": "create_cl')
+
+        journal.recover(self.onto, self.onto_path, self.journal, self.apply)
+
+        self.assertEqual(self.applied, ['Gato'])
+        self.assertEqual(store.get_revision(self.onto), 1)
+
+    def test_compact_keeps_entries_newer_than_the_copy(self):
+        self.journal.append(self.mutate('create_class', {'name': 'Gato', 'parents': ['Animal']}),
+                            'create_class', {'name': 'Gato', 'parents': ['Animal']})
+        self.journal.append(5, 'create_class', {'name': 'Peixe', 'parents': ['Animal']})
+
+        journal.compact(self.onto, self.onto_path, self.journal)
+
+        self.assertEqual([entry['revision'] for entry in self.journal.entries()], [5])
+        self.assertEqual(self.journal.pending, 1)
+
+
+class ReopenRecoveryTests(IsolatedTestCase):
+    """O registro reaplica o journal quando reabre uma ontologia tirada da memória."""
+
+    def setUp(self):
+        super().setUp()
+        # Orçamento zero: só a ontologia usada por último fica aberta
+        self.registry = OntologyRegistry(0)
+        self.ids = []
+        self.addCleanup(lambda: [self.registry.discard(ontology_id) for ontology_id in self.ids])
+
+    def create(self, name):
+        self.ids.append(create_ontology(self.registry, self.ontology_file(name=name)))
+        return self.ids[-1]
+
+    def test_reopen_replays_entries_missing_from_the_store(self):
+        first = self.create('primeira.owl')
+        entry = self.registry.acquire(first)
+        revision = store.get_revision(entry.onto)
+        # Registrada no journal, mas o processo "caiu" antes de aplicar no quadstore
+        entry.journal.append(revision + 1, 'create_class', {'name': 'Peixe', 'parents': ['Animal']})
+        self.registry.release(entry)
+
+        self.create('segunda.owl')
+        self.assertNotIn(first, self.registry.loaded_ids())
+
+        entry = self.registry.acquire(first)
+        try:
+            self.assertIsNotNone(entry.index.entity(IRI + 'Peixe'))
+            self.assertEqual(store.get_revision(entry.onto), revision + 1)
+            self.assertEqual(entry.journal.entries(), [])
+            names = {triple[0] for triple in diff.read_file(entry.path).triples.values()}
+            self.assertIn(IRI + 'Peixe', names)
+        finally:
+            self.registry.release(entry)
@@ -0,0 +1,87 @@
+import threading
+from unittest import mock
+
+from .. import store, views
+from ..registry import OntologyLoading, OntologyNotFound, OntologyRegistry
+from .base import IRI, IsolatedTestCase, create_ontology
+
+
+class RegistryTests(IsolatedTestCase):
+    def setUp(self):
+        super().setUp()
+        # Orçamento zero: só as ontologias em uso e a usada por último ficam abertas
+        self.registry = OntologyRegistry(0)
+        self.ids = []
+        self.addCleanup(lambda: [self.registry.discard(ontology_id) for ontology_id in self.ids])
+
+    def create(self):
+        self.ids.append(create_ontology(self.registry, self.ontology_file(name=f'teste{len(self.ids)}.owl')))
+        return self.ids[-1]
+
+    def test_evicts_the_least_recently_used_idle_ontology(self):
+        first, second = self.create(), self.create()
+        self.assertEqual(self.registry.loaded_ids(), [second])
+
+        entry = self.registry.acquire(first)
+        self.registry.release(entry)
+
+        self.assertEqual(self.registry.loaded_ids(), [first])
+
+    def test_ontology_in_use_is_not_evicted(self):
+        first = self.create()
+        entry = self.registry.acquire(first)
+        second = self.create()
+        self.assertEqual(self.registry.loaded_ids(), [first, second])
+        # Fica ociosa e não é a mais recente: sai no release
+        self.registry.release(entry)
+        self.assertEqual(self.registry.loaded_ids(), [second])
+
+    def test_reopened_ontology_keeps_its_mutations(self):
+        first = self.create()
+        entry = self.registry.acquire(first)
+        try:
+            revision, _ = views.apply_mutation(entry, 'create_class', {'name': 'Gato', 'parents': ['Animal']})
+        finally:
+            self.registry.release(entry)
+        self.create()
+        self.assertNotIn(first, self.registry.loaded_ids())
+
+        entry = self.registry.acquire(first)
+        try:
+            self.assertIsNotNone(entry.index.entity(IRI + 'Gato'))
+            self.assertEqual(store.get_revision(entry.onto), revision)
+        finally:
+            self.registry.release(entry)
+
+    def test_concurrent_acquires_reopen_once(self):
+        first = self.create()
+        self.create()
+        barrier = threading.Barrier(4)
+        entries = []
+
+        def acquire():
+            barrier.wait()
+            entries.append(self.registry.acquire(first))
+
+        with mock.patch.object(self.registry, '_reopen', wraps=self.registry._reopen) as reopen:
+            threads = [threading.Thread(target=acquire) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        for entry in entries:
+            self.registry.release(entry)
+
+        self.assertEqual(reopen.call_count, 1)
+        self.assertEqual(len({id(entry) for entry in entries}), 1)
+
+    def test_unknown_ontology(self):
+        for ontology_id in ('0' * 32, '../fora'):
+            with self.assertRaises(OntologyNotFound):
+                self.registry.acquire(ontology_id)
+
+    def test_ontology_still_loading(self):
+        ontology_id, _ = self.registry.allocate('teste.owl')
+        self.ids.append(ontology_id)
+        with self.assertRaises(OntologyLoading):
+            self.registry.acquire(ontology_id)
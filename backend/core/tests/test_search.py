@@ -0,0 +1,167 @@
+import random
+import types
+
+from django.test import SimpleTestCase
+from owlready2 import Thing, locstr
+
+from ..index import CLASS, INDIVIDUAL
+from ..search import COMMENT, EXACT, FUZZY, LABEL, NAME, PREFIX, SearchIndex, tokenize
+from .base import IRI, ApiTestCase
+
+
+class SearchIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = SearchIndex()
+        self.add('Gato')
+        self.add('Gatos')
+        self.add('Gado')
+        self.add('Felino', labels=[('gato', 'pt'), ('cat', 'en')])
+        self.add('Animal', comments=['Come gato e rato'])
+        self.add('gatoPreto', INDIVIDUAL)
+
+    def add(self, name, kind=CLASS, labels=(), comments=()):
+        self.index.add(IRI + name, kind, name, labels, comments)
+
+    def search(self, query, **options):
+        return [(result['name'], result['score']) for result in self.index.search(query, **options)]
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('gatoPreto'), ['gato', 'preto', 'gatopreto'])
+        self.assertEqual(tokenize('Ração_do-gato'), ['racao', 'do', 'gato'])
+
+    def test_exact_name_then_label_then_prefix_then_fuzzy(self):
+        self.assertEqual(self.search('gato', kinds={CLASS}), [
+            ('Gato', NAME * EXACT + NAME),
+            ('Felino', LABEL * EXACT),
+            ('Gatos', NAME * PREFIX),
+            ('Gado', round(NAME * FUZZY, 3)),
+            ('Animal', COMMENT * EXACT),
+        ])
+
+    def test_without_fuzzy(self):
+        self.assertNotIn('Gado', [name for name, _ in self.search('gato', fuzzy=False)])
+        self.assertEqual(self.search('gatp', fuzzy=False), [])
+        self.assertEqual(self.search('gatp', kinds={CLASS})[0][0], 'Gato')
+
+    def test_edit_budget_grows_with_the_term(self):
+        self.add('Boi')
+        self.assertEqual(self.search('boi'), [('Boi', NAME * EXACT + NAME)])
+        self.assertEqual(self.search('boy'), [])
+        # A partir de 4 letras, 1 edição; de 8, 2
+        self.assertEqual([name for name, _ in self.search('felinu')], ['Felino'])
+        self.assertEqual([name for name, _ in self.search('fenilu')], [])
+        self.add('Cachorro')
+        self.assertEqual([name for name, _ in self.search('cahorrro')], ['Cachorro'])
+
+    def test_every_term_must_match(self):
+        self.assertEqual([name for name, _ in self.search('gato preto')], ['gatoPreto'])
+        self.assertEqual([name for name, _ in self.search('gatoPreto')], ['gatoPreto'])
+
+    def test_language(self):
+        self.assertEqual([name for name, _ in self.search('cat', language='pt')], [])
+        [result] = self.index.search('cat', language='en')
+        self.assertEqual((result['name'], result['label']), ('Felino', 'cat'))
+        [result] = self.index.search('felino', language='pt')
+        self.assertEqual(result['label'], 'gato')
+        # Sem o idioma pedido: o rótulo sem idioma ou, sem ele, o do menor código
+        self.assertEqual(self.index.search('felino', language='es')[0]['label'], 'cat')
+        self.add('Felino', labels=[('gato', 'pt'), ('felis', None)])
+        self.assertEqual(self.index.search('felino')[0]['label'], 'felis')
+
+    def test_kinds(self):
+        self.assertEqual([name for name, _ in self.search('preto', kinds={INDIVIDUAL})], ['gatoPreto'])
+        self.assertEqual(self.search('preto', kinds={CLASS}), [])
+
+    def test_limit(self):
+        self.assertEqual(len(self.search('gato', limit=2)), 2)
+
+    def test_remove_and_readd(self):
+        self.index.remove(IRI + 'Felino')
+        self.assertNotIn('Felino', [name for name, _ in self.search('gato')])
+        self.assertEqual(self.search('cat'), [])
+        # O termo saiu do vocabulário: nem a correção o encontra
+        self.assertEqual(self.search('felinx'), [])
+        self.add('Felino', labels=[('gata', 'pt')])
+        self.assertEqual([name for name, _ in self.search('gata', fuzzy=False)], ['Felino'])
+
+
+def random_documents(rng, count):
+    syllables = ['ga', 'to', 'ca', 'chor', 'ro', 'pei', 'xe', 'ár', 'vo', 're', 'fo', 'lha', 'Ma', 'mi', 'fe']
+    documents = {}
+    for n in range(count):
+        name = ''.join(rng.choice(syllables) for _ in range(rng.randint(1, 3))) + rng.choice(['', 'Grande', 'Azul'])
+        labels = [(''.join(rng.choice(syllables) for _ in range(2)), rng.choice(['pt', 'en', None]))
+                  for _ in range(rng.randint(0, 2))]
+        comments = [' '.join(rng.choice(syllables) for _ in range(3))] if rng.random() < .3 else []
+        documents[f'{IRI}e{n}'] = (rng.choice([CLASS, INDIVIDUAL]), name, labels, comments)
+    return documents
+
+
+class SearchBuildTests(SimpleTestCase):
+    """O índice montado no carregamento e o atualizado entidade a entidade respondem igual."""
+
+    def test_build_matches_incremental(self):
+        rng = random.Random(11)
+        documents = random_documents(rng, 300)
+        removed = set(rng.sample(sorted(documents), 60))
+        kept = {iri: document for iri, document in documents.items() if iri not in removed}
+
+        built = SearchIndex()
+        built.begin_build()
+        for iri, (kind, name, labels, comments) in kept.items():
+            built.add(iri, kind, name, labels, comments)
+        built.end_build()
+
+        incremental = SearchIndex()
+        for iri, (kind, name, labels, comments) in documents.items():
+            incremental.add(iri, kind, name, labels, comments)
+        for iri in removed:
+            incremental.remove(iri)
+
+        # Cada termo indexado, inteiro, como prefixo e com um erro de digitação
+        terms = sorted({token for kind, name, labels, comments in documents.values()
+                        for text in [name, *(text for text, _ in labels), *comments] for token in tokenize(text)})
+        queries = [variant for term in terms for variant in (term, term[:3], f'{term[:-1]}q' if len(term) >= 4 else term)]
+        for query in queries:
+            for options in ({}, {'fuzzy': False}, {'language': 'pt'}, {'kinds': {INDIVIDUAL}, 'limit': 100}):
+                self.assertEqual(incremental.search(query, **options), built.search(query, **options), (query, options))
+        self.assertEqual(len(built), len(incremental))
+
+
+def felines(onto):
+    animal = types.new_class('Animal', (Thing,))
+    cat = types.new_class('Gato', (animal,))
+    cat.label = [locstr('gato', 'pt'), locstr('cat', 'en')]
+    cat('gatoPreto')
+
+
+class SearchViewTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.load(self.ontology_file(felines))
+
+    def names(self, query):
+        response = self.get(f'/search/?{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(result['name'], result['kind'], result['label']) for result in response.json()['results']]
+
+    def test_parameters(self):
+        # Sem ``lang``, o rótulo do menor código de idioma
+        self.assertEqual(self.names('q=gato'), [('Gato', CLASS, 'cat'), ('gatoPreto', INDIVIDUAL, None)])
+        self.assertEqual(self.names('q=gato&lang=pt')[0], ('Gato', CLASS, 'gato'))
+        self.assertEqual(self.names('q=gato&type=individual'), [('gatoPreto', INDIVIDUAL, None)])
+        self.assertEqual(self.names('q=cat&lang=en'), [('Gato', CLASS, 'cat')])
+        self.assertEqual(self.names('q=gatp&fuzzy=false'), [])
+        self.assertEqual(self.names('q=gatp&type=class'), [('Gato', CLASS, 'cat')])
+
+    def test_mutations_are_searchable(self):
+        response = self.post('/batch/', {'operations': [
+            {'op': 'create_class', 'data': {'name': 'Cachorro', 'parents': ['Animal']}},
+        ]})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.names('q=cachoro'), [('Cachorro', CLASS, None)])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.get('/search/').status_code, 400)
+        self.assertEqual(self.get('/search/?q=gato&limit=muitos').status_code, 400)
+        self.assertEqual(self.get('/search/?q=gato&type=planeta').status_code, 400)
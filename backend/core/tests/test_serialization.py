@@ -0,0 +1,96 @@
+import os
+import random
+
+from owlready2 import (AnnotationProperty, DataProperty, FunctionalProperty, ObjectProperty, SymmetricProperty,
+                       Thing, locstr)
+
+from .. import store
+from ..serialization import serialize_individual, serialize_individuals
+from .base import IRI, IsolatedTestCase
+
+
+def ontology(onto, size, seed):
+    """Indivíduos aleatórios com todo tipo de valor: inversas, simétricas, funcionais, anotações."""
+    with onto:
+        class A(Thing): pass
+        class B(A): pass
+        class knows(ObjectProperty): pass
+        class partOf(ObjectProperty): pass
+        class hasPart(ObjectProperty): inverse_property = partOf
+        class friend(ObjectProperty, SymmetricProperty): pass
+        class boss(ObjectProperty, FunctionalProperty): pass
+        # Funcional cujo valor, às vezes, só existe pela inversa
+        class parentOf(ObjectProperty): pass
+        class childOf(ObjectProperty, FunctionalProperty): inverse_property = parentOf
+        class age(DataProperty, FunctionalProperty): pass
+        class tag(DataProperty): pass
+        class note(AnnotationProperty): pass
+        # Mesmo nome de um atributo das entidades do Owlready2
+        class iri(DataProperty): pass
+        B.is_a.append(knows.some(A))
+
+        rng = random.Random(seed)
+        individuals = [rng.choice([A, B])(f'i{n}') for n in range(size)]
+        for ind in individuals:
+            for _ in range(rng.randint(0, 3)):
+                ind.knows.append(rng.choice(individuals))
+            if rng.random() < .3:
+                ind.partOf.append(rng.choice(individuals))
+            if rng.random() < .3:
+                ind.hasPart.append(rng.choice(individuals))
+            if rng.random() < .3:
+                ind.friend.append(rng.choice(individuals))
+            if rng.random() < .3:
+                ind.boss = rng.choice(individuals)
+            if rng.random() < .2:
+                ind.parentOf.append(rng.choice(individuals))
+            if rng.random() < .5:
+                ind.age = rng.randint(1, 90)
+            ind.tag = [rng.choice(['x', 'y', 1, 2.5, True]) for _ in range(rng.randint(0, 3))]
+            if rng.random() < .3:
+                ind.label = [locstr('nome', 'pt'), 'sem idioma']
+            if rng.random() < .2:
+                ind.note.append(rng.choice(individuals))
+            if rng.random() < .2:
+                ind.comment.append('comentário')
+            if rng.random() < .1:
+                ind.is_a.append(knows.value(individuals[0]))
+        onto.world.graph.execute("INSERT INTO datas VALUES (?,?,?,?,?)",
+                                 (onto.graph.c, individuals[3].storid, iri.storid, 'x', 0))
+
+
+class SerializeIndividualsTests(IsolatedTestCase):
+    """``serialize_individuals`` (em lote) devolve exatamente o que ``serialize_individual`` devolve."""
+
+    def serialize(self, path, fn):
+        # Um World novo por serialização: nada vem dos valores já carregados pelo outro
+        world = store.open_world(path)
+        try:
+            onto = world.get_ontology(IRI).load()
+            return fn(sorted(onto.individuals(), key=lambda ind: ind.name))
+        finally:
+            world.close()
+
+    def test_bulk_matches_one_by_one(self):
+        for seed in range(3):
+            path = os.path.join(self.dir, f'seed{seed}.sqlite3')
+            world = store.open_world(path)
+            ontology(world.get_ontology(IRI), 150, seed)
+            world.save()
+            world.close()
+
+            single = self.serialize(path, lambda individuals: [serialize_individual(ind) for ind in individuals])
+            bulk = self.serialize(path, serialize_individuals)
+
+            with self.subTest(seed=seed):
+                self.assertEqual(len(bulk), 150)
+                self.assertEqual(bulk, single)
+                # A ordem das propriedades também (os dicts iguais não garantem)
+                self.assertEqual([list(item['properties']) for item in bulk],
+                                 [list(item['properties']) for item in single])
+                for a, b in zip(single, bulk):
+                    self.assertEqual([list(values) for values in a['properties'].values()],
+                                     [list(values) for values in b['properties'].values()])
+
+    def test_empty(self):
+        self.assertEqual(serialize_individuals([]), [])
@@ -0,0 +1,121 @@
+import os
+import sqlite3
+from contextlib import closing
+from unittest import mock
+
+from .. import views
+from ..upload_cache import UploadCache
+from .base import ApiTestCase, IsolatedTestCase
+
+
+class UploadCacheTests(IsolatedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = UploadCache(os.path.join(self.dir, 'cache'), max_bytes=10 ** 9)
+
+    def put(self, digest):
+        upload = os.path.join(self.dir, f'{digest}.owl')
+        with open(upload, 'w') as f:
+            f.write(digest)
+        db = sqlite3.connect(':memory:')
+        db.execute('CREATE TABLE t (v TEXT)')
+        db.execute('INSERT INTO t VALUES (?)', (digest * 100,))
+        db.commit()
+        self.cache.put_store(digest, upload, db)
+        self.cache.put_payload(digest, None, f'{{"digest": "{digest}"}}'.encode())
+        return upload
+
+    def test_round_trip(self):
+        self.put('a' * 64)
+        restored = os.path.join(self.dir, 'restaurado.sqlite3')
+
+        self.assertTrue(self.cache.restore_store('a' * 64, restored))
+        with closing(sqlite3.connect(restored)) as db:
+            self.assertEqual(db.execute('SELECT v FROM t').fetchone(), ('a' * 6400,))
+        self.assertEqual(self.cache.get_payload('a' * 64), b'{"digest": "' + b'a' * 64 + b'"}')
+        self.assertFalse(self.cache.has_payload('a' * 64, 'outra-arvore'))
+        self.assertFalse(self.cache.restore_store('b' * 64, restored))
+        self.assertIsNone(self.cache.get_payload('b' * 64))
+
+    def test_evicts_the_least_recently_used_entry(self):
+        self.put('a' * 64)
+        self.cache.max_bytes = int(self.cache.size * 2.5)
+        self.put('b' * 64)
+        # Restaurar conta como uso: ``b`` passa a ser a menos usada
+        self.cache.restore_store('a' * 64, os.path.join(self.dir, 'restaurado.sqlite3'))
+        self.put('c' * 64)
+
+        self.assertTrue(self.cache.has_payload('a' * 64))
+        self.assertFalse(self.cache.has_store('b' * 64))
+        self.assertTrue(self.cache.has_payload('c' * 64))
+        self.assertFalse([name for name in os.listdir(self.cache.directory) if name.startswith('b')])
+
+    def test_keeps_the_newest_entry_above_the_budget(self):
+        self.cache.max_bytes = 1
+        self.put('a' * 64)
+        self.put('b' * 64)
+        self.assertFalse(self.cache.has_store('a' * 64))
+        self.assertTrue(self.cache.has_payload('b' * 64))
+
+    def test_scan_restores_the_entries_and_drops_partial_files(self):
+        self.put('a' * 64)
+        partial = os.path.join(self.cache.directory, f"{'b' * 64}.sqlite3.1234.tmp")
+        open(partial, 'w').close()
+
+        reopened = UploadCache(self.cache.directory, max_bytes=10 ** 9)
+
+        self.assertEqual(reopened.size, self.cache.size)
+        self.assertTrue(reopened.has_payload('a' * 64))
+        self.assertFalse(os.path.exists(partial))
+
+    def test_dedupe_links_the_cached_upload(self):
+        self.put('a' * 64)
+        copy = os.path.join(self.dir, 'copia.owl')
+        with open(copy, 'w') as f:
+            f.write('a' * 64)
+
+        self.cache.dedupe_upload('a' * 64, copy)
+
+        self.assertTrue(os.path.samefile(copy, os.path.join(self.cache.directory, f"{'a' * 64}.owl")))
+
+    def test_payload_needs_the_store(self):
+        self.cache.put_payload('a' * 64, None, b'{}')
+        self.assertIsNone(self.cache.get_payload('a' * 64))
+
+
+class CachedUploadTests(ApiTestCase):
+    """Um reenvio idêntico restaura o quadstore e o corpo do cache em vez de parsear."""
+
+    def test_identical_upload_is_served_from_the_cache(self):
+        path = self.ontology_file()
+        first = self.load(path)
+        self.assertFalse(self.started['cached'])
+        first_id, digest = self.ontology_id, self.started['sha256']
+        # Mutação depois do carregamento: não pode vazar para o cache
+        response = self.post('/batch/', {'operations': [
+            {'op': 'create_class', 'data': {'name': 'Gato', 'parents': ['Animal']}},
+        ]})
+        self.assertEqual(response.status_code, 200, response.content)
+
+        with mock.patch.object(views.registry, 'create', wraps=views.registry.create) as create:
+            second = self.load(path)
+        create.assert_not_called()
+        self.assertTrue(self.started['cached'])
+        self.assertEqual(self.started['sha256'], digest)
+        self.assertNotEqual(self.ontology_id, first_id)
+        self.assertEqual(second['ontology'], first['ontology'])
+        self.assertEqual(self.get('/search/?q=Gato').json()['results'], [])
+        self.assertEqual(len(self.get('/search/?q=Gato', ontology_id=first_id).json()['results']), 1)
+
+    def test_changed_content_is_parsed(self):
+        self.load(self.ontology_file(name='um.owl'))
+        self.load(self.ontology_file(name='outro.owl', iri='http://example.org/outra#'))
+        self.assertFalse(self.started['cached'])
+
+    def test_class_tree_has_its_own_payload(self):
+        path = self.ontology_file()
+        self.load(path)
+        self.load(path, class_tree='graph')
+        self.assertFalse(self.started['cached'])
+        self.load(path, class_tree='graph')
+        self.assertTrue(self.started['cached'])
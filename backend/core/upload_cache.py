@@ -0,0 +1,181 @@
+"""
+Cache de uploads endereçado pelo conteúdo (sha256 do arquivo enviado).
+
+Para cada conteúdo distinto o cache guarda, em ``ONTOLOGY_UPLOAD_CACHE_DIR``:
+
+* ``<hash>.owl``: o arquivo enviado (os uploads idênticos viram hardlinks dele);
+* ``<hash>.sqlite3``: o quadstore logo depois do parse, antes de qualquer mutação;
+* ``<hash>.<class_tree>.json``: o corpo do carregamento (JSON já codificado) para
+  cada ``class_tree``.
+
+Um reenvio idêntico copia o quadstore para o id novo em vez de parsear, e devolve
+o corpo já calculado. As entradas saem em LRU quando o total passa de
+``ONTOLOGY_UPLOAD_CACHE_BYTES``; as ontologias criadas a partir delas não são
+afetadas, já que têm o seu próprio quadstore.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class HashingWriter:
+    """Arquivo de escrita que calcula o sha256 do que passa por ele."""
+
+    def __init__(self, f):
+        self._f = f
+        self._hash = hashlib.sha256()
+
+    def write(self, data):
+        self._hash.update(data)
+        return self._f.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+def _link_or_copy(src, dest):
+    """Hardlink de ``src`` em ``dest`` (cópia se o sistema de arquivos não deixar)."""
+    tmp = f"{dest}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+class UploadCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # hash -> bytes ocupados pelos arquivos da entrada, do menos ao mais usado
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _path(self, digest, suffix):
+        return os.path.join(self.directory, f"{digest}.{suffix}")
+
+    def _payload_path(self, digest, class_tree):
+        return self._path(digest, f"{class_tree or 'full'}.json")
+
+    def _files(self, digest):
+        prefix = f"{digest}."
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                if name.startswith(prefix) and not name.endswith('.tmp')]
+
+    def _scan(self):
+        """Reconstrói o LRU a partir do diretório (os mais antigos saem primeiro)."""
+        entries = {}
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.tmp'):
+                os.remove(path)
+                continue
+            digest = name.split('.', 1)[0]
+            stat = os.stat(path)
+            size, mtime = entries.get(digest, (0, 0))
+            entries[digest] = (size + stat.st_size, max(mtime, stat.st_mtime))
+        for digest, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+            self._entries[digest] = size
+
+    @property
+    def size(self):
+        with self._lock:
+            return sum(self._entries.values())
+
+    def has_store(self, digest):
+        return os.path.exists(self._path(digest, 'sqlite3'))
+
+    def has_payload(self, digest, class_tree=None):
+        return self.has_store(digest) and os.path.exists(self._payload_path(digest, class_tree))
+
+    def restore_store(self, digest, dest):
+        """Copia o quadstore em cache para ``dest``; ``False`` se não estiver em cache."""
+        with self._lock:
+            if digest not in self._entries:
+                return False
+            self._entries.move_to_end(digest)
+            try:
+                shutil.copyfile(self._path(digest, 'sqlite3'), dest)
+            except FileNotFoundError:
+                return False
+        return True
+
+    def get_payload(self, digest, class_tree=None):
+        """Os bytes do JSON guardado (``None`` se não estiver em cache)."""
+        try:
+            with open(self._payload_path(digest, class_tree), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def dedupe_upload(self, digest, path):
+        """Troca o arquivo recém-enviado por um hardlink do já guardado (se houver)."""
+        cached = self._path(digest, 'owl')
+        if os.path.exists(cached):
+            _link_or_copy(cached, path)
+
+    def put_store(self, digest, upload_path, db):
+        """
+        Guarda o arquivo enviado e o quadstore parseado (``db``: a conexão SQLite
+        do World, sem transação pendente). Não faz nada se o conteúdo já existir.
+        """
+        with self._lock:
+            if digest in self._entries:
+                return
+        _link_or_copy(upload_path, self._path(digest, 'owl'))
+        store_path = self._path(digest, 'sqlite3')
+        tmp = f"{store_path}.{uuid.uuid4().hex}.tmp"
+        target = sqlite3.connect(tmp)
+        try:
+            db.backup(target)
+        finally:
+            target.close()
+        os.replace(tmp, store_path)
+        self._added(digest)
+
+    def put_payload(self, digest, class_tree, body):
+        """Guarda o corpo do carregamento (``body``: bytes de JSON)."""
+        if not self.has_store(digest):
+            return
+        path = self._payload_path(digest, class_tree)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(body)
+        os.replace(tmp, path)
+        self._added(digest)
+
+    def _added(self, digest):
+        with self._lock:
+            self._entries[digest] = sum(os.path.getsize(p) for p in self._files(digest))
+            self._entries.move_to_end(digest)
+            self._evict()
+
+    def _evict(self):
+        total = sum(self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            digest, size = self._entries.popitem(last=False)
+            for path in self._files(digest):
+                os.remove(path)
+            total -= size
+            logger.info(f"Upload {digest[:12]} removido do cache")
+
+
+_cache = None
+
+
+def get_upload_cache():
+    global _cache
+    if _cache is None:
+        _cache = UploadCache(settings.ONTOLOGY_UPLOAD_CACHE_DIR, settings.ONTOLOGY_UPLOAD_CACHE_BYTES)
+    return _cache
@@ -2,21 +2,63 @@ from django.urls import path
 from .views import (
     load_ontology_view,
     create_class_view,
+    class_hierarchy_view,
+    list_individuals_view,
+    search_view,
+    ancestors_view,
+    descendants_view,
+    instances_view,
     export_ontology_view,
+    diff_view,
+    diff_files_view,
+    history_view,
+    undo_view,
+    redo_view,
+    snapshots_view,
+    restore_snapshot_view,
     create_individual_view,
     relationship_manager_view,
     list_object_properties_view, 
     create_object_property_view,
     create_data_property_view,
+    create_annotation_property_view,
+    batch_view,
+    import_individuals_view,
+    server_stats_view,
+    import_catalog_view,
+    load_job_status_view,
+    load_job_result_view,
+    cancel_load_job_view,
 )
 
 urlpatterns = [
     path('load-ontology/', load_ontology_view, name='load_ontology'),
+    path('load-jobs/<str:job_id>/', load_job_status_view, name='load_job_status'),
+    path('load-jobs/<str:job_id>/result/', load_job_result_view, name='load_job_result'),
+    path('load-jobs/<str:job_id>/cancel/', cancel_load_job_view, name='cancel_load_job'),
     path('create-class/', create_class_view, name='create_class'),
+    path('class-hierarchy/', class_hierarchy_view, name='class_hierarchy'),
+    path('individuals/', list_individuals_view, name='list_individuals'),
+    path('search/', search_view, name='search'),
+    path('ancestors/', ancestors_view, name='ancestors'),
+    path('descendants/', descendants_view, name='descendants'),
+    path('instances/', instances_view, name='instances'),
     path('export-ontology/', export_ontology_view, name='export_ontology'),
+    path('diff/', diff_view, name='diff'),
+    path('diff-files/', diff_files_view, name='diff_files'),
+    path('history/', history_view, name='history'),
+    path('undo/', undo_view, name='undo'),
+    path('redo/', redo_view, name='redo'),
+    path('snapshots/', snapshots_view, name='snapshots'),
+    path('snapshots/restore/', restore_snapshot_view, name='restore_snapshot'),
     path('create-individual/', create_individual_view, name='create_individual'),
     path('relationship-manager/', relationship_manager_view, name='relationship_manager'),  
     path('api/object-properties/', list_object_properties_view, name='list_object_properties'),
     path('create_object_property/', create_object_property_view),
     path('create_data_property/', create_data_property_view),
+    path('create-annotation-property/', create_annotation_property_view, name='create_annotation_property'),
+    path('batch/', batch_view, name='batch'),
+    path('import-individuals/', import_individuals_view, name='import_individuals'),
+    path('server-stats/', server_stats_view, name='server_stats'),
+    path('imports/', import_catalog_view, name='import_catalog'),
 ]
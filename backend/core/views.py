@@ -1,5 +1,5 @@
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse, FileResponse
+from django.http import JsonResponse, HttpResponse, FileResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from owlready2 import FunctionalProperty, get_ontology, Or, And, Not, Thing, ThingClass, ObjectPropertyClass, DataPropertyClass, AnnotationPropertyClass, DataProperty
 from owlready2 import ObjectPropertyClass as ObjectProperty 
@@ -7,9 +7,12 @@ from django.conf import settings
 from owlready2 import World
 from owlready2 import *
 import os
+import tempfile
 import traceback
+import hashlib
 import json
 import types
+from functools import partial, wraps
 import logging
 logger = logging.getLogger(__name__)
 from owlready2 import (
@@ -19,202 +22,469 @@ from owlready2 import (
     ReflexiveProperty, IrreflexiveProperty
 )
 
-world = World()
+from . import store, operations
+from .journal import get_compactor
+from .registry import get_registry, OntologyLoading, OntologyNotFound
+from .executor import offload, light, heavy
+from . import jobs
+from .jobs import JobCancelled, get_job_manager
+from .upload_cache import HashingWriter, get_upload_cache
+from .imports import get_import_resolver
+from .delta import ChangeSet
+from .history import HistoryError, SnapshotNotFound
+from .operations import OperationError, BatchError
+from .serialization import (
+    build_entity_hierarchy, serialize_entity, serialize_individual, serialize_individuals, serialize_property,
+)
+from . import hierarchy
+from . import individuals
+from . import closure
+from . import search
+from . import bulk_import
+from . import diff
+from . import history
+from . import export
+from . import render
+from .index import (
+    AmbiguousNameError, CLASS, OBJECT_PROPERTY, DATA_PROPERTY,
+    ANNOTATION_PROPERTY, INDIVIDUAL, KINDS, entity_kind,
+)
 
-onto_path = ""
-onto = None
+# Ontologias carregadas, por id; o RDF/XML de cada uma é regravado pelo compactador
+registry = get_registry()
+compactor = get_compactor()
+# Carregamentos em segundo plano (load-ontology/ -> load-jobs/<id>/)
+job_manager = get_job_manager()
+# Quadstores e corpos de carregamento por sha256 do arquivo enviado (e dos imports)
+upload_cache = get_upload_cache()
+import_resolver = get_import_resolver()
 
-def build_entity_hierarchy(entity):
-    def get_all_subclasses(entity):
-        subs = []
-        for sub in sorted(entity.subclasses(), key=lambda x: x.name or ""):
-            subs.append({
-                'name': sub.name,
-                'children': get_all_subclasses(sub)
-            })
-        return subs
-    return {
-        'name': entity.name,
-        'children': get_all_subclasses(entity)
-    }
+# Exportações já serializadas, por (ontologia, revisão, formato, compressão)
+export_cache = export.ExportCache(settings.ONTOLOGY_EXPORT_CACHE_BYTES)
 
-def serialize_entity(entity):
-    return {
-        'name': entity.name,
-        'iri': entity.iri,
-        'comment': entity.comment.first() if entity.comment else ''
-    }
 
-def serialize_individual(ind):
-    def process_value(value):
-        if hasattr(value, 'name'):
-            return value.name
-        elif isinstance(value, (Or, And, Not)):
-            return str(value)
-        return str(value)
+def _releasing(entry, chunks):
+    try:
+        yield from chunks
+    finally:
+        registry.release(entry)
+
+
+def with_ontology(view):
+    """
+    Resolve a ontologia da requisição e a passa para a view como ``entry``.
+
+    O id vem do parâmetro ``ontology_id`` (query string ou formulário) ou do
+    cabeçalho ``X-Ontology-Id``. A ontologia fica reservada até o fim da resposta
+    (no streaming, até o último bloco) para não ser fechada pelo LRU no meio.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        ontology_id = (request.GET.get('ontology_id') or request.POST.get('ontology_id')
+                       or request.headers.get('X-Ontology-Id'))
+        if not ontology_id:
+            return JsonResponse({'status': 'error', 'message': 'Nenhuma ontologia carregada (ontology_id não informado)'}, status=400)
+        try:
+            entry = registry.acquire(ontology_id)
+        except OntologyNotFound as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=404)
+        except OntologyLoading as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=409)
+        try:
+            response = view(request, entry, *args, **kwargs)
+        except BaseException:
+            registry.release(entry)
+            raise
+        if response.streaming:
+            response.streaming_content = _releasing(entry, response.streaming_content)
+        else:
+            registry.release(entry)
+        return response
+    return wrapper
+
+
+def apply_mutation(entry, op, data):
+    """
+    Aplica a operação, anexa ao journal e faz o commit no quadstore.
+
+    Roda na fila de escrita da ontologia: mutações concorrentes são aplicadas uma
+    de cada vez e as leituras nunca veem uma pela metade. Retorna
+    ``(revision, changes)``; a gravação do RDF/XML fica para o compactador. Se a
+    operação falhar no meio, tudo o que ela já tinha alterado é desfeito.
+
+    O delta (``changes``) já vem como dict: é serializado ainda com o lock de
+    escrita, antes que outra mutação (ou um undo) altere as entidades.
+    """
+    revision, changes = entry.write(_apply_mutation, entry, op, data)
+    compactor.notify(entry.journal)
+    return revision, changes
+
 
-    properties_data = {}
-    for prop in ind.get_properties():
+def _apply_mutation(entry, op, data):
+    onto = entry.onto
+    changes = ChangeSet()
+    step = entry.history.next_step()
+    try:
+        with entry.history.record(op):
+            operations.apply(op, onto, entry.index, data, changes)
+    except Exception:
+        # Só as entidades que a mutação tocou são relidas e reindexadas
+        entry.rollback(entry.history.touched(step))
+        raise
+    revision = store.bump_revision(onto)
+    entry.journal.append(revision, op, data)
+    store.commit(onto)
+    entry.serialized.invalidate(changes.iris())
+    return revision, changes.to_dict()
+
+
+def apply_import_chunk(entry, chunk, report):
+    """
+    Cria os indivíduos de um bloco da importação em massa (na fila de escrita).
+
+    As linhas simples são gravadas em lote (ver ``bulk_import.IndividualBatch``).
+    As outras rodam cada uma num SAVEPOINT próprio: uma linha inválida é desfeita
+    e vai para o log de erros sem derrubar as outras. O bloco inteiro vira uma
+    entrada ``batch`` no journal e um único commit.
+    """
+    entry.write(_apply_import_chunk, entry, chunk, report)
+    compactor.notify(entry.journal)
+
+
+def _apply_import_chunk(entry, chunk, report):
+    onto = entry.onto
+    db = entry.world.graph.db
+    applied = []
+    changes = ChangeSet()
+    batch = bulk_import.IndividualBatch(onto, entry.index)
+
+    def created(line_no, row):
+        applied.append({'op': 'create_individual', 'data': row})
+        report.imported += 1
+
+    def create(line_no, row):
+        db.execute("SAVEPOINT import_row")
+        row_changes = ChangeSet()
+        try:
+            operations.create_individual(onto, entry.index, row, row_changes)
+        except Exception as e:
+            # O indivíduo e os objetos das relações podem ter ficado no cache/índice
+            touched = store.resource_storids(onto, [onto.base_iri + str(row.get('name')), *row_changes.iris()])
+            db.execute("ROLLBACK TO import_row")
+            entry.refresh(touched)
+            report.fail(line_no, e)
+        else:
+            for entity in row_changes.added.values():
+                changes.add(entity)
+            for entity in row_changes.changed.values():
+                changes.change(entity)
+            created(line_no, row)
+        db.execute("RELEASE import_row")
+
+    def flush():
+        rows = batch.rows
         try:
-            values = getattr(ind, prop.name)
-            if not isinstance(values, list):
-                values = [values]
-            properties_data[prop.name] = [process_value(v) for v in values]
-        except AttributeError:
-            properties_data[prop.name] = []
+            written = batch.flush(changes)
         except Exception:
-            properties_data[prop.name] = ["ErroAoAcessar"]
+            logger.exception("Falha ao gravar o lote da importação; as linhas serão criadas uma a uma")
+            for line_no, row in rows:
+                create(line_no, row)
+            return
+        for line_no, row in written:
+            created(line_no, row)
+
+    with onto, entry.history.record('import_individuals'):
+        for line_no, row in chunk:
+            if isinstance(row, Exception):
+                report.fail(line_no, row)
+                continue
+            try:
+                if batch.add(line_no, row):
+                    continue
+            except Exception as e:
+                report.fail(line_no, e)
+                continue
+            # A linha pode depender das anteriores: o lote é gravado antes dela
+            flush()
+            create(line_no, row)
+        flush()
+    if applied:
+        revision = store.bump_revision(onto)
+        entry.journal.append(revision, 'batch', {'operations': applied})
+    store.commit(onto)
+    entry.serialized.invalidate(changes.iris())
+
+
+def apply_history(entry, op, data):
+    """
+    Desfaz, refaz ou restaura um snapshot (``history.OPS``) como uma mutação: na
+    fila de escrita, com entrada no journal e revisão nova. Retorna
+    ``(revision, changes)``, com o delta já serializado (ver ``apply_mutation``).
+    """
+    revision, changes = entry.write(_apply_history, entry, op, data)
+    compactor.notify(entry.journal)
+    return revision, changes
+
+
+def _apply_history(entry, op, data):
+    onto = entry.onto
+    changes = ChangeSet()
+    try:
+        entry.apply_history(op, data, changes)
+    except Exception:
+        # As entidades em memória já foram restauradas por ``apply_history``
+        store.rollback(onto)
+        raise
+    revision = store.bump_revision(onto)
+    entry.journal.append(revision, op, data)
+    store.commit(onto)
+    return revision, changes.to_dict()
+
+
+def _edit_snapshots(entry, fn, *args):
+    """Cria/remove um snapshot: não muda o conteúdo, então não gera revisão nem journal."""
+    result = fn(*args)
+    store.commit(entry.onto)
+    return result
+
+
+def import_individuals(entry, lines, fmt, progress=None, error_log=None):
+    """Importa indivíduos de ``lines`` (linhas de um CSV/JSONL) em blocos."""
+    rows = bulk_import.READERS[fmt](lines)
+    report = bulk_import.ImportReport(error_log=error_log)
+    return bulk_import.import_rows(rows, partial(apply_import_chunk, entry), settings.ONTOLOGY_IMPORT_CHUNK_SIZE,
+                                   report=report, progress=progress)
+
+
+def build_load_payload(entry, class_tree=None, progress=None):
+    """
+    Corpo de ``ontology`` devolvido ao fim do carregamento.
+
+    ``class_tree=lazy`` devolve só a primeira página de raízes (ver class-hierarchy/);
+    ``class_tree=graph`` devolve cada classe uma vez, com as arestas pai -> filhos.
+    ``progress(percentual)`` é chamado ao longo da serialização.
+    """
+    progress = progress or (lambda percent: None)
+    onto, index = entry.onto, entry.index
+
+    classes_next_cursor = None
+    if class_tree == 'lazy':
+        classes, classes_next_cursor = hierarchy.children_page(onto)
+        classes_count = len(index.classes())
+    elif class_tree == 'graph':
+        classes = hierarchy.build_class_graph(hierarchy.root_classes(onto))
+        classes_count = len(classes['nodes'])
+    else:
+        all_classes = list(onto.classes())
+        roots = [c for c in onto.classes() if Thing in c.is_a] or all_classes
+        memo = {}
+        classes = [build_entity_hierarchy(c, memo) for c in roots]
+        classes_count = len(all_classes)
+    progress(30)
+
+    datatypes = {rng.name for p in onto.data_properties() for rng in getattr(p, 'range', []) if hasattr(rng, 'name')}
+    datatypes |= {'xsd:string','xsd:integer','xsd:float','xsd:boolean','xsd:dateTime'}
+
+    cache = entry.serialized
+    object_properties = cache.serialize(onto.object_properties(), serialize_property)
+    data_properties = cache.serialize(onto.data_properties(), serialize_property)
+    annotation_properties = cache.serialize(onto.annotation_properties(), serialize_property)
+    progress(40)
+
+    all_individuals = list(onto.individuals())
+    progress(70)
+    individuals = cache.serialize(all_individuals, serialize_individual, serialize_individuals)
+
     return {
-        'name': ind.name,
-        'type': [cls.name for cls in ind.is_a if hasattr(cls, 'name')],
-        'properties': properties_data
+        'classes': classes,
+        'classes_next_cursor': classes_next_cursor,
+        'classes_count': classes_count,
+        'object_properties': object_properties,
+        'data_properties': data_properties,
+        'annotation_properties': annotation_properties,
+        'individuals': individuals,
+        'datatypes': list(datatypes),
+        'revision': store.get_revision(onto),
     }
 
 
-def serialize_property(prop):
+def upload_key(digest, imports):
+    """Chave do ``upload_cache``: o sha256 do arquivo e, se houver, o dos imports."""
+    if not imports:
+        return digest
+    return hashlib.sha256(f"{digest}\0{imports.key()}".encode()).hexdigest()
+
+
+def load_ontology_job(job, ontology_id, path, class_tree=None, digest=None):
+    """
+    Parse, indexação e serialização de um upload, como job de ``load-ontology/``.
+
+    Com ``digest`` (sha256 do arquivo), o quadstore e o corpo já calculados para o
+    mesmo conteúdo e os mesmos imports são reaproveitados do ``upload_cache``, e os
+    novos são guardados. A chave vem do mesmo ``ImportPlan`` que é carregado (com
+    os imports baixados agora). O id só é liberado para as outras rotas no fim (ver
+    ``OntologyRegistry.publish``), com o cache já gravado.
+    O resultado é um ``render.Payload``.
+    """
+    entry = data = imports = None
+    try:
+        if digest is not None:
+            job.update('imports', 0)
+            imports = import_resolver.plan(path)
+            digest = upload_key(digest, imports)
+            entry = registry.restore(ontology_id, path, partial(upload_cache.restore_store, digest))
+        if entry is None:
+            entry = registry.create(ontology_id, path, progress=job.update, imports=imports)
+            if digest is not None:
+                with entry.reading():
+                    upload_cache.put_store(digest, path, entry.world.graph.db)
+        else:
+            data = upload_cache.get_payload(digest, class_tree)
+    except BaseException:
+        if entry is not None:
+            registry.release(entry)
+        registry.discard(ontology_id)
+        # O parser do Owlready2 embrulha a exceção do cancelamento na dele
+        if job.cancel_requested:
+            raise JobCancelled()
+        raise
     try:
-        from owlready2 import And, Or, FunctionalProperty, TransitiveProperty, SymmetricProperty, ObjectProperty
-
-        # Helper para extrair nomes de classes de expressões lógicas (And/Or)
-        def extract_classes(item):
-            if isinstance(item, (And, Or)):
-                return [extract_classes(c) for c in item.Classes]
-            elif hasattr(item, 'name'):
-                return item.name
-            else:
-                return str(item)
-
-        # Converter IRI para string e garantir valores padrão
-        prop_data = {
-            'name': getattr(prop, 'name', ''),
-            'iri': str(getattr(prop, 'iri', '')),
-            'domain': [],
-            'range': [],
-            'is_functional': False,
-            'is_transitive': False,
-            'is_symmetric': False,
-            'error': None
-        }
-
-        # Verificar se é uma propriedade de objeto
-        if not isinstance(prop, ObjectProperty):
-            prop_data['error'] = 'Tipo de propriedade não suportado'
-            return prop_data
-
-        # Processar domínio
-        domain = getattr(prop, 'domain', [])
-        if not isinstance(domain, list):
-            domain = [domain]
-        prop_data['domain'] = [extract_classes(item) for item in domain]
-
-        # Processar range
-        prop_range = getattr(prop, 'range', [])
-        if not isinstance(prop_range, list):
-            prop_range = [prop_range]
-        prop_data['range'] = [extract_classes(item) for item in prop_range]
-
-        # Verificar características especiais
-        prop_data['is_functional'] = isinstance(prop, FunctionalProperty)
-        prop_data['is_transitive'] = isinstance(prop, TransitiveProperty)
-        prop_data['is_symmetric'] = isinstance(prop, SymmetricProperty)
-
-        return prop_data
+        logger.info(f"[LOAD] ontologia {entry.id}: {entry.path!r}{' (cache)' if data is not None else ''}")
+        if data is None:
+            job.update('serializing', 0)
+            with entry.reading():
+                data = build_load_payload(entry, class_tree, progress=lambda percent: job.update('serializing', percent))
+            data = render.dumps(data)
+            if digest is not None:
+                upload_cache.put_payload(digest, class_tree, data)
+    except BaseException:
+        registry.release(entry)
+        registry.discard(ontology_id)
+        raise
+    registry.publish(ontology_id)
+    registry.release(entry)
+    # Corpo codificado uma vez (o JSON da ontologia entra pronto) e comprimido sob demanda
+    return render.Payload(render.splice(
+        {'status': 'success', 'message': 'Ontologia carregada!', 'ontology_id': ontology_id}, 'ontology', data))
 
-    except Exception as e:
-        # Log detalhado para debug
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Erro serializando propriedade {prop}: {str(e)}", exc_info=True)
-        
-        return {
-            'name': getattr(prop, 'name', 'ErroDesconhecido'),
-            'error': str(e)
-        }
-    
 
 @csrf_exempt
+@offload(heavy)
 def load_ontology_view(request):
-    global world, onto, onto_path
+    """
+    POST: carrega o arquivo enviado como uma ontologia nova, em segundo plano.
+
+    Responde logo (202) com ``job_id`` e ``ontology_id``. ``load-jobs/<job_id>/``
+    informa a fase (uploading, imports, parsing, indexing, serializing) e o percentual;
+    ``load-jobs/<job_id>/result/`` devolve o corpo completo ao terminar. As demais
+    rotas recebem ``ontology_id`` como parâmetro (ou cabeçalho ``X-Ontology-Id``).
+
+    Um arquivo idêntico a um já carregado (mesmo sha256, com os mesmos imports no
+    catálogo local) não é parseado de novo: o job termina antes da resposta, que
+    vem com ``cached: true``. Se faltar algum import que o job ainda pode baixar,
+    só o job sabe a chave do cache.
+    """
     if request.method == 'POST':
         if 'ontology_file' not in request.FILES:
             return JsonResponse({'status': 'error', 'message': 'Nenhum arquivo enviado'}, status=400)
+        file = request.FILES['ontology_file']
+        job = job_manager.create('load_ontology')
+        ontology_id, path = registry.allocate(file.name)
         try:
-            logger.info(f"[LOAD] onto id: {id(onto)}, onto_path: {onto_path!r}")
-            file = request.FILES['ontology_file']
-            media_dir = settings.MEDIA_ROOT
-            os.makedirs(media_dir, exist_ok=True)
-            path = os.path.join(media_dir, file.name)
-            with open(path, 'wb+') as dest:
-                for chunk in file.chunks(): dest.write(chunk)
-
-            onto_path = path
-            onto = get_ontology(path).load()
-
-            all_classes = list(onto.classes())
-            roots = [c for c in onto.classes() if Thing in c.is_a] or all_classes
-
-            datatypes = {rng.name for p in onto.data_properties() for rng in getattr(p, 'range', []) if hasattr(rng, 'name')}
-            datatypes |= {'xsd:string','xsd:integer','xsd:float','xsd:boolean','xsd:dateTime'}
-
-            data = {
-                'classes': [build_entity_hierarchy(c) for c in roots],
-                'classes_count': len(all_classes),
-                'object_properties': [serialize_property(p) for p in onto.object_properties()],
-                'data_properties': [serialize_property(p) for p in onto.data_properties()],
-                'annotation_properties': [serialize_property(p) for p in onto.annotation_properties()],
-                'individuals': [serialize_individual(i) for i in onto.individuals()],
-                'datatypes': list(datatypes)
-            }
-            return JsonResponse({'status':'success','message':'Ontologia carregada!','ontology':data})
+            written = 0
+            with open(path, 'wb+') as f:
+                dest = HashingWriter(f)
+                for chunk in file.chunks():
+                    dest.write(chunk)
+                    written += len(chunk)
+                    job.update('uploading', 100 * written / (file.size or 1))
+            digest = dest.hexdigest()
+            # O quadstore em cache inclui os imports: o catálogo também entra na chave
+            imports = import_resolver.plan(path, fetch=False)
+            cache_key = upload_key(digest, imports)
+            upload_cache.dedupe_upload(cache_key, path)
+            diff.keep_original(path)
         except Exception as e:
+            registry.discard(ontology_id)
+            if isinstance(e, JobCancelled):
+                job.finish(jobs.CANCELLED)
+                return JsonResponse({'status': 'error', 'message': 'Carregamento cancelado', 'job_id': job.id}, status=410)
+            job.finish(jobs.FAILED, str(e))
             traceback.print_exc()
             return JsonResponse({'status':'error','message':str(e)}, status=400)
+        class_tree = request.POST.get('class_tree')
+        # Sem imports a baixar, o plano do job é este mesmo e a chave já vale
+        cached = ((not imports.missing or import_resolver.offline)
+                  and upload_cache.has_payload(cache_key, class_tree))
+        if cached:
+            job_manager.run(job, load_ontology_job, ontology_id, path, class_tree, digest)
+        else:
+            job_manager.start(job, load_ontology_job, ontology_id, path, class_tree, digest)
+        return JsonResponse({
+            'status': 'success',
+            'message': 'Carregamento iniciado',
+            'job_id': job.id,
+            'ontology_id': ontology_id,
+            'sha256': digest,
+            'cached': cached,
+        }, status=202)
     return JsonResponse({'status':'error','message':'Método não permitido'}, status=405)
 
 @csrf_exempt
-def create_class_view(request):
-    global onto
-    if onto is None:
-        return JsonResponse({'status': 'error', 'message': 'Nenhuma ontologia carregada'}, status=400)
+@offload(light)
+def load_job_status_view(request, job_id):
+    """GET: fase, percentual e estado (running, done, failed, cancelled) do carregamento."""
+    if request.method != 'GET':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+    job = job_manager.get(job_id)
+    if job is None:
+        return JsonResponse({'status': 'error', 'message': f'Job "{job_id}" não encontrado'}, status=404)
+    return JsonResponse({'status': 'success', 'job': job.to_dict()})
+
+@csrf_exempt
+@offload(light)
+def load_job_result_view(request, job_id):
+    """GET: o corpo completo do carregamento terminado (o mesmo da antiga resposta síncrona)."""
+    if request.method != 'GET':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+    job = job_manager.get(job_id)
+    if job is None:
+        return JsonResponse({'status': 'error', 'message': f'Job "{job_id}" não encontrado'}, status=404)
+    if job.status == jobs.DONE:
+        return job.result.response(request)
+    if job.status == jobs.FAILED:
+        return JsonResponse({'status': 'error', 'message': job.error, 'job': job.to_dict()}, status=400)
+    if job.status == jobs.CANCELLED:
+        return JsonResponse({'status': 'error', 'message': 'Carregamento cancelado', 'job': job.to_dict()}, status=410)
+    return JsonResponse({'status': 'error', 'message': 'Carregamento em andamento', 'job': job.to_dict()}, status=409)
+
+@csrf_exempt
+@offload(light)
+def cancel_load_job_view(request, job_id):
+    """POST: cancela um carregamento em andamento; a ontologia parcial é descartada."""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+    job = job_manager.get(job_id)
+    if job is None:
+        return JsonResponse({'status': 'error', 'message': f'Job "{job_id}" não encontrado'}, status=404)
+    if not job.cancel():
+        return JsonResponse({'status': 'error', 'message': 'O carregamento já terminou', 'job': job.to_dict()}, status=409)
+    return JsonResponse({'status': 'success', 'message': 'Cancelamento solicitado', 'job': job.to_dict()})
 
+@csrf_exempt
+@offload(light)
+@with_ontology
+def create_class_view(request, entry):
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
-            class_name = data.get('name')
-            parent_names = data.get('parents', [])
-            
-
-            if not class_name:
-                return JsonResponse({'status': 'error', 'message': 'Nome da classe é obrigatório'}, status=400)
-
-            with onto:
-                # Definindo classes-pai
-                if parent_names:
-                    parents = []
-                    for parent_name in parent_names:
-                        parent_cls = onto.search_one(iri="*" + parent_name)
-                        if not parent_cls:
-                            return JsonResponse({'status': 'error', 'message': f'Classe pai "{parent_name}" não encontrada'}, status=400)
-                        parents.append(parent_cls)
-                else:
-                    parents = [Thing]
-
-                # Criando a nova classe
-                NewClass = types.new_class(class_name, tuple(parents))
-
-            # Atualizar a árvore de classes
-            all_classes = list(onto.classes())
-            root_classes = [cls for cls in onto.classes() if Thing in cls.is_a]
-            if not root_classes:
-                root_classes = all_classes
-
-            ontology_data = {
-                'classes': [build_entity_hierarchy(cls) for cls in root_classes],
-                'classes_count': len(all_classes)
-            }
-
-            return JsonResponse({'status': 'success', 'message': 'Classe criada com sucesso', 'ontology': ontology_data})
+            revision, changes = apply_mutation(entry, 'create_class', data)
+            return JsonResponse({'status': 'success', 'message': 'Classe criada com sucesso', 'revision': revision, 'changes': changes})
 
+        except OperationError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=e.status)
+        except AmbiguousNameError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
         except Exception as e:
             traceback.print_exc()
             return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
@@ -222,205 +492,629 @@ def create_class_view(request):
     return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
 
 @csrf_exempt
-def export_ontology_view(request):
-    if onto is None:
-        return JsonResponse({'status': 'error', 'message': 'Nenhuma ontologia carregada'}, status=400)
+@offload(light)
+@with_ontology
+def class_hierarchy_view(request, entry):
+    """
+    GET: filhos diretos de ``parent`` (ou as classes raiz), paginados por cursor.
+
+    Parâmetros: ``parent``, ``depth`` (níveis expandidos, padrão 1), ``cursor`` e
+    ``limit``. Cada nó traz ``child_count`` para a árvore expandir sob demanda.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+
+    try:
+        parent_name = request.GET.get('parent')
+        try:
+            depth = min(max(int(request.GET.get('depth', 1)), 1), hierarchy.MAX_DEPTH)
+            limit = min(max(int(request.GET.get('limit', hierarchy.DEFAULT_PAGE_SIZE)), 1), hierarchy.MAX_PAGE_SIZE)
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'depth e limit devem ser inteiros'}, status=400)
+
+        with entry.reading():
+            parent = None
+            if parent_name:
+                parent = entry.index.resolve(parent_name, CLASS)
+                if not parent:
+                    return JsonResponse({'status': 'error', 'message': f'Classe "{parent_name}" não encontrada'}, status=404)
+
+            nodes, next_cursor = hierarchy.children_page(
+                entry.onto, parent, cursor=request.GET.get('cursor'), limit=limit, depth=depth)
+            revision = store.get_revision(entry.onto)
+        return render.render(request, {
+            'status': 'success',
+            'parent': parent_name,
+            'nodes': nodes,
+            'next_cursor': next_cursor,
+            'revision': revision,
+        })
+
+    except (AmbiguousNameError, ValueError) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        traceback.print_exc()
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@csrf_exempt
+@offload(light)
+@with_ontology
+def list_individuals_view(request, entry):
+    """
+    GET: indivíduos ordenados por nome, paginados por cursor.
+
+    Filtros: ``class`` (declarada; com ``inherited=true`` também as subclasses),
+    ``property`` (pode repetir: exige valor para cada uma) e ``prefix`` (início do
+    nome). ``fields`` escolhe os campos (name, iri, type, properties); ``cursor`` e
+    ``limit`` como em class-hierarchy/.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
 
     try:
-        filename = request.GET.get('filename', 'ontology.owl')
-        if not filename.endswith('.owl'):
-            filename += '.owl'
+        try:
+            limit = int(request.GET.get('limit', hierarchy.DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'limit deve ser inteiro'}, status=400)
+        fields = individuals.parse_fields(request.GET.get('fields'))
+        inherited = request.GET.get('inherited', '').lower() in ('1', 'true', 'yes')
+
+        with entry.reading():
+            cls = None
+            class_name = request.GET.get('class')
+            if class_name:
+                cls = entry.index.resolve(class_name, CLASS)
+                if not cls:
+                    return JsonResponse({'status': 'error', 'message': f'Classe "{class_name}" não encontrada'}, status=404)
+            properties = []
+            for prop_name in request.GET.getlist('property'):
+                prop = entry.index.resolve(prop_name, OBJECT_PROPERTY, DATA_PROPERTY, ANNOTATION_PROPERTY)
+                if not prop:
+                    return JsonResponse({'status': 'error', 'message': f'Propriedade "{prop_name}" não encontrada'}, status=404)
+                properties.append(prop)
+
+            page, next_cursor = individuals.individuals_page(
+                entry.index, cls, inherited, properties, request.GET.get('prefix', ''),
+                cursor=request.GET.get('cursor'), limit=limit)
+            items = individuals.serialize_page(page, fields, entry.serialized)
+            revision = store.get_revision(entry.onto)
+        return render.render(request, {
+            'status': 'success',
+            'individuals': items,
+            'next_cursor': next_cursor,
+            'revision': revision,
+        })
+
+    except (AmbiguousNameError, ValueError) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        traceback.print_exc()
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
-        export_path = os.path.join(settings.MEDIA_ROOT, filename)
-        onto.save(file=export_path, format="rdfxml")
+def _closure_response(request, entry, relation, direct_relation):
+    """Página de ``relation`` (ou, com ``direct=true``, de ``direct_relation``) de ``entity``."""
+    if request.method != 'GET':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
 
-        return FileResponse(open(export_path, 'rb'), as_attachment=True, filename=filename)
+    name = request.GET.get('entity')
+    if not name:
+        return JsonResponse({'status': 'error', 'message': 'Parâmetro entity é obrigatório'}, status=400)
+    try:
+        limit = int(request.GET.get('limit', hierarchy.DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'limit deve ser inteiro'}, status=400)
+    if request.GET.get('direct', '').lower() in ('1', 'true', 'yes'):
+        relation = direct_relation
+
+    try:
+        with entry.reading():
+            entity = entry.index.resolve(name, CLASS, OBJECT_PROPERTY, DATA_PROPERTY, ANNOTATION_PROPERTY)
+            if not entity:
+                return JsonResponse({'status': 'error', 'message': f'Classe ou propriedade "{name}" não encontrada'}, status=404)
+            keys = entry.index.closure.sorted_keys(relation, entity.iri)
+            page, next_cursor = closure.keys_page(keys, request.GET.get('cursor'), limit)
+            revision = store.get_revision(entry.onto)
+        return render.render(request, {
+            'status': 'success',
+            'entity': {'name': entity.name, 'iri': entity.iri, 'kind': entity_kind(entity)},
+            relation: [{'name': key_name, 'iri': iri} for key_name, iri in page],
+            'total': len(keys),
+            'next_cursor': next_cursor,
+            'revision': revision,
+        })
+
+    except (AmbiguousNameError, ValueError) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        traceback.print_exc()
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@csrf_exempt
+@offload(light)
+@with_ontology
+def ancestors_view(request, entry):
+    """
+    GET: todas as superclasses (ou superpropriedades) de ``entity``, do fecho
+    transitivo do índice; com ``direct=true``, só as diretas. Paginado por
+    ``cursor``/``limit`` como em class-hierarchy/.
+    """
+    return _closure_response(request, entry, 'ancestors', 'parents')
+
+@csrf_exempt
+@offload(light)
+@with_ontology
+def descendants_view(request, entry):
+    """GET: todas as subclasses (ou subpropriedades) de ``entity``; como ancestors/."""
+    return _closure_response(request, entry, 'descendants', 'children')
+
+@csrf_exempt
+@offload(light)
+@with_ontology
+def instances_view(request, entry):
+    """
+    GET: indivíduos de ``class``, inclusive das subclasses (com ``direct=true``, só
+    os declarados como a própria classe). ``fields``, ``cursor`` e ``limit`` como em
+    individuals/.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+
+    class_name = request.GET.get('class')
+    if not class_name:
+        return JsonResponse({'status': 'error', 'message': 'Parâmetro class é obrigatório'}, status=400)
+    try:
+        try:
+            limit = int(request.GET.get('limit', hierarchy.DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'limit deve ser inteiro'}, status=400)
+        fields = individuals.parse_fields(request.GET.get('fields'))
+        inherited = request.GET.get('direct', '').lower() not in ('1', 'true', 'yes')
+
+        with entry.reading():
+            cls = entry.index.resolve(class_name, CLASS)
+            if not cls:
+                return JsonResponse({'status': 'error', 'message': f'Classe "{class_name}" não encontrada'}, status=404)
+            page, next_cursor = individuals.individuals_page(
+                entry.index, cls, inherited, cursor=request.GET.get('cursor'), limit=limit)
+            items = individuals.serialize_page(page, fields, entry.serialized)
+            revision = store.get_revision(entry.onto)
+        return render.render(request, {
+            'status': 'success',
+            'class': {'name': cls.name, 'iri': cls.iri},
+            'instances': items,
+            'next_cursor': next_cursor,
+            'revision': revision,
+        })
+
+    except (AmbiguousNameError, ValueError) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        traceback.print_exc()
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@csrf_exempt
+@offload(light)
+@with_ontology
+def search_view(request, entry):
+    """
+    GET: busca textual nas entidades (nome local, IRI, rdfs:label e rdfs:comment).
+
+    ``q`` é o texto; cada termo também casa como prefixo (autocompletar) e, a
+    menos que ``fuzzy=false``, termos sem resultado suficiente toleram 1-2 erros de
+    digitação. ``type`` (pode repetir ou separar por vírgula) restringe o tipo de
+    entidade, ``lang`` o idioma dos rótulos e ``limit`` o número de resultados.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'status': 'error', 'message': 'Parâmetro q é obrigatório'}, status=400)
+    try:
+        limit = int(request.GET.get('limit', search.DEFAULT_LIMIT))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'limit deve ser inteiro'}, status=400)
+    kinds = {k.strip() for value in request.GET.getlist('type') for k in value.split(',') if k.strip()}
+    unknown = sorted(kinds - set(KINDS))
+    if unknown:
+        return JsonResponse({'status': 'error',
+                             'message': f'Tipo(s) desconhecido(s): {", ".join(unknown)} (use {", ".join(KINDS)})'},
+                            status=400)
+    fuzzy = request.GET.get('fuzzy', 'true').lower() not in ('0', 'false', 'no')
+
+    try:
+        with entry.reading():
+            results = entry.index.search.search(query, kinds or None, request.GET.get('lang'), limit, fuzzy)
+            revision = store.get_revision(entry.onto)
+        return render.render(request, {
+            'status': 'success',
+            'results': results,
+            'revision': revision,
+        })
+
+    except Exception as e:
+        traceback.print_exc()
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@csrf_exempt
+@offload(heavy)
+@with_ontology
+def export_ontology_view(request, entry):
+    """
+    GET: baixa a ontologia serializada em streaming.
+
+    Parâmetros: ``filename``, ``format`` (``rdfxml``, ``ntriples`` ou ``nquads``) e
+    ``compression=gzip`` (opcional). Repetições sem mutação no meio saem do cache
+    de exportações; com ``If-None-Match`` igual ao ETag a resposta é 304.
+    """
+    onto = entry.onto
+    try:
+        fmt = request.GET.get('format', 'rdfxml')
+        compression = request.GET.get('compression') or None
+        if fmt not in export.FORMATS:
+            return JsonResponse({'status': 'error', 'message': f'Formato "{fmt}" não suportado'}, status=400)
+        if compression is not None and compression not in export.COMPRESSIONS:
+            return JsonResponse({'status': 'error', 'message': f'Compressão "{compression}" não suportada'}, status=400)
+
+        with entry.reading():
+            state = store.get_state(onto)
+        revision = state.get('revision', 0)
+        key = (entry.id, state.get('loaded_at'), revision, fmt, compression)
+        etag = export.export_etag(key)
+
+        if_none_match = request.headers.get('If-None-Match', '')
+        if etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]:
+            response = HttpResponse(status=304)
+            response['ETag'] = etag
+            return response
+
+        filename = export.export_filename(request.GET.get('filename', 'ontology.owl'), fmt, compression)
+        content_type = 'application/gzip' if compression else export.FORMATS[fmt][0]
+        content = export_cache.get(key)
+        if content is not None:
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            chunks = export.stream_ontology(onto, fmt, compression, lock=entry.reading())
+            response = StreamingHttpResponse(
+                export_cache.tee(key, chunks, lambda: store.get_revision(onto) == revision),
+                content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['ETag'] = etag
+        # O navegador pode guardar, mas sempre revalida pelo ETag
+        response['Cache-Control'] = 'no-cache'
+        return response
 
     except Exception as e:
         traceback.print_exc()
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
     
 
+# Versões comparáveis em ``diff/`` (além de ``snapshot:<nome>``)
+DIFF_REFS = ('original', 'saved', 'current')
+
+
+def diff_source(entry, ref):
+    """
+    ``TripleSet`` de uma versão da ontologia: ``original`` (o arquivo enviado),
+    ``saved`` (o arquivo depois da última compactação do journal), ``current``
+    (o quadstore) ou ``snapshot:<nome>`` (o quadstore com os passos desde o
+    snapshot desfeitos em memória).
+    """
+    if ref == 'current':
+        with entry.reading():
+            return diff.read_store(entry.onto)
+    if ref.startswith('snapshot:'):
+        with entry.reading():
+            steps = entry.history.path(entry.history.snapshot_step(ref.removeprefix('snapshot:')))
+            return diff.read_store(entry.onto, list(entry.history.changes(steps)))
+    if ref == 'saved':
+        return diff.read_file(entry.path)
+    if ref == 'original':
+        return diff.read_file(diff.original_path(entry.path))
+    raise ValueError(f'Versão "{ref}" desconhecida (use {", ".join(DIFF_REFS)})')
+
+
+@csrf_exempt
+@offload(heavy)
+@with_ontology
+def diff_view(request, entry):
+    """
+    GET: diferenças entre duas versões da ontologia (``from`` e ``to``, ver
+    ``DIFF_REFS``; padrão ``original`` -> ``current``), agrupadas por entidade.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+    refs = request.GET.get('from', 'original'), request.GET.get('to', 'current')
+    try:
+        old, new = (diff_source(entry, ref) for ref in refs)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except SnapshotNotFound as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=404)
+    except HistoryError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=409)
+    except FileNotFoundError:
+        return JsonResponse({'status': 'error', 'message': 'Arquivo original não disponível para esta ontologia'}, status=404)
+    return render.render(request, {'status': 'success', 'from': refs[0], 'to': refs[1], **diff.diff(old, new)})
+
+
 @csrf_exempt
-def create_annotation_property_view(request):
-    global onto
-    if onto is None: return JsonResponse({'status':'error','message':'Nenhuma ontologia carregada'},status=400)
+@offload(heavy)
+def diff_files_view(request):
+    """POST: diferenças entre dois arquivos de ontologia enviados (``from_file`` e ``to_file``)."""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+    if 'from_file' not in request.FILES or 'to_file' not in request.FILES:
+        return JsonResponse({'status': 'error', 'message': 'from_file e to_file são obrigatórios'}, status=400)
+    sides = []
+    try:
+        for field in ('from_file', 'to_file'):
+            with tempfile.NamedTemporaryFile(suffix='.owl', delete=False) as f:
+                for chunk in request.FILES[field].chunks():
+                    f.write(chunk)
+            try:
+                sides.append(diff.read_file(f.name))
+            finally:
+                os.remove(f.name)
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'message': f'Arquivo inválido: {e}'}, status=400)
+    return render.render(request, {'status': 'success', **diff.diff(*sides)})
+
+
+@csrf_exempt
+@offload(light)
+@with_ontology
+def history_view(request, entry):
+    """GET: posição no histórico, quantos passos há para desfazer/refazer e a lista deles."""
+    if request.method != 'GET':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+    with entry.reading():
+        return JsonResponse({'status': 'success', **entry.history.status(), 'steps': entry.history.steps()})
+
+
+def _history_response(entry, op, data, message):
+    try:
+        revision, changes = apply_history(entry, op, data)
+    except SnapshotNotFound as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=404)
+    except HistoryError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=409)
+    except Exception as e:
+        traceback.print_exc()
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+    with entry.reading():
+        status = entry.history.status()
+    return JsonResponse({
+        'status': 'success',
+        'message': message,
+        'revision': revision,
+        'changes': changes,
+        'history': status,
+    })
+
+
+@csrf_exempt
+@offload(light)
+@with_ontology
+def undo_view(request, entry):
+    """POST: desfaz a última alteração. A resposta traz o delta, como as mutações."""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+    return _history_response(entry, history.UNDO, {}, 'Alteração desfeita')
+
+
+@csrf_exempt
+@offload(light)
+@with_ontology
+def redo_view(request, entry):
+    """POST: refaz a última alteração desfeita."""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+    return _history_response(entry, history.REDO, {}, 'Alteração refeita')
+
+
+@csrf_exempt
+@offload(light)
+@with_ontology
+def snapshots_view(request, entry):
+    """
+    Snapshots nomeados da ontologia (ver ``history``).
+
+    GET: lista. POST ``{"name": ...}``: marca o estado atual (substitui um snapshot
+    de mesmo nome). DELETE ``?name=``: remove. Criar um snapshot não copia nada:
+    só impede que os passos desde ele saiam do histórico.
+    """
+    if request.method == 'GET':
+        with entry.reading():
+            return JsonResponse({'status': 'success', 'snapshots': entry.history.snapshots()})
+    try:
+        if request.method == 'POST':
+            name = json.loads(request.body or b'{}').get('name')
+            if not name:
+                return JsonResponse({'status': 'error', 'message': 'name é obrigatório'}, status=400)
+            snapshot = entry.write(_edit_snapshots, entry, entry.history.snapshot, name)
+            return JsonResponse({'status': 'success', 'snapshot': snapshot}, status=201)
+        if request.method == 'DELETE':
+            name = request.GET.get('name')
+            entry.write(_edit_snapshots, entry, entry.history.delete_snapshot, name)
+            return JsonResponse({'status': 'success', 'message': f'Snapshot "{name}" removido'})
+    except SnapshotNotFound as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=404)
+    except HistoryError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=409)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+
+
+@csrf_exempt
+@offload(light)
+@with_ontology
+def restore_snapshot_view(request, entry):
+    """
+    POST ``{"name": ...}``: volta a ontologia ao snapshot, desfazendo (ou refazendo)
+    os passos desde ele. Os passos desfeitos continuam disponíveis em ``redo/``
+    até a próxima alteração.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+    try:
+        name = json.loads(request.body or b'{}').get('name')
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    if not name:
+        return JsonResponse({'status': 'error', 'message': 'name é obrigatório'}, status=400)
+    return _history_response(entry, history.RESTORE, {'name': name}, f'Snapshot "{name}" restaurado')
+
+
+@csrf_exempt
+@offload(light)
+@with_ontology
+def create_annotation_property_view(request, entry):
     if request.method!='POST': return JsonResponse({'status':'error','message':'Método não permitido'},status=405)
     try:
         data=json.loads(request.body)
-        name, domains = data.get('name'), data.get('domain',[])
-        if not name: return JsonResponse({'status':'error','message':'Nome é obrigatório'},status=400)
-        with onto:
-            New = types.new_class(name, (AnnotationPropertyClass,))
-            New.namespace = onto
-            if domains:
-                New.domain = [d for d in domains if d]
-
-            onto.save(file=onto_path, format="rdfxml")
-            onto = get_ontology(onto_path).load()
-        return JsonResponse({'status':'success','message':'AnnotationProperty criada','annotation_properties':[serialize_property(p) for p in onto.annotation_properties()]})
+        revision, changes = apply_mutation(entry, 'create_annotation_property', data)
+        return JsonResponse({'status':'success','message':'AnnotationProperty criada','revision':revision,'changes':changes})
+    except OperationError as e:
+        return JsonResponse({'status':'error','message':str(e)},status=e.status)
     except Exception as e:
         traceback.print_exc(); return JsonResponse({'status':'error','message':str(e)},status=500)
 
 @csrf_exempt
-def create_individual_view(request):
-    global onto
-    if onto is None:
-        return JsonResponse({'status': 'error', 'message': 'Nenhuma ontologia carregada'}, status=400)
+@offload(light)
+@with_ontology
+def create_individual_view(request, entry):
     if request.method != 'POST':
         return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
     try:
         data = json.loads(request.body)
-        individual_name = data.get('name')
-        class_names = data.get('classes', [])
-        properties = data.get('properties', {})
-        annotations = data.get('annotations', {})
-        obj_props = data.get('object_properties', {})
-        description = data.get('description', {})
-        same_as = data.get('same_as', [])
-        different_from = data.get('different_from', [])
-
-        if not individual_name:
-            return JsonResponse({'status': 'error', 'message': 'Nome do indivíduo é obrigatório'}, status=400)
-        if not class_names:
-            return JsonResponse({'status': 'error', 'message': 'Pelo menos uma classe deve ser especificada'}, status=400)
-
-        with onto:
-            # instantiate classes
-            classes = []
-            for cls_name in class_names:
-                ontology_class = onto.search_one(iri=f"*{cls_name}") or onto.search_one(label=cls_name)
-                if not ontology_class:
-                    return JsonResponse({'status': 'error', 'message': f'Classe "{cls_name}" não encontrada'}, status=400)
-                classes.append(ontology_class)
-
-            # create individual
-            new_individual = classes[0](individual_name)
-            if len(classes) > 1:
-                new_individual.is_a.extend(classes[1:])
-
-            # data properties
-            for prop_name, values in properties.items():
-                prop = onto.search_one(iri=f"*{prop_name}") or onto.search_one(label=prop_name)
-                if not prop or not isinstance(prop, DataPropertyClass):
-                    continue
-                # Process values into Python native types instead of rdflib Literals
-                processed = []
-                for item in values:
-                    val = item.get('value')
-                    lang = item.get('lang')
-                    dt_uri = item.get('datatype')
-                    if val is None:
-                        continue
-                    # Convert to Python type based on datatype
-                    if dt_uri and dt_uri.startswith('xsd:'):
-                        t = dt_uri[4:]
-                        try:
-                            if t in ('integer', 'int'):
-                                py_val = int(val)
-                            elif t in ('float', 'double', 'decimal'):
-                                py_val = float(val)
-                            elif t in ('boolean',):
-                                py_val = val.lower() in ('true', '1')
-                            else:
-                                py_val = val
-                        except Exception:
-                            py_val = val
-                    else:
-                        py_val = val
-                    processed.append(py_val)
-                # Assign to the individual
-                if isinstance(prop, FunctionalProperty) and processed:
-                    setattr(new_individual, prop.name, processed[0])
-                else:
-                    for v in processed:
-                        getattr(new_individual, prop.name).append(v)
-
-            # object properties
-            for prop_name, targets in obj_props.items():
-                prop = onto.search_one(iri=f"*{prop_name}") or onto.search_one(label=prop_name)
-                if not prop or not isinstance(prop, ObjectPropertyClass):
-                    continue
-                for t in targets:
-                    target_ind = onto.search_one(iri=f"*{t}") or onto.search_one(label=t)
-                    if target_ind:
-                        getattr(new_individual, prop.name).append(target_ind)
-
-            # annotations
-            for anno_name, values in annotations.items():
-                prop = onto.search_one(iri=f"*{anno_name}") or onto.search_one(label=anno_name)
-                if not prop or not isinstance(prop, AnnotationPropertyClass):
-                    continue
-                for v in values:
-                    prop[new_individual].append(v)
-
-            # description, same_as, different_from
-            for extra in description.get('types', []):
-                cls = onto.search_one(iri=f"*{extra}") or onto.search_one(label=extra)
-                if cls:
-                    new_individual.is_a.append(cls)
-            for same in same_as:
-                other = onto.search_one(iri=f"*{same}") or onto.search_one(label=same)
-                if other:
-                    new_individual.same_as.append(other)
-            for diff in different_from:
-                other = onto.search_one(iri=f"*{diff}") or onto.search_one(label=diff)
-                if other:
-                    new_individual.different_from.append(other)
-
-            onto.save(file=onto_path, format="rdfxml")
-
+        revision, changes = apply_mutation(entry, 'create_individual', data)
         return JsonResponse({
             'status': 'success',
             'message': 'Indivíduo criado!',
-            'ontology': {'individuals': [serialize_individual(i) for i in onto.individuals()]}
+            'revision': revision,
+            'changes': changes
         })
+    except OperationError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=e.status)
+    except AmbiguousNameError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
     except Exception as e:
         traceback.print_exc()
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
 @csrf_exempt
-def list_data_properties_view(request):
-    if onto is None:
-        return JsonResponse({'status': 'error', 'message': 'Nenhuma ontologia carregada'}, status=400)
+@offload(light)
+@with_ontology
+def batch_view(request, entry):
+    """
+    POST: aplica uma lista ordenada de operações como uma única transação.
+
+    Corpo: ``{"operations": [{"op": "create_class", "data": {...}}, ...]}``, onde
+    ``data`` tem o mesmo formato do corpo da rota correspondente. Ou todas as
+    operações são aplicadas (um commit, um delta combinado) ou nenhuma; os erros
+    vêm em ``errors`` com o índice da operação.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
 
     try:
-        data_properties = [
-            serialize_property(prop) for prop in onto.data_properties()
-        ]
-        return JsonResponse({'status': 'success', 'data_properties': data_properties})
+        data = json.loads(request.body)
+        revision, changes = apply_mutation(entry, 'batch', data)
+        return JsonResponse({
+            'status': 'success',
+            'message': f'{len(data["operations"])} operação(ões) aplicada(s)',
+            'revision': revision,
+            'changes': changes
+        })
 
+    except BatchError as e:
+        return JsonResponse({'status': 'error', 'message': str(e), 'errors': e.errors}, status=e.status)
+    except OperationError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=e.status)
     except Exception as e:
         traceback.print_exc()
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
 @csrf_exempt
-def list_object_properties_view(request):
+@offload(heavy)
+@with_ontology
+def import_individuals_view(request, entry):
+    """
+    POST: importação em massa de indivíduos a partir de um arquivo CSV ou JSONL.
+
+    O arquivo (campo ``file``) é lido em streaming e aplicado em blocos de
+    ``ONTOLOGY_IMPORT_CHUNK_SIZE`` linhas; ``format`` (``csv``/``jsonl``) é opcional
+    quando a extensão do arquivo já indica o formato. Linhas inválidas não
+    interrompem a importação e voltam em ``errors`` com o número da linha.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+    if 'file' not in request.FILES:
+        return JsonResponse({'status': 'error', 'message': 'Nenhum arquivo enviado'}, status=400)
+
+    file = request.FILES['file']
+    fmt = request.POST.get('format') or bulk_import.detect_format(file.name)
+    if fmt not in bulk_import.READERS:
+        return JsonResponse({'status': 'error', 'message': f'Formato "{fmt}" não suportado'}, status=400)
+
+    def progress(report):
+        logger.info(f"[IMPORT] {file.name}: {report.imported} importado(s), {report.failed} erro(s)")
+
+    try:
+        report = import_individuals(entry, file, fmt, progress=progress)
+        return JsonResponse({
+            'status': 'success',
+            'message': f'{report.imported} indivíduo(s) importado(s)',
+            'revision': store.get_revision(entry.onto),
+            **report.to_dict()
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@csrf_exempt
+@offload(light)
+@with_ontology
+def list_data_properties_view(request, entry):
+    try:
+        with entry.reading():
+            data_properties = entry.serialized.serialize(entry.onto.data_properties(), serialize_property)
+        return render.render(request, {'status': 'success', 'data_properties': data_properties})
+
+    except Exception as e:
+        traceback.print_exc()
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@csrf_exempt
+@offload(light)
+@with_ontology
+def list_object_properties_view(request, entry):
     """
     GET: retorna todas as ObjectProperties definidas na ontologia,
          com domínio e range (se houver).
     """
-    global onto
-    if onto is None:
-        return JsonResponse({'status': 'error', 'message': 'Nenhuma ontologia carregada'}, status=400)
-
     if request.method != 'GET':
         return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
 
     try:
-        props = []
-        for prop in onto.object_properties():
-            # domínio e range podem ser listas vazias
-            domains = [cls.name for cls in getattr(prop, "domain", [])]
-            ranges  = [cls.name for cls in getattr(prop, "range",  [])]
-            props.append({
-                'name':       prop.name,
-                'iri':        prop.iri,
-                'label':      prop.label.first() or None,
-                'domain':     domains,
-                'range':      ranges,
-                'is_functional': isinstance(prop, ObjectPropertyClass) and prop.is_functional,
-            })
+        with entry.reading():
+            props = []
+            for prop in entry.onto.object_properties():
+                # domínio e range podem ser listas vazias (ou ter expressões, como Or)
+                domains = [cls.name if isinstance(cls, ThingClass) else str(cls)
+                           for cls in getattr(prop, "domain", []) if cls is not None]
+                ranges  = [cls.name if isinstance(cls, ThingClass) else str(cls)
+                           for cls in getattr(prop, "range",  []) if cls is not None]
+                props.append({
+                    'name':       prop.name,
+                    'iri':        prop.iri,
+                    'label':      prop.label.first() or None,
+                    'domain':     domains,
+                    'range':      ranges,
+                    'is_functional': FunctionalProperty in prop.is_a,
+                })
 
         return JsonResponse({
             'status':            'success',
@@ -432,243 +1126,105 @@ def list_object_properties_view(request):
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
 @csrf_exempt
-def relationship_manager_view(request):
-    global onto
-    if onto is None:
-        return JsonResponse({'status': 'error', 'message': 'Nenhuma ontologia carregada'}, status=400)
-
+@offload(light)
+@with_ontology
+def relationship_manager_view(request, entry):
     if request.method != 'POST':
         return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
 
     try:
         data = json.loads(request.body)
-        subject_name = data.get('subject')
-        object_property_name = data.get('object_property')
-        target_name = data.get('target')
-        action = data.get('action')
-        replace_with_name = data.get('replace_with')
-
-        if not subject_name or not object_property_name or not action:
-            return JsonResponse({'status': 'error', 'message': 'Parâmetros obrigatórios ausentes'}, status=400)
-
-        with onto:
-            # Localiza indivíduos e propriedade
-            subject = onto.search_one(iri=f"*{subject_name}") or onto.search_one(label=subject_name)
-            if not subject:
-                return JsonResponse({'status': 'error', 'message': f'Indivíduo sujeito "{subject_name}" não encontrado'}, status=404)
-
-            obj_prop = onto.search_one(iri=f"*{object_property_name}") or onto.search_one(label=object_property_name)
-            if not obj_prop or not isinstance(obj_prop, ObjectPropertyClass):
-                return JsonResponse({'status': 'error', 'message': f'Propriedade "{object_property_name}" não encontrada ou não é uma ObjectProperty'}, status=400)
-
-            if action == 'add':
-                target = onto.search_one(iri=f"*{target_name}") or onto.search_one(label=target_name)
-                if not target:
-                    return JsonResponse({'status': 'error', 'message': f'Indivíduo destino "{target_name}" não encontrado'}, status=404)
-                getattr(subject, obj_prop.name).append(target)
-
-            elif action == 'remove':
-                target = onto.search_one(iri=f"*{target_name}") or onto.search_one(label=target_name)
-                if not target:
-                    return JsonResponse({'status': 'error', 'message': f'Indivíduo destino "{target_name}" não encontrado'}, status=404)
-                current_values = getattr(subject, obj_prop.name)
-                if target in current_values:
-                    current_values.remove(target)
-                else:
-                    return JsonResponse({'status': 'error', 'message': f'Relação não encontrada entre "{subject_name}" e "{target_name}" via "{object_property_name}"'}, status=404)
-
-            elif action == 'replace':
-                if not replace_with_name:
-                    return JsonResponse({'status': 'error', 'message': 'Parâmetro "replace_with" obrigatório para ação replace'}, status=400)
-                old_target = onto.search_one(iri=f"*{target_name}") or onto.search_one(label=target_name)
-                new_target = onto.search_one(iri=f"*{replace_with_name}") or onto.search_one(label=replace_with_name)
-                if not old_target or not new_target:
-                    return JsonResponse({'status': 'error', 'message': 'Indivíduos de origem ou destino não encontrados'}, status=404)
-                current_values = getattr(subject, obj_prop.name)
-                if old_target in current_values:
-                    current_values.remove(old_target)
-                    current_values.append(new_target)
-                else:
-                    return JsonResponse({'status': 'error', 'message': f'Relação original não encontrada entre "{subject_name}" e "{target_name}"'}, status=404)
-
-            else:
-                return JsonResponse({'status': 'error', 'message': 'Ação inválida. Use "add", "remove" ou "replace"'}, status=400)
-
-            # Salva alterações
-            onto.save(file=onto_path, format="rdfxml")
-
-        # Atualiza lista de indivíduos na resposta
-        updated_individuals = [serialize_individual(ind) for ind in onto.individuals()]
-
-        return JsonResponse({'status': 'success', 'message': 'Relacionamento atualizado com sucesso!', 'ontology': {'individuals': updated_individuals}})
+        revision, changes = apply_mutation(entry, 'manage_relationship', data)
+        return JsonResponse({'status': 'success', 'message': 'Relacionamento atualizado com sucesso!', 'revision': revision, 'changes': changes})
 
+    except OperationError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=e.status)
+    except AmbiguousNameError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
     except Exception as e:
         traceback.print_exc()
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
 
-import json
-import traceback
-import types
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-from owlready2 import And, ObjectProperty, FunctionalProperty, TransitiveProperty, SymmetricProperty
-from types import new_class
-
 @csrf_exempt
-def create_object_property_view(request):
-    global onto, onto_path
-
-    if onto is None and onto_path:
-        onto = get_ontology(onto_path).load()
-
-    if onto is None:
-        return JsonResponse({'status': 'error', 'message': 'Nenhuma ontologia carregada'}, status=400)
-
+@offload(light)
+@with_ontology
+def create_object_property_view(request, entry):
     try:
         data = json.loads(request.body)
-        name = data.get('property_name')
-        domain_names = data.get('domain', [])
-        range_names = data.get('range', [])
-        characteristics = data.get('characteristics', [])
-
-        if not name:
-            return JsonResponse({'status': 'error', 'message': 'Nome é obrigatório'}, status=400)
-
-        # Busca por classes de domínio
-        domains = []
-        for domain_name in domain_names:
-            cls = onto.search_one(iri=f"*{domain_name}") or onto.search_one(label=domain_name)
-            if not cls:
-                return JsonResponse({'status': 'error', 'message': f'Domínio "{domain_name}" não encontrado'}, status=400)
-            domains.append(cls)
-
-        # Busca por classes de range
-        ranges = []
-        for range_name in range_names:
-            cls = onto.search_one(iri=f"*{range_name}") or onto.search_one(label=range_name)
-            if not cls:
-                return JsonResponse({'status': 'error', 'message': f'Range "{range_name}" não encontrado'}, status=400)
-            ranges.append(cls)
-
-        with onto:
-            # Criação da nova propriedade seguindo padrão Owlready2
-            NewProperty = new_class(name, (ObjectProperty,))
-            NewProperty.namespace = onto
-
-            # Define domínio
-            if domains:
-                NewProperty.domain = domains if len(domains) == 1 else [And(domains)]
-
-            # Define range
-            if ranges:
-                NewProperty.range = ranges if len(ranges) == 1 else [And(ranges)]
-
-            # Define características
-            if 'functional' in [c.lower() for c in characteristics]:
-                NewProperty.is_a.append(FunctionalProperty)
-            if 'transitive' in [c.lower() for c in characteristics]:
-                NewProperty.is_a.append(TransitiveProperty)
-            if 'symmetric' in [c.lower() for c in characteristics]:
-                NewProperty.is_a.append(SymmetricProperty)
-
-            # Salva a ontologia atualizada
-            onto.save(file=onto_path, format="rdfxml")
-
-        # Retorna a lista atualizada
-        object_properties = [serialize_property(p) for p in onto.object_properties()]
+        revision, changes = apply_mutation(entry, 'create_object_property', data)
         return JsonResponse({
             'status': 'success',
             'message': 'Propriedade criada com sucesso',
-            'object_properties': object_properties
+            'revision': revision,
+            'changes': changes
         })
 
+    except OperationError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=e.status)
+    except AmbiguousNameError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
     except Exception as e:
         traceback.print_exc()
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
-import json
-import datetime
-import traceback
-import types
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-from owlready2 import get_ontology, DataProperty, FunctionalProperty, And, normstr, locstr
 
 @csrf_exempt
-def create_data_property_view(request):
-    global onto, onto_path
-
-    # Carrega ontologia se ainda não estiver em memória
-    if onto is None and onto_path:
-        onto = get_ontology(onto_path).load()
-
-    if onto is None:
-        return JsonResponse({'status': 'error', 'message': 'Nenhuma ontologia carregada'}, status=400)
-
+@offload(light)
+@with_ontology
+def create_data_property_view(request, entry):
     try:
         data = json.loads(request.body)
-        name = data.get('property_name')
-        domain_names = data.get('domain', [])
-        data_type_str = data.get('range')  # ex: "str", "int", "xsd:float", etc.
-        characteristics = data.get('characteristics', [])
-
-        if not name:
-            return JsonResponse({'status': 'error', 'message': 'Nome é obrigatório'}, status=400)
-        if not data_type_str:
-            return JsonResponse({'status': 'error', 'message': 'Tipo de dado (range) é obrigatório'}, status=400)
-
-        # Mapeamento dos tipos de dados para OwlReady2 (tipos Python nativos)
-        type_map = {
-            'str': str,
-            'normstr': normstr,
-            'locstr': locstr,
-            'int': int,
-            'float': float,
-            'bool': bool,
-            'date': datetime.date,
-            'time': datetime.time,
-            'datetime': datetime.datetime,
-        }
-
-        # Normaliza chave, removendo prefixo xsd: se presente
-        key = data_type_str.lower()
-        if key.startswith('xsd:'):
-            key = key.split(':', 1)[1]
-
-        data_type = type_map.get(key)
-        if data_type is None:
-            return JsonResponse({'status': 'error', 'message': f'Tipo de dado "{data_type_str}" não suportado'}, status=400)
-
-        # Busca por classes de domínio
-        domains = []
-        for domain_name in domain_names:
-            cls = onto.search_one(iri=f"*{domain_name}") or onto.search_one(label=domain_name)
-            if not cls:
-                return JsonResponse({'status': 'error', 'message': f'Domínio "{domain_name}" não encontrado'}, status=400)
-            domains.append(cls)
-
-        with onto:
-            # Criação da nova propriedade usando types.new_class
-            NewDataProp = types.new_class(name, (DataProperty,))
-            NewDataProp.namespace = onto
+        revision, changes = apply_mutation(entry, 'create_data_property', data)
+        return JsonResponse({'status': 'success', 'message': 'Propriedade de dados criada com sucesso', 'revision': revision, 'changes': changes})
 
-            # Define domínio
-            if domains:
-                NewDataProp.domain = domains if len(domains) == 1 else [And(domains)]
-
-            # Define range como tipo primitivo
-            NewDataProp.range = [data_type]
+    except OperationError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=e.status)
+    except AmbiguousNameError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        traceback.print_exc()
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
-            # Define características (functional)
-            if any(c.lower() == 'functional' for c in characteristics):
-                NewDataProp.is_a.append(FunctionalProperty)
 
-            # Salva a ontologia atualizada
-            onto.save(file=onto_path, format='rdfxml')
+@csrf_exempt
+@offload(light)
+def import_catalog_view(request):
+    """
+    Catálogo local dos ``owl:imports`` (ver ``imports``).
 
-        return JsonResponse({'status': 'success', 'message': 'Propriedade de dados criada com sucesso'})
+    GET: ``{IRI: arquivo}`` de todos os imports conhecidos. POST: registra o
+    arquivo enviado em ``file`` como o conteúdo do import ``iri``, para as próximas
+    ontologias que o importarem carregarem sem acessar a rede.
+    """
+    catalog = import_resolver.catalog
+    if request.method == 'GET':
+        return JsonResponse({'status': 'success', 'imports': catalog.entries()})
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
 
+    iri = request.POST.get('iri')
+    if not iri or 'file' not in request.FILES:
+        return JsonResponse({'status': 'error', 'message': 'iri e file são obrigatórios'}, status=400)
+    try:
+        path = catalog.store(iri, request.FILES['file'])
+        return JsonResponse({'status': 'success', 'iri': iri, 'file': os.path.basename(path)}, status=201)
     except Exception as e:
         traceback.print_exc()
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+
+@csrf_exempt
+async def server_stats_view(request):
+    """
+    GET: ocupação dos pools de threads (fila, threads ativas, saturação) e das
+    ontologias abertas em memória. Responde no event loop, sem passar pelos pools.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+    return JsonResponse({
+        'status': 'success',
+        'executors': {'light': light.stats(), 'heavy': heavy.stats()},
+        'open_ontologies': len(registry.loaded_ids()),
+        'serialization_cache': {entry.id: entry.serialized.stats() for entry in registry.loaded()},
+    })
@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark
+
+# Ontologias de ``media/`` que podem ser pedidas pelo nome
+BUNDLED = {'o3po': 'o3po.owl', 'o3po_merged': 'o3po_merged.owl'}
+DEFAULT_DATASETS = 'o3po,o3po_merged,10k,100k,1M'
+
+
+class Command(BaseCommand):
+    help = ('Mede todas as rotas de ontologia (latência, memória, tamanho das respostas) nas '
+            'ontologias de media/ e em ontologias sintéticas, e grava o resultado em JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--datasets', default=DEFAULT_DATASETS,
+                            help='Lista separada por vírgulas: o3po, o3po_merged, tamanhos sintéticos '
+                                 f'(10k, 100k, 1M...) ou caminhos de arquivos (padrão: {DEFAULT_DATASETS})')
+        parser.add_argument('--repeat', type=int, default=20, help='Repetições de cada rota (padrão: 20)')
+        parser.add_argument('--loads', type=int, default=3,
+                            help='Carregamentos de cada ontologia: o primeiro parseia, os outros usam o cache (padrão: 3)')
+        parser.add_argument('--seed', type=int, default=42, help='Semente das ontologias sintéticas')
+        parser.add_argument('--depth', type=int, default=5, help='Níveis de cada árvore de classes sintética')
+        parser.add_argument('--fanout', type=int, default=4, help='Subclasses por classe sintética')
+        parser.add_argument('--individual-density', type=float, default=0.8,
+                            help='Fração das triplas sintéticas gasta em indivíduos (padrão: 0.8)')
+        parser.add_argument('--output', help='Arquivo JSON do resultado (padrão: benchmark-<data>.json)')
+        parser.add_argument('--compare', help='Resultado anterior (JSON) para apontar regressões')
+        parser.add_argument('--threshold', type=float, default=1.25,
+                            help='Piora de latência (p50) considerada regressão no --compare (padrão: 1.25)')
+        parser.add_argument('--workdir', help='Diretório das ontologias geradas e dos quadstores (padrão: temporário)')
+        # Uso interno: mede uma ontologia neste processo e grava o resultado em --output
+        parser.add_argument('--worker', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            return self._work(options['worker'], options)
+
+        names = [name.strip() for name in options['datasets'].split(',') if name.strip()]
+        for name in names:
+            if name not in BUNDLED and not os.path.exists(name) and not benchmark.parse_size(name):
+                raise CommandError(f'Ontologia "{name}" desconhecida')
+
+        workdir = options['workdir'] or tempfile.mkdtemp(prefix='o3po-benchmark-')
+        os.makedirs(workdir, exist_ok=True)
+        output = options['output'] or f"benchmark-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        result = {'meta': self._meta(options), 'datasets': {}}
+        try:
+            for name in names:
+                path, generated = self._dataset(name, workdir, options)
+                self.stdout.write(f"{name}: medindo {path}...")
+                started = time.monotonic()
+                data = self._spawn(name, path, workdir, options)
+                data.update(file=os.path.basename(path), bytes=os.path.getsize(path), generator=generated)
+                result['datasets'][name] = data
+                if 'error' in data:
+                    # Ex.: o processo morreu sem memória; as outras ontologias ainda são medidas
+                    self.stderr.write(self.style.ERROR(f"{name}: {data['error']}"))
+                    continue
+                self.stdout.write(self.style.SUCCESS(
+                    f"{name}: {len(data['endpoints'])} medições em {time.monotonic() - started:.1f}s, "
+                    f"pico de memória {data['peak_rss_bytes'] / 2 ** 20:.0f} MiB"))
+                for route in data['uncovered_routes']:
+                    self.stderr.write(f"  rota não medida: {route}")
+                for endpoint, values in data['endpoints'].items():
+                    if values['errors']:
+                        self.stderr.write(f"  {endpoint}: {values['errors']} erro(s), ex.: {values['first_error']}")
+        finally:
+            if not options['workdir']:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Resultado gravado em {output}"))
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                previous = json.load(f)
+            regressions = benchmark.compare(previous, result, options['threshold'])
+            for item in regressions:
+                self.stderr.write(self.style.WARNING(
+                    f"regressão {item['dataset']} / {item['endpoint']}: "
+                    f"{item['before_ms']}ms -> {item['after_ms']}ms ({item['ratio']}x)"))
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS('Nenhuma regressão em relação a ' + options['compare']))
+
+    def _meta(self, options):
+        import django
+        import owlready2
+        return {
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': sys.version.split()[0],
+            'django': django.get_version(),
+            'owlready2': owlready2.VERSION,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            **{key: options[key] for key in ('repeat', 'loads', 'seed', 'depth', 'fanout', 'individual_density')},
+        }
+
+    def _dataset(self, name, workdir, options):
+        """Caminho do arquivo da ontologia ``name`` (gerada, se for um tamanho) e os parâmetros dela."""
+        if name in BUNDLED:
+            return os.path.join(settings.MEDIA_ROOT, BUNDLED[name]), None
+        if os.path.exists(name):
+            return os.path.abspath(name), None
+        triples = benchmark.parse_size(name)
+        params = {key: options[key] for key in ('depth', 'fanout', 'individual_density', 'seed')}
+        path = os.path.join(workdir, f"synthetic-{name}-{'-'.join(str(v) for v in params.values())}.owl")
+        self.stdout.write(f"{name}: gerando ontologia sintética...")
+        return path, benchmark.generate_ontology(path, triples, **params)
+
+    def _spawn(self, name, path, workdir, options):
+        """Mede a ontologia num processo novo, com quadstores e uploads isolados em ``workdir``."""
+        run_dir = tempfile.mkdtemp(prefix=f'{name}-', dir=workdir)
+        output = os.path.join(run_dir, 'result.json')
+        env = dict(os.environ, ONTOLOGY_STORE_DIR=os.path.join(run_dir, 'stores'), ONTOLOGY_IMPORTS_OFFLINE='1')
+        env.setdefault('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)
+        command = [sys.executable, '-m', 'django', 'benchmark', '--skip-checks', '--worker', path, '--output', output,
+                   '--repeat', str(options['repeat']), '--loads', str(options['loads'])]
+        try:
+            subprocess.run(command, env=env, cwd=settings.BASE_DIR, check=True)
+            with open(output, encoding='utf-8') as f:
+                return json.load(f)
+        except subprocess.CalledProcessError as e:
+            return {'error': f'O benchmark falhou (código {e.returncode})'}
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+    def _work(self, path, options):
+        from django.test import Client
+        from django.test.utils import override_settings
+
+        # Tudo o que a ontologia grava fica no diretório da medição; o catálogo de
+        # imports é copiado para que os imports continuem sendo resolvidos offline
+        run_dir = os.path.dirname(options['output'])
+        imports = os.path.join(run_dir, 'imports')
+        if os.path.isdir(settings.ONTOLOGY_IMPORTS_DIR):
+            shutil.copytree(settings.ONTOLOGY_IMPORTS_DIR, imports)
+        stores = os.path.join(run_dir, 'stores')
+        with override_settings(MEDIA_ROOT=os.path.join(run_dir, 'media'), ONTOLOGY_STORE_DIR=stores,
+                               ONTOLOGY_UPLOAD_CACHE_DIR=os.path.join(stores, 'uploads'),
+                               ONTOLOGY_IMPORTS_DIR=imports):
+            started = time.monotonic()
+            data = benchmark.run_ontology(Client(HTTP_HOST='localhost'), path, options['repeat'], options['loads'])
+            data['seconds'] = round(time.monotonic() - started, 3)
+        data['peak_rss_bytes'] = benchmark.peak_rss()
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(data, f)
@@ -0,0 +1,62 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import diff
+
+
+class Command(BaseCommand):
+    help = ('Compara duas versões de uma ontologia: arquivos OWL ou '
+            '<ontology_id>:<versão> (original, saved ou current)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('old', help='Arquivo ou <ontology_id>:<versão> de origem')
+        parser.add_argument('new', help='Arquivo ou <ontology_id>:<versão> de destino')
+        parser.add_argument('--json', action='store_true', help='Escreve o diff completo em JSON')
+
+    def handle(self, *args, **options):
+        sides = [self._read(options['old']), self._read(options['new'])]
+        result = diff.diff(*sides)
+        if options['json']:
+            self.stdout.write(json.dumps(result, ensure_ascii=False, indent=2))
+            return
+
+        for group, entities in result['changes'].items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{group} ({len(entities)})"))
+            for entity in entities:
+                if group == 'axioms':
+                    sign = '+' if entity['status'] == 'added' else '-'
+                    self.stdout.write(f"  {sign} {json.dumps(entity['axiom'], ensure_ascii=False)}")
+                    continue
+                self.stdout.write(f"  {entity['status']}: {entity['iri']}")
+                for sign, key in (('-', 'removed'), ('+', 'added')):
+                    for triple in entity[key]:
+                        value = json.dumps(triple['value'], ensure_ascii=False)
+                        self.stdout.write(f"      {sign} {triple['predicate']} {value}")
+        summary = result['summary']
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['entities_changed']} entidade(s) alterada(s): "
+            f"+{summary['triples_added']} / -{summary['triples_removed']} tripla(s)"))
+
+    def _read(self, source):
+        if os.path.exists(source):
+            return diff.read_file(source)
+        ontology_id, sep, ref = source.partition(':')
+        if not sep:
+            raise CommandError(f'Arquivo "{source}" não encontrado')
+
+        # Importado aqui: as views dependem das settings já configuradas
+        from core import views
+        from core.registry import OntologyNotFound
+
+        try:
+            entry = views.registry.acquire(ontology_id)
+        except OntologyNotFound as e:
+            raise CommandError(str(e))
+        try:
+            return views.diff_source(entry, ref)
+        except (ValueError, FileNotFoundError) as e:
+            raise CommandError(str(e))
+        finally:
+            views.registry.release(entry)
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import bulk_import
+
+
+class Command(BaseCommand):
+    help = 'Importa indivíduos em massa (CSV ou JSONL) para a ontologia carregada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ontology_id', help='Id devolvido por load-ontology/')
+        parser.add_argument('file', help='Arquivo .csv ou .jsonl')
+        parser.add_argument('--format', choices=sorted(bulk_import.READERS), help='Formato do arquivo (padrão: pela extensão)')
+        parser.add_argument('--errors', help='Grava o log completo de linhas rejeitadas (JSONL) neste arquivo')
+
+    def handle(self, *args, **options):
+        # Importado aqui: as views dependem das settings já configuradas
+        from core import views
+        from core.journal import compact
+        from core.registry import OntologyNotFound
+
+        try:
+            entry = views.registry.acquire(options['ontology_id'])
+        except OntologyNotFound as e:
+            raise CommandError(str(e))
+        fmt = options['format'] or bulk_import.detect_format(options['file'])
+
+        def progress(report):
+            self.stdout.write(f"{report.imported} importado(s), {report.failed} erro(s) "
+                              f"- {report.rate:.0f} linhas/s")
+
+        error_log = open(options['errors'], 'w', encoding='utf-8') if options['errors'] else None
+        try:
+            with open(options['file'], 'rb') as f:
+                report = views.import_individuals(entry, f, fmt, progress=progress, error_log=error_log)
+        finally:
+            if error_log is not None:
+                error_log.close()
+            # O processo termina antes do compactador rodar: regrava o RDF/XML agora
+            compact(entry.onto, entry.path, entry.journal)
+            views.registry.release(entry)
+
+        for error in report.errors:
+            self.stderr.write(f"linha {error['row']}: {error['message']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.imported} indivíduo(s) importado(s) em {report.to_dict()['seconds']}s, "
+            f"{report.failed} linha(s) rejeitada(s)"))
@@ -114,6 +114,58 @@ STATIC_ROOT = BASE_DIR / 'static'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Diretório dos quadstores SQLite do Owlready2 (um por ontologia carregada)
+ONTOLOGY_STORE_DIR = os.environ.get('ONTOLOGY_STORE_DIR', os.path.join(BASE_DIR, 'ontologies'))
+
+# Orçamento (bytes, estimado pelo tamanho dos quadstores) das ontologias abertas em
+# memória; acima dele as menos usadas são fechadas e reabertas sob demanda
+ONTOLOGY_MEMORY_BUDGET = 1024 * 1024 * 1024
+
+# Compactação do journal de alterações: o RDF/XML é regravado a cada intervalo (segundos)
+# ou assim que o journal acumular esse número de entradas
+ONTOLOGY_COMPACT_INTERVAL = 30
+ONTOLOGY_COMPACT_MAX_ENTRIES = 500
+
+# Importação em massa de indivíduos: linhas aplicadas (e commitadas) por bloco
+ONTOLOGY_IMPORT_CHUNK_SIZE = 1000
+
+# Desfazer/refazer: passos guardados por ontologia (fora os que algum snapshot usa)
+# e máximo de snapshots nomeados
+ONTOLOGY_UNDO_LIMIT = 100
+ONTOLOGY_MAX_SNAPSHOTS = 20
+
+# Tamanho máximo (bytes) do cache em memória das exportações por revisão
+ONTOLOGY_EXPORT_CACHE_BYTES = 64 * 1024 * 1024
+
+# Pools de threads das views assíncronas: "heavy" para upload/exportação/importação,
+# "light" para o resto. Acima de MAX_QUEUE requisições esperando, a resposta é 503
+ONTOLOGY_LIGHT_WORKERS = 8
+ONTOLOGY_LIGHT_MAX_QUEUE = 256
+ONTOLOGY_HEAVY_WORKERS = 2
+ONTOLOGY_HEAVY_MAX_QUEUE = 16
+
+# Carregamentos em segundo plano: threads dedicadas e por quanto tempo (segundos) o
+# resultado de um job terminado continua disponível
+ONTOLOGY_JOB_WORKERS = 2
+ONTOLOGY_JOB_TTL = 600
+
+# Cache de uploads por conteúdo (sha256): o quadstore já parseado e o corpo do
+# carregamento de cada arquivo, para que reenvios idênticos não sejam parseados de novo
+ONTOLOGY_UPLOAD_CACHE_DIR = os.path.join(ONTOLOGY_STORE_DIR, 'uploads')
+ONTOLOGY_UPLOAD_CACHE_BYTES = 512 * 1024 * 1024
+
+# Respostas JSON das rotas de ontologia: codificador ("orjson", se instalado, ou "json")
+# e tamanho mínimo (bytes) para comprimir com gzip/brotli conforme o Accept-Encoding
+ONTOLOGY_JSON_ENCODER = 'orjson'
+ONTOLOGY_COMPRESS_MIN_BYTES = 1024
+
+# Imports (owl:imports): catálogo local IRI -> arquivo e arquivos baixados. Com
+# OFFLINE nada é baixado e os imports fora do catálogo são carregados vazios
+ONTOLOGY_IMPORTS_DIR = os.path.join(MEDIA_ROOT, 'imports')
+ONTOLOGY_IMPORTS_OFFLINE = os.environ.get('ONTOLOGY_IMPORTS_OFFLINE', '') == '1'
+ONTOLOGY_IMPORTS_FETCH_WORKERS = 4
+ONTOLOGY_IMPORTS_FETCH_TIMEOUT = 30
+
 CORS_ORIGIN_ALLOW_ALL = True
 CSRF_TRUSTED_ORIGINS = [      
     "http://localhost:3000",
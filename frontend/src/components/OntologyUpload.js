@@ -4,6 +4,48 @@ import axios from 'axios';
 import { FiUpload, FiFile, FiFolder, FiChevronRight, FiChevronDown, FiSearch, FiGrid, FiList, FiTag, FiUser } from 'react-icons/fi';
 import './OntologyTree.css';
 
+// Listas do estado que o backend atualiza por delta (chaves iguais às do load-ontology/)
+const ENTITY_KEYS = ['object_properties', 'data_properties', 'annotation_properties', 'individuals'];
+
+// Insere um nó de classe sob cada ocorrência dos pais na árvore
+const insertClassNode = (nodes, parents, entry) => nodes.map(n => ({
+  ...n,
+  children: parents.includes(n.name)
+    ? [...(n.children || []), entry]
+    : insertClassNode(n.children || [], parents, entry)
+}));
+
+const removeClassNodes = (nodes, names) => nodes
+  .filter(n => !names.has(n.name))
+  .map(n => ({ ...n, children: removeClassNodes(n.children || [], names) }));
+
+// Aplica o delta ({ revision, changes }) devolvido pelas rotas de mutação
+const applyChanges = (prev, { revision, changes }) => {
+  const next = { ...prev, revision };
+  ENTITY_KEYS.forEach(key => {
+    const added = changes.added[key] || [];
+    const changed = new Map((changes.changed[key] || []).map(e => [e.name, e]));
+    const removed = new Set(changes.removed[key] || []);
+    if (!added.length && !changed.size && !removed.size) return;
+    next[key] = (prev[key] || [])
+      .filter(e => !removed.has(e.name))
+      .map(e => changed.get(e.name) || e)
+      .concat(added);
+  });
+
+  const addedClasses = changes.added.classes || [];
+  const removedClasses = new Set(changes.removed.classes || []);
+  if (addedClasses.length || removedClasses.size) {
+    let classes = removeClassNodes(prev.classes || [], removedClasses);
+    addedClasses.forEach(node => {
+      const entry = { name: node.name, children: node.children || [] };
+      classes = node.parents?.length ? insertClassNode(classes, node.parents, entry) : [...classes, entry];
+    });
+    next.classes = classes;
+    next.classes_count = (prev.classes_count || 0) + addedClasses.length - removedClasses.size;
+  }
+  return next;
+};
 
 const OntologyUpload = () => {
   const [file, setFile] = useState(null);
@@ -17,6 +59,7 @@ const OntologyUpload = () => {
   const [newClassName, setNewClassName] = useState('');
   const [selectedParents, setSelectedParents] = useState([]);
   const [exportFileName, setExportFileName] = useState('ontology.owl');
+  const [ontologyId, setOntologyId] = useState(null);
   const [showCreateIndividualForm, setShowCreateIndividualForm] = useState(false);
   const [newIndividualName, setNewIndividualName] = useState('');
   const [selectedIndividualClasses, setSelectedIndividualClasses] = useState([]);
@@ -43,6 +86,9 @@ const OntologyUpload = () => {
   const [dataRangeType, setDataRangeType] = useState('');
   const [dataCharacteristics, setDataCharacteristics] = useState([]);
 
+  // Todas as rotas (exceto o upload) recebem o id devolvido por load-ontology/
+  const withOntology = (url) => `${url}${url.includes('?') ? '&' : '?'}ontology_id=${encodeURIComponent(ontologyId)}`;
+
   const handleExportOntology = () => {
     if (!ontologyData) {
       setMessage('❌ Nenhuma ontologia carregada!');
@@ -50,7 +96,7 @@ const OntologyUpload = () => {
     }
   
     const fileName = exportFileName.endsWith('.owl') ? exportFileName : `${exportFileName}.owl`;
-    const exportUrl = `http://localhost:8000/export-ontology/?filename=${encodeURIComponent(fileName)}`;
+    const exportUrl = withOntology(`http://localhost:8000/export-ontology/?filename=${encodeURIComponent(fileName)}`);
   
     window.open(exportUrl, '_blank');
     setMessage(`✅ Ontologia exportada como ${fileName}`);
@@ -127,7 +173,7 @@ const OntologyUpload = () => {
           return acc;
         }, {});
   
-        const response = await axios.post('http://localhost:8000/create-individual/', {
+        const response = await axios.post(withOntology('http://localhost:8000/create-individual/'), {
           name: newIndividualName,
           classes: selectedIndividualClasses,
           properties: propertiesDict,
@@ -140,10 +186,7 @@ const OntologyUpload = () => {
         });
   
       if (response.data.status === 'success') {
-        setOntologyData(prev => ({
-          ...prev,
-          individuals: response.data.ontology.individuals
-        }));
+        setOntologyData(prev => applyChanges(prev, response.data));
         setShowCreateIndividualForm(false);
         setMessage(`✅ ${response.data.message}`);
       }
@@ -209,15 +252,26 @@ const OntologyUpload = () => {
     formData.append('ontology_file', file);
 
     try {
-      const response = await axios.post('http://localhost:8000/load-ontology/', formData, {
+      const started = await axios.post('http://localhost:8000/load-ontology/', formData, {
         withCredentials: true,
         headers: {
           'Content-Type': 'multipart/form-data',
           'X-Requested-With': 'XMLHttpRequest',
         }
       });
-      
+
+      // O carregamento roda em segundo plano: acompanha a fase até terminar
+      const jobUrl = `http://localhost:8000/load-jobs/${started.data.job_id}/`;
+      let job = { status: 'running' };
+      while (job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 500));
+        job = (await axios.get(jobUrl)).data.job;
+        if (job.status === 'running') setMessage(`⏳ ${job.phase || 'carregando'}... ${Math.round(job.percent)}%`);
+      }
+      const response = await axios.get(`${jobUrl}result/`);
+
       setMessage(`✅ ${response.data.message}`);
+      setOntologyId(response.data.ontology_id);
       setOntologyData(response.data.ontology);
       setExpandedNodes(new Set());
     } catch (error) {
@@ -243,7 +297,7 @@ const OntologyUpload = () => {
     }
 
     try {
-      const response = await axios.post('http://localhost:8000/create-class/', {
+      const response = await axios.post(withOntology('http://localhost:8000/create-class/'), {
         name: newClassName,
         parents: selectedParents
       }, {
@@ -253,11 +307,7 @@ const OntologyUpload = () => {
       });
 
       if (response.data.status === 'success') {
-        setOntologyData(prev => ({
-          ...prev,
-          classes: response.data.ontology.classes,
-          classes_count: response.data.ontology.classes_count
-        }));
+        setOntologyData(prev => applyChanges(prev, response.data));
         setShowCreateClassForm(false);
         setNewClassName('');
         setSelectedParents([]);
@@ -273,8 +323,8 @@ const OntologyUpload = () => {
 
   const handleManageRelationship = async (subject, objectProperty, target, action, replaceWith = null) => {
     try {
-      const response = await axios.post('http://localhost:8000/relationship-manager/', { subject, object_property: objectProperty, target, action, replace_with: replaceWith });
-      if (response.data.status === 'success') setOntologyData(prev=>({ ...prev, individuals: response.data.ontology.individuals }));
+      const response = await axios.post(withOntology('http://localhost:8000/relationship-manager/'), { subject, object_property: objectProperty, target, action, replace_with: replaceWith });
+      if (response.data.status === 'success') setOntologyData(prev => applyChanges(prev, response.data));
       setMessage(response.data.status==='success'?`✅ ${response.data.message}`:`❌ ${response.data.message}`);
     } catch (error) { setMessage(`❌ Erro: ${error.response?.data?.message || error.message}`); }
   };
@@ -325,7 +375,7 @@ const OntologyUpload = () => {
     const normalizedRange = objRange[0].trim().replace(/ /g, '');
   
     try {
-      const response = await fetch('/create_object_property/', {
+      const response = await fetch(withOntology('/create_object_property/'), {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -338,10 +388,7 @@ const OntologyUpload = () => {
       const result = await response.json();
       if (result.status === 'success') {
         alert("Propriedade criada com sucesso!");
-        setOntologyData(prev => ({
-          ...prev,
-          object_properties: result.object_properties
-        }));
+        setOntologyData(prev => applyChanges(prev, result));
         setShowObjectPropertyForm(false);
         setNewObjPropName('');
         setObjDomain(['']);
@@ -369,15 +416,12 @@ const OntologyUpload = () => {
         characteristics: dataCharacteristics
       };
       const response = await axios.post(
-        '/create_data_property/',   
+        withOntology('/create_data_property/'),
         payload,
         { headers: { 'Content-Type': 'application/json' } }
       );
       if (response.data.status === 'success') {
-        setOntologyData(prev => ({
-          ...prev,
-          data_properties: response.data.data_properties
-        }));
+        setOntologyData(prev => applyChanges(prev, response.data));
         setShowDataPropForm(false);
         setNewDataPropName('');
         setDataDomain([]);
@@ -397,12 +441,12 @@ const OntologyUpload = () => {
   const handleCreateAnnotationProperty = async () => {
     if (!newAnnoPropName) return alert('Informe o nome da AnnotationProperty');
     try {
-      const res = await axios.post('http://localhost:8000/create-annotation-property/', {
+      const res = await axios.post(withOntology('http://localhost:8000/create-annotation-property/'), {
         name: newAnnoPropName,
         domain: annoDomain
       });
       if(res.data.status==='success'){
-        setOntologyData(prev=>({ ...prev, annotation_properties: res.data.annotation_properties }));
+        setOntologyData(prev => applyChanges(prev, res.data));
         setShowCreateAnnoPropForm(false);
         setNewAnnoPropName(''); setAnnoDomain([]);
         setMessage(`✅ ${res.data.message}`);